@@ -5,17 +5,41 @@ Copy this entire file and use it as your main.py
 
 from fastapi import FastAPI, File, UploadFile, Form, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import Optional, Union
 from datetime import datetime
-from pydantic import BaseModel
 import logging
+import asyncio
 import json
+import os
+import time
+import uuid
+
+from backend.admission import AdmissionController, AdmissionControlMiddleware
+from backend.agents import AgentRegistry
+from backend.analysis import CheckInput, analyze_text, analyze_upload, analyze_url, text_metadata, url_metadata
+from backend.batch import MAX_BATCH_ITEMS, BatchItem, BatchRunner, ndjson_items
+from backend.cache import ResultCache, key_for_text, key_for_upload, key_for_url
+from backend.chat import ChatSessionStore
+from backend.directory_index import DirectoryIndexer, DirectoryIndexError
+from backend.extraction import report_from_llm_response
+from backend.fetcher import FetchError, InvalidURL, URLFetcher, canonical_url, page_text
+from backend.history import HistoryQuery, HistoryQueryError, HistoryStore
+from backend.imagehash import ImageHashIndex, image_hashes
+from backend.images import refresh_metadata
+from backend.ingest import BodySizeLimitMiddleware, UploadTooLarge, ingest_upload
+from backend.logging_setup import LazySummary, RequestLogContextMiddleware, bind_log_context, configure_logging
+from backend.metrics import (CHECKS_TOTAL, INGESTED_BYTES, NEAR_DUPLICATES_TOTAL, STAGE_SECONDS, MetricsMiddleware,
+                             render_metrics, request_age)
+from backend.neardup import NearDuplicateIndex, mark_duplicate, signature
+from backend.pools import shutdown_pool
+from backend.jobs import JobManager, TooManyJobs, upload_path_for
+from backend.resumable import ResumableUploadStore, UploadSessionError
+from backend.scanner import get_default_ruleset
+from backend.serialization import report_response
+from backend.models import ComplianceReport, model_to_dict, report_to_dict
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 # ========================================
@@ -27,6 +51,18 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# ========================================
+# ADMISSION CONTROL (POST /run, /run/*)
+# ========================================
+# Per-input-type slots and queues; added first so it sits inside CORS and
+# its 429s still carry CORS headers (the frontend reads Retry-After)
+admission = AdmissionController()
+app.add_middleware(AdmissionControlMiddleware, controller=admission)
+
+# Reject oversize uploads before the multipart parser spools them; also
+# inside CORS, so the browser can read the 413 instead of a network error
+app.add_middleware(BodySizeLimitMiddleware)
+
 # ========================================
 # CORS MIDDLEWARE
 # ========================================
@@ -44,33 +80,89 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Outermost, so rejected requests are counted too
+app.add_middleware(MetricsMiddleware)
+
+# requestId / method / path on every log line of a request
+app.add_middleware(RequestLogContextMiddleware)
+
 # ========================================
-# RESPONSE MODELS
+# SERVICES
 # ========================================
-class Summary(BaseModel):
-    status: str
-    issuesCount: int
-    recommendationsCount: int
-    score: int
+# Built in the first startup hook, not at import: pool workers (forkserver
+# / spawn) import this module too when it runs as __main__, and must not
+# open the caches' SQLite files or start the history writer a second time.
+result_cache: ResultCache
+url_fetcher: URLFetcher
+near_duplicates: NearDuplicateIndex
+image_index: ImageHashIndex
+agent_registry: AgentRegistry
+history_store: HistoryStore
+job_manager: JobManager
+upload_store: ResumableUploadStore
+directory_indexer: DirectoryIndexer
+chat_store: ChatSessionStore
+
+@app.on_event("startup")
+async def create_services():
+    global result_cache, url_fetcher, near_duplicates, image_index, agent_registry
+    global history_store, job_manager, upload_store, directory_indexer, chat_store
+    # Setup logging - records go through a queue to a background writer thread
+    # (MEDIA_CHECKER_LOG_FORMAT=json for JSON lines)
+    configure_logging()
+    # Same upload / text / URL -> same report, computed once
+    result_cache = ResultCache()
+    # Pages behind URL checks: shared connection pool + HTTP cache, revalidated with conditional GETs
+    url_fetcher = URLFetcher()
+    # Nearly the same text as an earlier check (syndicated articles) -> that check's report
+    near_duplicates = NearDuplicateIndex()
+    # Perceptual hash within a few bits of an earlier upload -> that upload's report
+    image_index = ImageHashIndex()
+    # POST /check-agents: probed in the background; requests read the last snapshot
+    agent_registry = AgentRegistry()
+    # GET /history
+    history_store = HistoryStore()
+    # POST /jobs
+    job_manager = JobManager(result_cache, on_report=history_store.record)
+    # POST /uploads (resumable uploads)
+    upload_store = ResumableUploadStore()
+    # POST /submit-directory
+    directory_indexer = DirectoryIndexer(job_manager)
+    # POST /chat
+    chat_store = ChatSessionStore(directory_indexer, job_manager)
+
+@app.on_event("startup")
+async def start_job_pool():
+    job_manager.start()
 
-class Issue(BaseModel):
-    id: str
-    severity: str
-    title: str
-    description: str
-    timestamp: Optional[str] = None
-    recommendation: str
+@app.on_event("startup")
+async def compile_rules():
+    # Build the phrase automaton once, before the first text check
+    get_default_ruleset()
 
-class Metadata(BaseModel):
-    fileName: str
-    fileSize: int
-    durationSec: Optional[int] = None
-    checkedAt: str
+@app.on_event("startup")
+async def start_upload_gc():
+    asyncio.get_running_loop().create_task(upload_store.run_gc_forever())
 
-class ComplianceReport(BaseModel):
-    summary: Summary
-    issues: list[Issue]
-    metadata: Metadata
+@app.on_event("startup")
+async def start_chat_sweeper():
+    asyncio.get_running_loop().create_task(chat_store.run_sweeper_forever())
+
+@app.on_event("startup")
+async def start_agent_probes():
+    asyncio.get_running_loop().create_task(agent_registry.run_forever())
+
+@app.on_event("shutdown")
+async def stop_job_pool():
+    chat_store.close()
+    await agent_registry.close()
+    await url_fetcher.close()
+    directory_indexer.shutdown()
+    job_manager.shutdown()
+    shutdown_pool()
+    history_store.close()
+    near_duplicates.close()
+    image_index.close()
 
 # ========================================
 # ROOT ENDPOINT
@@ -83,7 +175,18 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "upload": "POST /run",
+            "batch": "POST /run/batch",
+            "jobs": "POST /jobs, GET /jobs/{id}, GET /jobs/{id}/events",
+            "directories": "POST /submit-directory, GET /directories/{sessionId}",
+            "chat": "POST /chat (SSE with Accept: text/event-stream)",
+            "history": "GET /history, GET /history/export, GET /history/{id}, DELETE /history/{id}",
+            "extract": "POST /extract",
+            "resumable": "POST /uploads, PUT /uploads/{id}/chunks/{n}, GET /uploads/{id}, POST /uploads/{id}/complete",
             "health": "GET /health",
+            "agents": "POST /check-agents, GET /check-agents/events",
+            "admission": "GET /admission",
+            "cache": "GET /cache/stats, GET /cache/fetcher, GET /cache/near-duplicates, GET /cache/images",
+            "metrics": "GET /metrics",
             "docs": "GET /docs"
         }
     }
@@ -98,6 +201,73 @@ async def health_check():
         "timestamp": datetime.now().isoformat()
     }
 
+# ========================================
+# AGENT DISCOVERY
+# ========================================
+# Answered from the registry's snapshot - never waits on the agents themselves
+AGENT_FIRST_ROUND_WAIT_SECONDS = 3
+
+@app.api_route("/check-agents", methods=["GET", "POST"])
+async def check_agents():
+    """Status, latency and error counts of every registered agent"""
+    return await agent_registry.wait_ready(AGENT_FIRST_ROUND_WAIT_SECONDS)
+
+@app.get("/check-agents/events")
+async def stream_agent_status(request: Request):
+    """Server-Sent Events: the current snapshot, then a new one whenever an agent goes up or down"""
+    try:
+        last_version = int(request.headers.get("last-event-id", "-1"))
+    except ValueError:
+        last_version = -1
+
+    async def event_stream():
+        async for snapshot in agent_registry.changes(last_version):
+            if snapshot is None:
+                yield ": ping\n\n"
+                continue
+            yield f"id: {snapshot['version']}\nevent: agents\ndata: {json.dumps(snapshot)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ========================================
+# ADMISSION STATE (for autoscaling)
+# ========================================
+@app.get("/admission")
+async def admission_state():
+    """Running / queued check requests per input type, limits and refusals"""
+    return admission.state()
+
+# ========================================
+# CACHE STATS (for sizing the result cache)
+# ========================================
+@app.get("/cache/stats")
+async def cache_stats():
+    return result_cache.stats()
+
+@app.get("/cache/fetcher")
+async def fetcher_stats():
+    return url_fetcher.stats()
+
+@app.get("/cache/near-duplicates")
+async def near_duplicate_stats():
+    return await run_in_threadpool(near_duplicates.stats)
+
+@app.get("/cache/images")
+async def image_index_stats():
+    return await run_in_threadpool(image_index.stats)
+
+# ========================================
+# PROMETHEUS METRICS
+# ========================================
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Stage latency histograms, in-flight gauges and ingest counters (Prometheus text format)"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
 # ========================================
 # MAIN /run ENDPOINT - HANDLES ALL REQUESTS
 # ========================================
@@ -112,6 +282,10 @@ async def run_compliance_check(
     Accepts:
     - Multipart/form-data with file upload (video or PDF)
     - JSON with url or text fields
+
+    Returns the report as JSON (gzip / br when accepted), or as NDJSON -
+    summary, metadata, then one line per issue - with
+    Accept: application/x-ndjson (see backend/serialization.py).
     
     This fixes the 422 error by:
     1. Making file Optional
@@ -119,112 +293,75 @@ async def run_compliance_check(
     3. Logging everything for debugging
     """
     try:
-        logger.info(f"=== New Request ===")
-        logger.info(f"Content-Type: {request.headers.get('content-type')}")
-        logger.info(f"File: {file.filename if file else None}")
+        logger.info("=== New Request === Content-Type: %s", request.headers.get("content-type"))
         
         # ========================================
         # HANDLE FILE UPLOAD
         # ========================================
         if file:
-            # Read file contents
-            contents = await file.read()
-            file_size = len(contents)
-            
-            logger.info(f"📁 File Upload Detected")
-            logger.info(f"   Filename: {file.filename}")
-            logger.info(f"   Size: {file_size} bytes")
-            logger.info(f"   Type: {file.content_type}")
-            
-            # Determine file type
-            is_video = file.content_type and file.content_type.startswith('video/')
-            is_pdf = file.content_type == 'application/pdf'
-            is_doc = file.content_type in [
-                'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-                'application/msword'
-            ]
-            
-            # Generate mock response (replace with your actual logic)
-            response = ComplianceReport(
-                summary=Summary(
-                    status="pass",
-                    issuesCount=0,
-                    recommendationsCount=0,
-                    score=95
-                ),
-                issues=[],
-                metadata=Metadata(
-                    fileName=file.filename,
-                    fileSize=file_size,
-                    durationSec=120 if is_video else None,
-                    checkedAt=datetime.now().isoformat()
-                )
-            )
-            
-            logger.info(f"✅ Returning response: {response.summary.status}")
-            return response
+            # FastAPI parsed the multipart body before we got here
+            parse_seconds = request_age(request.scope)
+            if parse_seconds is not None:
+                STAGE_SECONDS.observe(parse_seconds, "body_parse", "file")
+
+            # Stream the upload to a spooled temp file in fixed-size chunks
+            try:
+                with STAGE_SECONDS.time("upload_read", "file"):
+                    upload = await ingest_upload(file)
+            except UploadTooLarge as e:
+                logger.error("❌ %s", e)
+                raise HTTPException(status_code=413, detail=str(e))
+
+            try:
+                bind_log_context(kind="file", fileName=upload.filename, sha256=upload.sha256)
+                logger.info("📁 File upload: %s bytes, type %s (declared: %s)",
+                            upload.size, upload.content_type, upload.declared_type)
+
+                response, cached = await _check_upload(upload)
+            finally:
+                upload.close()
+
+            logger.info("✅ Returning response: %s (cached: %s)", response["summary"]["status"], cached)
+            return report_response(response, request)
         
         # ========================================
         # HANDLE JSON REQUESTS (URL or Text)
         # ========================================
         else:
             # Manually parse JSON body
+            parse_started = time.perf_counter()
             try:
                 body = await request.json()
-                logger.info(f"📝 JSON Request Detected")
-                logger.info(f"   Body: {body}")
-            except:
+                # Summarized - the body can be megabytes of text
+                logger.info("📝 JSON request: %s", LazySummary(body))
+            except HTTPException:
+                raise                       # 413 from BodySizeLimitMiddleware
+            except ValueError:
                 body = {}
+            parse_kind = "url" if body.get("url") else "text" if body.get("text") else "invalid"
+            STAGE_SECONDS.observe(time.perf_counter() - parse_started, "body_parse", parse_kind)
             
             # Handle URL
             if "url" in body and body["url"]:
                 url = body["url"]
-                logger.info(f"🔗 URL Request: {url}")
-                
-                is_youtube = 'youtube.com' in url or 'youtu.be' in url
+                bind_log_context(kind="url")
+                logger.info("🔗 URL request: %s", url)
                 
-                response = ComplianceReport(
-                    summary=Summary(
-                        status="pass",
-                        issuesCount=0,
-                        recommendationsCount=0,
-                        score=92
-                    ),
-                    issues=[],
-                    metadata=Metadata(
-                        fileName="YouTube Video" if is_youtube else "URL Check",
-                        fileSize=0,
-                        durationSec=180 if is_youtube else None,
-                        checkedAt=datetime.now().isoformat()
-                    )
-                )
-                
-                logger.info(f"✅ Returning URL response")
-                return response
+                response, cached = await _check_url(url)
+
+                logger.info("✅ Returning URL response (cached: %s)", cached)
+                return report_response(response, request)
             
             # Handle Text
             elif "text" in body and body["text"]:
                 text = body["text"]
-                logger.info(f"📄 Text Request: {len(text)} characters")
+                bind_log_context(kind="text")
+                logger.info("📄 Text request: %d characters", len(text))
                 
-                response = ComplianceReport(
-                    summary=Summary(
-                        status="pass",
-                        issuesCount=0,
-                        recommendationsCount=0,
-                        score=88
-                    ),
-                    issues=[],
-                    metadata=Metadata(
-                        fileName="Text Check",
-                        fileSize=len(text),
-                        durationSec=None,
-                        checkedAt=datetime.now().isoformat()
-                    )
-                )
-                
-                logger.info(f"✅ Returning text response")
-                return response
+                response, cached = await _check_text(text)
+
+                logger.info("✅ Returning text response (cached: %s)", cached)
+                return report_response(response, request)
             
             # No valid input
             else:
@@ -237,49 +374,629 @@ async def run_compliance_check(
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"❌ Error: {str(e)}", exc_info=True)
+        logger.error("❌ Error: %s", e, exc_info=True)
         raise HTTPException(
             status_code=500,
             detail=f"Internal server error: {str(e)}"
         )
 
+async def _run_analysis(kind: str, analyze, *args) -> dict:
+    """Run a (blocking) analyzer off the event loop and return a cacheable dict"""
+    with STAGE_SECONDS.time("analysis", kind):
+        report = await run_in_threadpool(analyze, *args)
+    with STAGE_SECONDS.time("serialization", kind):
+        return report_to_dict(report)
+
+async def _run_text_analysis(kind: str, text_of, source: str, metadata_of, analyze, *args) -> dict:
+    """
+    _run_analysis, unless nearly the same text was checked before
+
+    text_of() returns the text to match on; source (URL or "text") is what
+    a later near-duplicate will be told it duplicates; metadata_of() is this
+    request's Metadata, for the reused report.
+    """
+    def find_match():
+        sig = signature(text_of())
+        return sig, near_duplicates.lookup(sig)
+
+    with STAGE_SECONDS.time("near_duplicate", kind):
+        sig, match = await run_in_threadpool(find_match)
+    if match is not None:
+        NEAR_DUPLICATES_TOTAL.inc(1, kind)
+        logger.info("♻️ Near-duplicate of %s (similarity %.2f)", match.source, match.similarity)
+        return mark_duplicate(match, model_to_dict(metadata_of()))
+
+    report = await _run_analysis(kind, analyze, *args)
+    await run_in_threadpool(near_duplicates.add, sig, report, source)
+    return report
+
+async def _run_image_analysis(upload) -> dict:
+    """_run_analysis, unless a perceptually identical image was checked before"""
+    def find_match():
+        hashes = image_hashes(upload.file)
+        return hashes, image_index.lookup(hashes)
+
+    with STAGE_SECONDS.time("image_hash", "file"):
+        hashes, match = await run_in_threadpool(find_match)
+    if match is not None:
+        NEAR_DUPLICATES_TOTAL.inc(1, "image")
+        logger.info("♻️ Known image: %s (similarity %.2f)", match.source, match.similarity)
+        metadata = {"fileName": upload.filename, "fileSize": upload.size, "checkedAt": datetime.now().isoformat()}
+        return await run_in_threadpool(refresh_metadata, mark_duplicate(match, metadata), upload.file)
+
+    report = await _run_analysis("file", analyze_upload, upload)
+    await run_in_threadpool(image_index.add, hashes, report, upload.filename)
+    return report
+
+async def _check_upload(upload) -> tuple[dict, bool]:
+    """Cached check of an ingested upload -> (report, was_cached)"""
+    INGESTED_BYTES.inc(upload.size, "file")
+    is_image = (upload.content_type or "").startswith("image/")
+    response, cached = await result_cache.get_or_compute(
+        key_for_upload(upload.sha256),
+        lambda: _run_image_analysis(upload) if is_image else _run_analysis("file", analyze_upload, upload),
+    )
+    # Same bytes may arrive under a different name (and a known image at a different size)
+    response["metadata"]["fileName"] = upload.filename
+    response["metadata"]["fileSize"] = upload.size
+    CHECKS_TOTAL.inc(1, "file", "true" if cached else "false")
+    history_store.record(response, "file")
+    return response, cached
+
+async def _fetch_page(url: str):
+    """The page behind a URL, or None if it can't be fetched (the URL is then checked on its own)"""
+    try:
+        with STAGE_SECONDS.time("fetch", "url"):
+            return await url_fetcher.fetch(url)
+    except InvalidURL as e:
+        raise HTTPException(status_code=InvalidURL.status_code, detail=str(e))
+    except FetchError as e:
+        logger.warning("⚠️ %s", e)
+        return None
+
+async def _check_url(url: str) -> tuple[dict, bool]:
+    INGESTED_BYTES.inc(len(url), "url")
+    page = await _fetch_page(url)
+    response, cached = await result_cache.get_or_compute(
+        key_for_url(url, page.sha256 if page else None),
+        lambda: (_run_text_analysis("url", lambda: page_text(page)[1], canonical_url(url),
+                                    lambda: url_metadata(url, page), analyze_url, url, page)
+                 if page else _run_analysis("url", analyze_url, url, page)),
+    )
+    CHECKS_TOTAL.inc(1, "url", "true" if cached else "false")
+    history_store.record(response, "url")
+    return response, cached
+
+async def _check_text(text: str) -> tuple[dict, bool]:
+    INGESTED_BYTES.inc(len(text.encode()), "text")
+    response, cached = await result_cache.get_or_compute(
+        key_for_text(text),
+        lambda: _run_text_analysis("text", lambda: text, "text", lambda: text_metadata(text), analyze_text, text),
+    )
+    CHECKS_TOTAL.inc(1, "text", "true" if cached else "false")
+    history_store.record(response, "text")
+    return response, cached
+
+# ========================================
+# BATCH MODE - MANY ITEMS, ONE NDJSON LINE PER RESULT
+# ========================================
+@app.post("/run/batch")
+async def run_batch_check(request: Request):
+    """
+    Check many files, URLs and texts in one request
+
+    Accepts either:
+    - multipart/form-data with any number of "files", "urls" and "texts" fields
+    - NDJSON (application/x-ndjson), one {"url": ...} or {"text": ...} per line,
+      each optionally with an "id"
+
+    Streams back NDJSON: one line per item as it finishes (see backend/batch.py).
+    A failing item gets an error line; it never fails the batch.
+    """
+    content_type = request.headers.get("content-type", "")
+    form = None
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form(max_files=MAX_BATCH_ITEMS, max_fields=MAX_BATCH_ITEMS)
+        items = _form_batch_items(form)
+    elif content_type.startswith(("application/x-ndjson", "application/jsonl", "application/json")):
+        items = ndjson_items(request.stream())
+    else:
+        raise HTTPException(status_code=415, detail="Send multipart/form-data or application/x-ndjson")
+
+    logger.info("📦 Batch request (%s)", content_type.split(";")[0])
+    runner = BatchRunner(_check_batch_item)
+    # Items start checking as they are read; the response starts once the body is in
+    runner.start(items)
+    try:
+        await runner.input_read()
+    except BaseException:
+        runner.cancel()
+        raise
+
+    async def lines():
+        try:
+            async for line in runner.results():
+                yield json.dumps(line) + "\n"
+        finally:
+            if form is not None:
+                await form.close()
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def _form_batch_items(form):
+    index = 0
+    for name, value in form.multi_items():
+        if name in ("file", "files") and not isinstance(value, str):
+            yield BatchItem(index=index, kind="file", value=value, id=value.filename)
+        elif name in ("url", "urls") and value:
+            yield BatchItem(index=index, kind="url", value=value)
+        elif name in ("text", "texts") and value:
+            yield BatchItem(index=index, kind="text", value=value)
+        else:
+            continue
+        index += 1
+
+async def _check_batch_item(item: BatchItem) -> tuple[dict, bool]:
+    if item.kind == "file":
+        try:
+            upload = await ingest_upload(item.value)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+        try:
+            return await _check_upload(upload)
+        finally:
+            upload.close()
+    if item.kind == "url":
+        return await _check_url(item.value)
+    return await _check_text(item.value)
+
+# ========================================
+# JOB MODE - SUBMIT NOW, FETCH THE REPORT LATER
+# ========================================
+def _jobs_full(e: TooManyJobs) -> HTTPException:
+    logger.error("❌ Job queue full: %s", e)
+    return HTTPException(
+        status_code=503,
+        detail="Too many checks in progress, try again shortly",
+        headers={"Retry-After": "30"},
+    )
+
+@app.post("/jobs", status_code=202)
+async def create_check_job(
+    request: Request,
+    file: Optional[UploadFile] = File(None)
+):
+    """
+    Same inputs as /run, but returns a job id immediately
+
+    Poll GET /jobs/{id} or stream GET /jobs/{id}/events for progress.
+    """
+    if file:
+        try:
+            upload = await ingest_upload(file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+
+        # Worker processes need a real file to open
+        try:
+            path = upload_path_for(uuid.uuid4().hex)
+            await run_in_threadpool(upload.save_to, path)
+        finally:
+            upload.close()
+
+        check = CheckInput.from_upload(upload, path)
+        key = key_for_upload(upload.sha256)
+        INGESTED_BYTES.inc(upload.size, "file")
+        logger.info("🧾 Job request: file %s (%s bytes)", upload.filename, upload.size)
+    else:
+        try:
+            body = await request.json()
+        except Exception:
+            body = {}
+
+        if body.get("url"):
+            page = await _fetch_page(body["url"])
+            check = CheckInput(kind="url", url=body["url"], page=page)
+            key = key_for_url(body["url"], page.sha256 if page else None)
+            INGESTED_BYTES.inc(len(body["url"]), "url")
+        elif body.get("text"):
+            check = CheckInput(kind="text", text=body["text"])
+            key = key_for_text(body["text"])
+            INGESTED_BYTES.inc(len(body["text"].encode()), "text")
+        else:
+            raise HTTPException(status_code=400, detail="No file, URL, or text provided")
+        logger.info("🧾 Job request: %s", check.kind)
+
+    try:
+        job = await job_manager.submit(key, check)
+    except TooManyJobs as e:
+        raise _jobs_full(e)
+
+    return {
+        "jobId": job.id,
+        "status": job.status,
+        "statusUrl": f"/jobs/{job.id}",
+        "eventsUrl": f"/jobs/{job.id}/events",
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_check_job(job_id: str):
+    """Job status, plus the final ComplianceReport under "report" once done"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+@app.get("/jobs/{job_id}/events")
+async def stream_check_job(job_id: str, request: Request):
+    """
+    Server-Sent Events stream of stage progress (resumes from Last-Event-ID)
+
+    Events: progress, issues (found so far, e.g. per document page), done, failed
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    try:
+        last_event_id = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_event_id = 0
+
+    async def event_stream():
+        async for seq, event, data in job_manager.events(job, last_event_id):
+            if event == "ping":
+                yield ": ping\n\n"
+                continue
+            yield f"id: {seq}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# ========================================
+# LOCAL DIRECTORY SUBMISSION
+# ========================================
+@app.post("/submit-directory")
+async def submit_directory(request: Request):
+    """
+    Index a directory on this machine and check its new / changed files
+
+    Returns the sessionId immediately; indexing carries on in the
+    background (see GET /directories/{sessionId}). Each queued file is an
+    ordinary job under /jobs.
+    """
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+
+    try:
+        session = directory_indexer.submit(str(body.get("directoryPath") or ""))
+    except DirectoryIndexError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    logger.info("📁 Directory submitted: %s (session %s)", session.root, session.id)
+    return {
+        "success": True,
+        "sessionId": session.id,
+        "message": f"Indexing {session.root} - new and changed files will be checked as they are found.",
+        "directoryPath": session.root,
+        "statusUrl": f"/directories/{session.id}",
+    }
+
+@app.get("/directories/{session_id}")
+async def get_directory_session(session_id: str):
+    """Indexing progress and the job id of every file queued for checking"""
+    session = directory_indexer.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Directory session not found")
+    return session.to_dict()
+
+# ========================================
+# CHAT
+# ========================================
+@app.post("/chat")
+async def chat(request: Request):
+    """
+    Reply to a chat message about a submitted directory
+
+    Body: { message, sessionId? } - sessionId is the one /submit-directory
+    returned. With Accept: text/event-stream the reply is streamed as
+    "token" events followed by one "done" event; otherwise it is returned
+    whole as JSON.
+    """
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+
+    message = body.get("message")
+    if not isinstance(message, str) or not message.strip():
+        raise HTTPException(status_code=400, detail="message (string) is required")
+
+    session = await chat_store.get_or_create(body.get("sessionId"))
+    logger.info("💬 Chat message for session %s (%s chars)", session.id, len(message))
+
+    if "text/event-stream" not in request.headers.get("accept", ""):
+        reply = "".join([token async for token in chat_store.stream_reply(session, message)])
+        return {
+            "success": True,
+            "sessionId": session.id,
+            "message": reply.strip(),
+            "timestamp": datetime.now().isoformat(),
+        }
+
+    async def event_stream():
+        parts = []
+        async for token in chat_store.stream_reply(session, message):
+            parts.append(token)
+            yield f"event: token\ndata: {json.dumps({'text': token})}\n\n"
+        done = {
+            "sessionId": session.id,
+            "message": "".join(parts).strip(),
+            "timestamp": datetime.now().isoformat(),
+        }
+        yield f"event: done\ndata: {json.dumps(done)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/chat/stats")
+async def chat_stats():
+    return chat_store.stats()
+
+# ========================================
+# CHECK HISTORY
+# ========================================
+def _history_query(
+    status: Optional[str],
+    severity: Optional[str],
+    kind: Optional[str],
+    fileName: Optional[str],
+    q: Optional[str],
+    since: Optional[str],
+    until: Optional[str],
+    order: str,
+) -> HistoryQuery:
+    """Query-string filters -> HistoryQuery (status / kind take comma-separated lists)"""
+    split = lambda value: [v.strip() for v in value.split(",") if v.strip()] if value else []
+    try:
+        return HistoryQuery(status=split(status), severity=severity, kind=split(kind), file_name=fileName,
+                            search=q, since=since, until=until, order=order)
+    except HistoryQueryError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.get("/history")
+async def list_history(
+    status: Optional[str] = None,
+    severity: Optional[str] = None,
+    kind: Optional[str] = None,
+    fileName: Optional[str] = None,
+    q: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    order: str = "desc",
+    cursor: Optional[str] = None,
+    limit: int = 50,
+):
+    """
+    One page of past checks, newest first (order=asc for oldest first)
+
+    Pass the returned nextCursor as ?cursor= for the next page; it is null
+    on the last page. q searches file names and issue text.
+    """
+    query = _history_query(status, severity, kind, fileName, q, since, until, order)
+    try:
+        return await run_in_threadpool(history_store.page, query, cursor, limit)
+    except HistoryQueryError as e:
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.get("/history/export")
+async def export_history(
+    format: str = "ndjson",
+    status: Optional[str] = None,
+    severity: Optional[str] = None,
+    kind: Optional[str] = None,
+    fileName: Optional[str] = None,
+    q: Optional[str] = None,
+    since: Optional[str] = None,
+    until: Optional[str] = None,
+    order: str = "desc",
+):
+    """Every matching check as a streamed NDJSON or CSV download (same filters as /history)"""
+    query = _history_query(status, severity, kind, fileName, q, since, until, order)
+    if format == "csv":
+        rows, media_type = history_store.export_csv(query), "text/csv"
+    elif format == "ndjson":
+        rows, media_type = history_store.export_ndjson(query), "application/x-ndjson"
+    else:
+        raise HTTPException(status_code=400, detail="format must be ndjson or csv")
+    return StreamingResponse(
+        rows,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="history.{format}"'},
+    )
+
+@app.get("/history/{check_id}", response_model=ComplianceReport)
+async def get_history_item(check_id: int, request: Request):
+    report = await run_in_threadpool(history_store.get, check_id)
+    if report is None:
+        raise HTTPException(status_code=404, detail="Check not found")
+    return report_response(report, request)
+
+@app.delete("/history/{check_id}", status_code=204)
+async def delete_history_item(check_id: int):
+    if not await run_in_threadpool(history_store.delete, check_id):
+        raise HTTPException(status_code=404, detail="Check not found")
+
+# ========================================
+# ISSUE EXTRACTION FROM AN LLM RESPONSE
+# ========================================
+@app.post("/extract", response_model=ComplianceReport)
+async def extract_report(request: Request):
+    """
+    Structured ComplianceReport from an agent's free-text llm_response
+
+    Body: { llm_response, fileName?, fileSize?, durationSec? }
+    Replaces the regex parsing the frontend used to do in responseMapper.ts.
+    """
+    body = await request.json()
+    llm_response = body.get("llm_response")
+    if not isinstance(llm_response, str):
+        raise HTTPException(status_code=400, detail="llm_response (string) is required")
+
+    logger.info("🧩 Extracting issues from %s characters", len(llm_response))
+    report = await run_in_threadpool(
+        report_from_llm_response,
+        llm_response,
+        body.get("fileName") or "LLM Response",
+        int(body.get("fileSize") or 0),
+        body.get("durationSec"),
+    )
+    return report_response(report_to_dict(report), request)
+
+# ========================================
+# RESUMABLE CHUNKED UPLOADS
+# ========================================
+def _upload_error(e: UploadSessionError) -> HTTPException:
+    logger.error("❌ Upload session: %s", e)
+    return HTTPException(status_code=e.status_code, detail=str(e))
+
+@app.post("/uploads", status_code=201)
+async def create_upload_session(request: Request):
+    """
+    Start a resumable upload
+
+    Body: { fileName, fileSize, contentType?, chunkSize?, sha256? }
+    """
+    body = await request.json()
+    try:
+        session = await run_in_threadpool(
+            upload_store.create,
+            file_name=body.get("fileName") or "upload",
+            file_size=int(body.get("fileSize") or 0),
+            content_type=body.get("contentType"),
+            chunk_size=body.get("chunkSize"),
+            sha256=body.get("sha256"),
+        )
+    except UploadSessionError as e:
+        raise _upload_error(e)
+    return session.to_dict()
+
+@app.get("/uploads/{upload_id}")
+async def get_upload_session(upload_id: str):
+    """Which chunks (and byte ranges) the server already has"""
+    try:
+        return upload_store.get(upload_id).to_dict()
+    except UploadSessionError as e:
+        raise _upload_error(e)
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def put_upload_chunk(upload_id: str, index: int, request: Request):
+    """Raw chunk bytes as the body; optional X-Chunk-SHA256 header is verified"""
+    try:
+        session = await upload_store.write_chunk(
+            upload_id,
+            index,
+            request.stream(),
+            checksum=request.headers.get("x-chunk-sha256"),
+        )
+    except UploadSessionError as e:
+        raise _upload_error(e)
+    return {
+        "index": index,
+        "receivedCount": len(session.received),
+        "chunkCount": session.chunk_count,
+        "complete": len(session.received) == session.chunk_count,
+    }
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_upload_session(upload_id: str, request: Request, job: bool = False):
+    """
+    Verify the assembled file and run it through the normal check
+
+    Returns the ComplianceReport, or a job (see /jobs) when ?job=true.
+    A 503 for a full job queue leaves the session as it is, so the client
+    can retry the complete call.
+    """
+    try:
+        if job:
+            # Before hashing the whole file for nothing
+            job_manager.ensure_capacity()
+        upload = await upload_store.finalize(upload_id)
+    except UploadSessionError as e:
+        raise _upload_error(e)
+    except TooManyJobs as e:
+        raise _jobs_full(e)
+
+    logger.info("📦 Upload %s complete: %s (%d bytes)", upload_id, upload.filename, upload.size)
+    if job:
+        upload.close()
+        # Checked again after the await above; from here to submit() nothing yields,
+        # so the queue cannot fill up before the file is moved and submitted
+        try:
+            job_manager.ensure_capacity()
+        except TooManyJobs as e:
+            raise _jobs_full(e)
+        # Move (not copy) the assembled file to where job workers read it
+        path = upload_path_for(uuid.uuid4().hex)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(upload_store.data_path(upload_id), path)
+        upload_store.discard(upload_id)
+        queued = await job_manager.submit(key_for_upload(upload.sha256), CheckInput.from_upload(upload, path))
+        return {
+            "jobId": queued.id,
+            "status": queued.status,
+            "statusUrl": f"/jobs/{queued.id}",
+            "eventsUrl": f"/jobs/{queued.id}/events",
+        }
+
+    try:
+        response, cached = await _check_upload(upload)
+    finally:
+        upload.close()
+        upload_store.discard(upload_id)
+    return report_response(response, request)
+
 # ========================================
 # ALTERNATIVE: SEPARATE ENDPOINTS
 # ========================================
 # If you prefer separate endpoints for different types:
 
 @app.post("/run/file")
-async def run_file_check(file: UploadFile = File(...)):
+async def run_file_check(request: Request, file: UploadFile = File(...)):
     """Separate endpoint for file uploads"""
-    contents = await file.read()
-    return {
-        "summary": {"status": "pass", "issuesCount": 0, "recommendationsCount": 0, "score": 95},
-        "issues": [],
-        "metadata": {
-            "fileName": file.filename,
-            "fileSize": len(contents),
-            "checkedAt": datetime.now().isoformat()
-        }
-    }
+    try:
+        upload = await ingest_upload(file)
+    except UploadTooLarge as e:
+        logger.error("❌ %s", e)
+        raise HTTPException(status_code=413, detail=str(e))
+    try:
+        bind_log_context(kind="file", fileName=upload.filename, sha256=upload.sha256)
+        response, cached = await _check_upload(upload)
+    finally:
+        upload.close()
+    return report_response(response, request)
 
 @app.post("/run/url")
-async def run_url_check(url: str):
+async def run_url_check(url: str, request: Request):
     """Separate endpoint for URL checks"""
-    return {
-        "summary": {"status": "pass", "issuesCount": 0, "recommendationsCount": 0, "score": 92},
-        "issues": [],
-        "metadata": {
-            "fileName": "URL Check",
-            "fileSize": 0,
-            "checkedAt": datetime.now().isoformat()
-        }
-    }
+    bind_log_context(kind="url")
+    response, cached = await _check_url(url)
+    return report_response(response, request)
 
 # ========================================
 # RUN SERVER
 # ========================================
 if __name__ == "__main__":
     import uvicorn
+    configure_logging()
     logger.info("🚀 Starting Media Compliance Checker API...")
     logger.info("📍 API will be available at: http://localhost:8000")
     logger.info("📖 Documentation at: http://localhost:8000/docs")
@@ -288,20 +1005,48 @@ if __name__ == "__main__":
         app,
         host="0.0.0.0",
         port=8000,
-        log_level="info"
+        log_level="info",
+        # Keep uvicorn's own loggers on the queue instead of its blocking handlers
+        log_config=None,
     )
 
 # ========================================
 # TESTING INSTRUCTIONS
 # ========================================
 """
-1. Save this file as main.py
+1. Save this file as main.py (keep the backend/ folder next to it)
 
 2. Install dependencies:
-   pip install fastapi uvicorn python-multipart pydantic
+   pip install fastapi uvicorn python-multipart pydantic httpx
+
+   Optional: pip install pypdf numpy pillow (PDF text checks, incremental re-checks,
+   near-duplicate texts and images, WAV audio analysis)
+
+   Optional: pip install orjson brotli (faster report encoding, br compression)
+
+   Optional: ffmpeg on the PATH enables per-segment video analysis
+   (timestamped black-frame / silence / clipping issues)
 
 3. Run the server:
    python main.py
+
+   Set MEDIA_CHECKER_LOG_FORMAT=json for JSON-lines logs (one object per
+   line, with requestId and the other bound request fields)
+
+   Set MEDIA_CHECKER_MAX_FILE_CHECKS (default 4) to the number of uploads
+   this machine can check at once; more wait briefly or get a 429 with
+   Retry-After (GET /admission shows the queues)
+
+   Set MEDIA_CHECKER_AGENTS="Chat_agent=http://host:port/health,..." to
+   choose the agents /check-agents probes
+
+   Set MEDIA_CHECKER_DIRECTORY_ROOTS (os.pathsep-separated, e.g.
+   /srv/media:/data/uploads) to the directories /submit-directory may
+   index; it refuses every directory while this is unset
+
+   Set MEDIA_CHECKER_MAX_UPLOAD_SESSIONS (default 32) and
+   MEDIA_CHECKER_MAX_UPLOAD_RESERVED_BYTES (default 4 GB) to bound the
+   disk space open resumable uploads (POST /uploads) may reserve
    
    OR
    
@@ -0,0 +1,6 @@
+"""
+Media Compliance Checker - backend building blocks
+
+The FastAPI app lives in BACKEND-FINAL-FIX.py (copy it as main.py).
+Keep this folder next to it so the imports resolve.
+"""
@@ -0,0 +1,384 @@
+"""
+ADMISSION CONTROL
+
+Nothing used to limit how many checks ran at once: 200 concurrent 500 MB
+uploads were all accepted, all spooled to disk and all analyzed together,
+and every one of them got slow. This middleware decides, before the body is
+read, whether a check request runs now, waits, or is turned away:
+
+- Check requests (/run, /run/*, /jobs and POST /uploads/{id}/complete)
+  go through it; everything else passes straight by.
+- Each input type (file, url, text, batch) is a lane with its own
+  concurrency limit and queue depth (LANES). Requests beyond the limit wait
+  in the lane's queue, highest priority first, then oldest first.
+- File uploads also count their Content-Length against MAX_QUEUED_BYTES.
+  A request that would go over, or whose Content-Length alone is over it,
+  is refused without reading a byte of it.
+- A full queue sheds low-priority requests first: a higher-priority arrival
+  takes the place of the newest lower-priority waiter, which gets the 429.
+  Low-priority requests may only fill LOW_PRIORITY_QUEUE_SHARE of a queue.
+- Requests are refused up front if their estimated queue wait is over
+  MAX_QUEUE_WAIT_SECONDS, and give up after waiting that long. Admitted
+  requests therefore never queue for long, so their latency stays flat
+  however much load is refused.
+- Refusals are 429s with Retry-After set from the lane's queue length and
+  its average service time. Job-mode requests (/jobs, ?job=true) only
+  queue a job and return, so they hold a slot but leave the average alone.
+
+Priority comes from the X-Priority header or ?priority= (low, normal,
+high); batches default to low. JSON bodies are small, so they are read up
+front to tell URL checks from text checks, then replayed to the endpoint.
+
+state() (GET /admission and the media_checker_admission_* metrics) shows
+running and queued requests per lane, for autoscaling.
+"""
+
+import asyncio
+import heapq
+import itertools
+import json
+import logging
+import math
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+from urllib.parse import parse_qs
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.ingest import MAX_UPLOAD_BYTES
+from backend.metrics import ADMISSION_QUEUED, ADMISSION_REJECTED, ADMISSION_RUNNING
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+# kind -> (max running, max queued, initial guess at seconds per request)
+LANES = {
+    "file": (int(os.environ.get("MEDIA_CHECKER_MAX_FILE_CHECKS", "4")), 16, 5.0),
+    "url": (16, 64, 1.0),
+    "text": (8, 64, 0.5),
+    "batch": (2, 4, 30.0),
+}
+# Request paths -> kind (None: decided from the body)
+ADMITTED_PATHS = {
+    "/run": None,
+    "/run/file": "file",
+    "/run/url": "url",
+    "/run/batch": "batch",
+    "/jobs": None,
+}
+# Paths with an id in them
+ADMITTED_PATTERNS = [
+    (re.compile(r"/uploads/[^/]+/complete"), "file"),
+]
+# Paths that only queue a job (as do the others with ?job=true)
+JOB_MODE_PATHS = {"/jobs"}
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+DEFAULT_PRIORITY = {"batch": "low"}
+
+MAX_QUEUED_BYTES = int(os.environ.get("MEDIA_CHECKER_MAX_QUEUED_BYTES", str(2 * 1024 * 1024 * 1024)))
+MAX_QUEUE_WAIT_SECONDS = float(os.environ.get("MEDIA_CHECKER_MAX_QUEUE_WAIT_SECONDS", "30"))
+LOW_PRIORITY_QUEUE_SHARE = 0.5
+JSON_PEEK_BYTES = 256 * 1024        # JSON bodies up to this are read to tell url from text
+SERVICE_TIME_ALPHA = 0.2            # weight of the newest request in the average service time
+
+
+class Rejected(Exception):
+    """A request turned away; becomes a 429 with Retry-After"""
+    status_code = 429
+
+    def __init__(self, reason: str, retry_after: int, detail: str):
+        super().__init__(detail)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+# ========================================
+# LANES
+# ========================================
+@dataclass(order=True)
+class _Waiter:
+    priority: int
+    seq: int
+    nbytes: int = field(compare=False)
+    future: asyncio.Future = field(compare=False)
+
+
+class Lane:
+    """Concurrency slots + a priority queue for one input type"""
+
+    def __init__(self, kind: str, max_running: int, max_queued: int, service_seconds: float):
+        self.kind = kind
+        self.max_running = max_running
+        self.max_queued = max_queued
+        self.service_seconds = service_seconds
+        self.running = 0
+        self.queue: list[_Waiter] = []
+        self.admitted = 0
+        self.rejected: dict[str, int] = {}
+
+    def estimated_wait(self, ahead: Optional[int] = None) -> float:
+        """Seconds until a request with `ahead` requests in front of it starts"""
+        if ahead is None:
+            ahead = len(self.queue)
+        if self.running < self.max_running and ahead == 0:
+            return 0.0
+        return (ahead + 1) * self.service_seconds / self.max_running
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil(self.estimated_wait()))
+
+    def record_service_time(self, seconds: float) -> None:
+        self.service_seconds += SERVICE_TIME_ALPHA * (seconds - self.service_seconds)
+
+    def count_rejection(self, reason: str) -> None:
+        self.rejected[reason] = self.rejected.get(reason, 0) + 1
+        ADMISSION_REJECTED.inc(1, self.kind, reason)
+
+    def state(self) -> dict:
+        queued: dict[str, int] = {}
+        for waiter in self.queue:
+            name = _priority_name(waiter.priority)
+            queued[name] = queued.get(name, 0) + 1
+        return {
+            "running": self.running,
+            "maxRunning": self.max_running,
+            "queued": len(self.queue),
+            "queuedByPriority": queued,
+            "maxQueued": self.max_queued,
+            "avgServiceSeconds": round(self.service_seconds, 3),
+            "estimatedWaitSeconds": round(self.estimated_wait(), 3),
+            "admitted": self.admitted,
+            "rejected": dict(self.rejected),
+        }
+
+
+def _priority_name(priority: int) -> str:
+    return next(name for name, value in PRIORITIES.items() if value == priority)
+
+
+class AdmissionController:
+    """All lanes plus the shared upload byte budget (single event loop, no locks)"""
+
+    def __init__(self, lanes: dict = LANES, max_queued_bytes: int = MAX_QUEUED_BYTES,
+                 max_wait: float = MAX_QUEUE_WAIT_SECONDS):
+        self.lanes = {kind: Lane(kind, *limits) for kind, limits in lanes.items()}
+        self.max_queued_bytes = max_queued_bytes
+        self.max_wait = max_wait
+        self.admitted_bytes = 0
+        self._seq = itertools.count()
+
+    async def acquire(self, kind: str, priority: int, nbytes: int = 0) -> None:
+        """Wait for a slot in the kind's lane, or raise Rejected"""
+        lane = self.lanes[kind]
+        if nbytes and self.admitted_bytes + nbytes > self.max_queued_bytes:
+            lane.count_rejection("bytes")
+            raise Rejected("bytes", lane.retry_after(),
+                           f"Too much upload data in progress ({self.admitted_bytes // (1024 * 1024)} MB), "
+                           "try again shortly")
+
+        if lane.running < lane.max_running and not lane.queue:
+            self._start(lane, nbytes)
+            return
+
+        ahead = sum(1 for waiter in lane.queue if waiter.priority <= priority)
+        if lane.estimated_wait(ahead) > self.max_wait:
+            lane.count_rejection("wait")
+            raise Rejected("wait", lane.retry_after(), f"Too many {kind} checks queued, try again shortly")
+        if not self._make_room(lane, priority):
+            lane.count_rejection("queue_full")
+            raise Rejected("queue_full", lane.retry_after(), f"Too many {kind} checks queued, try again shortly")
+
+        waiter = _Waiter(priority, next(self._seq), nbytes, asyncio.get_running_loop().create_future())
+        heapq.heappush(lane.queue, waiter)
+        self.admitted_bytes += nbytes
+        ADMISSION_QUEUED.inc(1, kind)
+        try:
+            await asyncio.wait({waiter.future}, timeout=self.max_wait)
+        except asyncio.CancelledError:
+            # Client went away while waiting - give the slot on if we were just handed it
+            if waiter.future.done() and waiter.future.result():
+                self.release(kind, nbytes, None)
+            else:
+                self._dequeue(lane, waiter)
+            raise
+        if not waiter.future.done():
+            self._dequeue(lane, waiter)
+            lane.count_rejection("timeout")
+            raise Rejected("timeout", lane.retry_after(), f"Waited too long for a free {kind} check slot")
+        if not waiter.future.result():
+            lane.count_rejection("shed")
+            raise Rejected("shed", lane.retry_after(), "Shed to make room for higher-priority checks")
+
+    def release(self, kind: str, nbytes: int, seconds: Optional[float]) -> None:
+        """Free a slot and hand it to the next waiter"""
+        lane = self.lanes[kind]
+        lane.running -= 1
+        ADMISSION_RUNNING.dec(1, kind)
+        self.admitted_bytes -= nbytes
+        if seconds is not None:
+            lane.record_service_time(seconds)
+        while lane.queue and lane.running < lane.max_running:
+            waiter = heapq.heappop(lane.queue)
+            ADMISSION_QUEUED.dec(1, kind)
+            # Its bytes are already counted in admitted_bytes
+            lane.running += 1
+            lane.admitted += 1
+            ADMISSION_RUNNING.inc(1, kind)
+            waiter.future.set_result(True)
+
+    def state(self) -> dict:
+        return {
+            "lanes": {kind: lane.state() for kind, lane in self.lanes.items()},
+            "admittedBytes": self.admitted_bytes,
+            "maxQueuedBytes": self.max_queued_bytes,
+            "maxQueueWaitSeconds": self.max_wait,
+        }
+
+    # ---------- internals ----------
+
+    def _start(self, lane: Lane, nbytes: int) -> None:
+        lane.running += 1
+        lane.admitted += 1
+        self.admitted_bytes += nbytes
+        ADMISSION_RUNNING.inc(1, lane.kind)
+
+    def _make_room(self, lane: Lane, priority: int) -> bool:
+        """True if a request of this priority may queue (shedding a lower-priority waiter if needed)"""
+        if priority == PRIORITIES["low"]:
+            low_queued = sum(1 for waiter in lane.queue if waiter.priority == priority)
+            if low_queued >= lane.max_queued * LOW_PRIORITY_QUEUE_SHARE:
+                return False
+        if len(lane.queue) < lane.max_queued:
+            return True
+        # Newest waiter of the lowest priority below ours
+        victim = max((waiter for waiter in lane.queue if waiter.priority > priority),
+                     key=lambda waiter: (waiter.priority, waiter.seq), default=None)
+        if victim is None:
+            return False
+        self._dequeue(lane, victim)
+        victim.future.set_result(False)
+        return True
+
+    def _dequeue(self, lane: Lane, waiter: _Waiter) -> None:
+        if waiter in lane.queue:
+            lane.queue.remove(waiter)
+            heapq.heapify(lane.queue)
+            self.admitted_bytes -= waiter.nbytes
+            ADMISSION_QUEUED.dec(1, lane.kind)
+
+
+# ========================================
+# MIDDLEWARE
+# ========================================
+class AdmissionControlMiddleware:
+    """Admit, queue or refuse check requests before their bodies are read"""
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        kind = _admitted_kind(scope["path"]) if scope["type"] == "http" and scope["method"] == "POST" else ""
+        if kind == "":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name.decode("latin-1"): value.decode("latin-1") for name, value in scope.get("headers", [])}
+        try:
+            declared = int(headers.get("content-length", ""))
+        except ValueError:
+            declared = None
+
+        if kind is None:
+            content_type = headers.get("content-type", "")
+            if content_type.startswith("multipart/form-data"):
+                kind = "file"
+            elif declared is not None and declared <= JSON_PEEK_BYTES:
+                body, receive = await _buffer_body(receive)
+                kind = _json_kind(body)
+            else:
+                kind = "text"
+
+        # Chunked uploads (no Content-Length) are counted at the largest size allowed
+        nbytes = 0
+        if kind == "file":
+            nbytes = declared if declared is not None else MAX_UPLOAD_BYTES
+
+        query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+        priority_name = (headers.get("x-priority") or (query.get("priority") or [""])[0]).lower()
+        priority = PRIORITIES.get(priority_name, PRIORITIES[DEFAULT_PRIORITY.get(kind, "normal")])
+
+        try:
+            await self.controller.acquire(kind, priority, nbytes)
+        except Rejected as e:
+            logger.warning("🚦 Refused %s check (%s): retry in %ss", kind, e.reason, e.retry_after)
+            response = JSONResponse(status_code=Rejected.status_code, content={"detail": str(e)},
+                                    headers={"Retry-After": str(e.retry_after)})
+            await response(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        timed = not _job_mode(scope["path"], query)
+        completed = False
+        try:
+            await self.app(scope, receive, send)
+            completed = True
+        finally:
+            # Failed requests and job submissions say little about how long a check takes
+            seconds = time.perf_counter() - started if completed and timed else None
+            self.controller.release(kind, nbytes, seconds)
+
+
+def _admitted_kind(path: str) -> Optional[str]:
+    """The path's kind (None: decided from the body), or "" if it is not admission-controlled"""
+    if path in ADMITTED_PATHS:
+        return ADMITTED_PATHS[path]
+    for pattern, kind in ADMITTED_PATTERNS:
+        if pattern.fullmatch(path):
+            return kind
+    return ""
+
+
+def _job_mode(path: str, query: dict) -> bool:
+    """Whether the request only queues a job and returns"""
+    return path in JOB_MODE_PATHS or (query.get("job") or [""])[0].lower() in ("1", "true", "yes", "on")
+
+
+async def _buffer_body(receive: Receive) -> tuple[bytes, Receive]:
+    """Read the whole (small) body and return a receive that replays it"""
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] != "http.request":
+            # Disconnected - let the app see it
+            async def replay_disconnect() -> Message:
+                return message
+            return b"", replay_disconnect
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            break
+    body = b"".join(chunks)
+    sent = False
+
+    async def replay() -> Message:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        return await receive()
+
+    return body, replay
+
+
+def _json_kind(body: bytes) -> str:
+    try:
+        data = json.loads(body)
+    except ValueError:
+        return "text"
+    return "url" if isinstance(data, dict) and data.get("url") else "text"
@@ -0,0 +1,215 @@
+"""
+AGENT HEALTH REGISTRY
+
+Status of the agents shown on the Agent Discovery page (POST /check-agents).
+Probing every agent in the request meant each click waited for the slowest
+agent - or for a timeout when one was down.
+
+- Agents are registered by name and health URL (MEDIA_CHECKER_AGENTS,
+  "Name=url,Name=url").
+- run_forever() probes all agents concurrently every REFRESH_SECONDS over
+  one shared connection pool; each probe has its own PROBE_TIMEOUT_SECONDS,
+  so one hung agent doesn't hold up the others.
+- After each round the snapshot is rebuilt once; /check-agents returns that
+  prebuilt dict, so answering costs the same however many agents there are.
+- Each agent keeps its last latency, when it was last seen healthy and
+  error counts (total and consecutive).
+- changes() yields the snapshot whenever an agent's status flips, for the
+  Server-Sent Events stream at GET /check-agents/events.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import AsyncIterator, Optional
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+DEFAULT_AGENTS = "Chat_agent=http://localhost:8001/health,Media_agent=http://localhost:8002/health"
+REFRESH_SECONDS = float(os.environ.get("MEDIA_CHECKER_AGENT_REFRESH_SECONDS", "10"))
+PROBE_TIMEOUT_SECONDS = float(os.environ.get("MEDIA_CHECKER_AGENT_TIMEOUT_SECONDS", "2"))
+PING_SECONDS = 15               # keep-alive comment on idle event streams
+
+ACTIVE = "Active"
+NOT_ACTIVE = "Not Active"
+
+
+def parse_agents(spec: str) -> dict[str, str]:
+    """"Chat_agent=http://...,Media_agent=http://..." -> {name: url}"""
+    agents = {}
+    for entry in spec.split(","):
+        name, sep, url = entry.strip().partition("=")
+        if name and sep and url:
+            agents[name.strip()] = url.strip()
+    return agents
+
+
+# ========================================
+# AGENT STATUS
+# ========================================
+@dataclass
+class AgentStatus:
+    name: str
+    url: str
+    status: str = NOT_ACTIVE
+    checked_at: Optional[float] = None
+    last_seen_at: Optional[float] = None    # last successful probe
+    latency_ms: Optional[float] = None      # of the last successful probe
+    error_count: int = 0
+    consecutive_errors: int = 0
+    last_error: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "agentName": self.name,
+            "status": self.status,
+            "url": self.url,
+            "checkedAt": _iso(self.checked_at),
+            "lastSeenAt": _iso(self.last_seen_at),
+            "latencyMs": self.latency_ms,
+            "errorCount": self.error_count,
+            "consecutiveErrors": self.consecutive_errors,
+            "lastError": self.last_error,
+        }
+
+
+def _iso(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp is not None else None
+
+
+# ========================================
+# REGISTRY
+# ========================================
+class AgentRegistry:
+    """Concurrent background probes -> one cached snapshot"""
+
+    def __init__(
+        self,
+        agents: Optional[dict[str, str]] = None,
+        refresh_seconds: float = REFRESH_SECONDS,
+        probe_timeout: float = PROBE_TIMEOUT_SECONDS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        if agents is None:
+            agents = parse_agents(os.environ.get("MEDIA_CHECKER_AGENTS", DEFAULT_AGENTS))
+        self.refresh_seconds = refresh_seconds
+        self.probe_timeout = probe_timeout
+        self._agents = {name: AgentStatus(name, url) for name, url in agents.items()}
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._version = 0
+        self._changed = asyncio.Event()
+        self._refreshed = asyncio.Event()
+        self._refresh_lock = asyncio.Lock()
+        self._rounds = 0
+        self._snapshot = self._build_snapshot()
+
+    def snapshot(self) -> dict:
+        """The status of every agent as of the last probe round (not a copy - don't modify)"""
+        return self._snapshot
+
+    async def wait_ready(self, timeout: float) -> dict:
+        """The snapshot, after waiting up to timeout for the first probe round"""
+        if not self._refreshed.is_set():
+            try:
+                await asyncio.wait_for(self._refreshed.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._snapshot
+
+    async def refresh(self) -> dict:
+        """Probe every agent now (concurrent callers share one round)"""
+        if self._refresh_lock.locked():
+            async with self._refresh_lock:
+                return self._snapshot
+        async with self._refresh_lock:
+            before = {name: agent.status for name, agent in self._agents.items()}
+            await asyncio.gather(*(self._probe(agent) for agent in self._agents.values()))
+            self._rounds += 1
+            flipped = [name for name, agent in self._agents.items() if agent.status != before[name]]
+            if flipped:
+                self._version += 1
+                changes = ", ".join(f"{name} -> {self._agents[name].status}" for name in flipped)
+                logger.info("🤖 Agent status changed: %s", changes)
+            self._snapshot = self._build_snapshot()
+            self._refreshed.set()
+            # Wake the subscribers (they re-check the version)
+            self._changed.set()
+            self._changed = asyncio.Event()
+            return self._snapshot
+
+    async def run_forever(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error("❌ Agent probe round failed: %s", e)
+            await asyncio.sleep(self.refresh_seconds)
+
+    async def changes(self, last_version: int = -1) -> AsyncIterator[Optional[dict]]:
+        """
+        Yield the snapshot now and whenever an agent's status changes
+
+        Yields None after PING_SECONDS without a change (a keep-alive).
+        """
+        while True:
+            if self._version != last_version and self._refreshed.is_set():
+                last_version = self._version
+                yield self._snapshot
+            changed = self._changed
+            try:
+                await asyncio.wait_for(changed.wait(), timeout=PING_SECONDS)
+            except asyncio.TimeoutError:
+                yield None
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---------- internals ----------
+
+    async def _probe(self, agent: AgentStatus) -> None:
+        started = time.perf_counter()
+        try:
+            response = await asyncio.wait_for(self._get_client().get(agent.url), self.probe_timeout)
+            response.raise_for_status()
+        except (httpx.HTTPError, asyncio.TimeoutError) as e:
+            agent.status = NOT_ACTIVE
+            agent.error_count += 1
+            agent.consecutive_errors += 1
+            if isinstance(e, httpx.HTTPStatusError):
+                agent.last_error = f"HTTP {e.response.status_code}"
+            else:
+                agent.last_error = str(e) or type(e).__name__
+        else:
+            agent.status = ACTIVE
+            agent.latency_ms = round((time.perf_counter() - started) * 1000, 1)
+            agent.last_seen_at = time.time()
+            agent.consecutive_errors = 0
+            agent.last_error = None
+        agent.checked_at = time.time()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=httpx.Timeout(self.probe_timeout),
+                limits=httpx.Limits(max_connections=max(4, len(self._agents))),
+            )
+        return self._client
+
+    def _build_snapshot(self) -> dict:
+        return {
+            "agents": [agent.to_dict() for agent in self._agents.values()],
+            "version": self._version,
+            "checkedAt": datetime.now().isoformat() if self._rounds else None,
+        }
@@ -0,0 +1,286 @@
+"""
+COMPLIANCE ANALYSIS
+
+One function per input type. These are still mock checks - replace the
+bodies with your actual logic. Bump ANALYSIS_VERSION whenever the results
+would change so cached reports from the old logic are not reused.
+
+run_check() is the entry point for worker processes: it takes a picklable
+CheckInput and returns the report as a plain dict.
+"""
+
+import logging
+import os
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Iterator, Optional
+
+from backend.documents import DocumentError, can_extract, scan_document
+from backend.audio import AudioError, analyze_wav, audio_analysis_available, is_wav
+from backend.fetcher import FetchedPage, page_text, youtube_video_id
+from backend.images import check_image
+from backend.ingest import IngestedUpload
+from backend.metrics import STAGE_SECONDS
+from backend.models import ComplianceReport, Metadata, Summary, build_report, model_to_dict, report_to_dict
+from backend.probe import ProbeError, probe_file
+from backend.scanner import scan_text_for_issues
+from backend.segments import analyze_segments, segment_analysis_available
+from backend.scoring import build_summary
+
+# progress(stage, fraction) - fraction is 0.0-1.0 for the whole check
+ProgressCallback = Callable[[str, float], None]
+# on_issues(issues) - issues (as dicts) found so far, before the report is done
+IssuesCallback = Callable[[list], None]
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_VERSION = "10"
+
+DOCUMENT_TYPES = [
+    'application/pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/msword',
+]
+
+
+def is_youtube_url(url: str) -> bool:
+    return youtube_video_id(url) is not None
+
+
+def probe_metadata(upload: IngestedUpload) -> dict:
+    """Container fields for Metadata, or {} if the file can't be probed"""
+    content_type = upload.content_type or ""
+    if not content_type.startswith(("video/", "audio/")):
+        return {}
+    try:
+        probe = probe_file(upload.file)
+    except (ProbeError, OSError) as e:
+        logger.info("Could not probe %s: %s", upload.filename, e)
+        return {}
+
+    video = probe.video
+    return {
+        "durationSec": round(probe.duration_sec) if probe.duration_sec is not None else None,
+        "container": probe.container,
+        "codecs": probe.codecs,
+        "width": video.width if video else None,
+        "height": video.height if video else None,
+        "streamCount": probe.stream_count,
+    }
+
+
+def analyze_upload(
+    upload: IngestedUpload,
+    path: Optional[str] = None,
+    progress: Optional[ProgressCallback] = None,
+    on_issues: Optional[IssuesCallback] = None,
+) -> ComplianceReport:
+    """Check an uploaded video, audio file, image or document"""
+    content_type = upload.content_type or ""
+    with STAGE_SECONDS.time("type_detection", "file"):
+        metadata = probe_metadata(upload)
+
+    summary = Summary(
+        status="pass",
+        issuesCount=0,
+        recommendationsCount=0,
+        score=95
+    )
+    issues = []
+    duration = metadata.get("durationSec")
+    if content_type.startswith("video/") and duration and segment_analysis_available():
+        def segment_progress(done: int, total: int) -> None:
+            if progress:
+                progress("segments", 0.1 + 0.8 * done / total)
+
+        with _local_path(upload, path) as video_path:
+            segments = analyze_segments(video_path, duration, upload.sha256 or None, segment_progress)
+        issues = segments.issues
+        summary = build_summary(issues)
+        metadata["reusedFraction"] = round(segments.reused_fraction, 3)
+
+    elif is_wav(content_type) and audio_analysis_available():
+        # Streamed in fixed-size blocks - memory does not grow with the track length
+        try:
+            audio = analyze_wav(path or upload.file)
+            metadata.update(audio.metadata_fields())
+            issues = audio.issues
+            summary = build_summary(issues)
+        except AudioError as e:
+            logger.warning("⚠️ %s: %s", upload.filename, e)
+
+    elif content_type.startswith("image/"):
+        # Metadata segments + a thumbnail-scale decode - never the full-size pixels
+        fields, issues = check_image(path or upload.file)
+        metadata.update(fields)
+        summary = build_summary(issues)
+
+    elif can_extract(content_type):
+        reported = [-1]
+
+        def page_progress(done: int, total: Optional[int]) -> None:
+            # At most one update per percent, not one per page
+            percent = done * 100 // total if total else 0
+            if progress and total and percent > reported[0]:
+                reported[0] = percent
+                progress("extracting", 0.1 + 0.8 * done / total)
+
+        def found(new_issues: list) -> None:
+            if on_issues:
+                on_issues([model_to_dict(issue) for issue in new_issues])
+
+        try:
+            with _local_path(upload, path) as document_path:
+                issues, _ = scan_document(document_path, content_type, on_issues=found, progress=page_progress)
+            summary = build_summary(issues)
+        except DocumentError as e:
+            logger.warning("⚠️ %s: %s", upload.filename, e)
+            issues = []
+
+    return build_report(
+        summary=summary,
+        issues=issues,
+        metadata=Metadata(
+            fileName=upload.filename,
+            fileSize=upload.size,
+            checkedAt=datetime.now().isoformat(),
+            **metadata
+        )
+    )
+
+
+@contextmanager
+def _local_path(upload: IngestedUpload, path: Optional[str]) -> Iterator[str]:
+    """A real file path for the upload (ffmpeg and pool workers can't read a spool)"""
+    if path:
+        yield path
+        return
+    fd, tmp = tempfile.mkstemp(prefix="upload-")
+    os.close(fd)
+    try:
+        upload.save_to(tmp)
+        yield tmp
+    finally:
+        os.unlink(tmp)
+
+
+def analyze_url(url: str, page: Optional[FetchedPage] = None) -> ComplianceReport:
+    """
+    Check a YouTube video or article URL
+
+    page is what backend.fetcher fetched for the URL; without it (the fetch
+    failed) only the URL itself is reported on.
+    """
+    if page is None:
+        return build_report(
+            summary=Summary(
+                status="pass",
+                issuesCount=0,
+                recommendationsCount=0,
+                score=92
+            ),
+            issues=[],
+            metadata=url_metadata(url, page)
+        )
+
+    _, text = page_text(page)
+    issues = scan_text_for_issues(text) if text else []
+    return build_report(
+        summary=build_summary(issues),
+        issues=issues,
+        metadata=url_metadata(url, page)
+    )
+
+
+def url_metadata(url: str, page: Optional[FetchedPage] = None) -> Metadata:
+    is_youtube = is_youtube_url(url)
+    default_name = "YouTube Video" if is_youtube else "URL Check"
+    return Metadata(
+        fileName=(page_text(page)[0] if page is not None else None) or default_name,
+        fileSize=len(page.body) if page is not None else 0,
+        durationSec=180 if is_youtube else None,
+        checkedAt=datetime.now().isoformat()
+    )
+
+
+def analyze_text(text: str) -> ComplianceReport:
+    """Check pasted text against the phrase rule set"""
+    issues = scan_text_for_issues(text)
+    return build_report(
+        summary=build_summary(issues),
+        issues=issues,
+        metadata=text_metadata(text)
+    )
+
+
+def text_metadata(text: str) -> Metadata:
+    return Metadata(
+        fileName="Text Check",
+        fileSize=len(text),
+        durationSec=None,
+        checkedAt=datetime.now().isoformat()
+    )
+
+
+# ========================================
+# WORKER ENTRY POINT
+# ========================================
+@dataclass
+class CheckInput:
+    """Everything a worker process needs to run one check"""
+    kind: str                               # "file", "url" or "text"
+    path: Optional[str] = None              # saved upload (kind == "file")
+    file_name: Optional[str] = None
+    declared_type: Optional[str] = None
+    sniffed_type: Optional[str] = None
+    file_size: int = 0
+    sha256: Optional[str] = None
+    url: Optional[str] = None
+    page: Optional[FetchedPage] = None      # fetched in the API process (kind == "url")
+    text: Optional[str] = None
+    keep_file: bool = False                 # path is the user's own file, not a temp copy
+
+    @classmethod
+    def from_upload(cls, upload: IngestedUpload, path: str) -> "CheckInput":
+        return cls(
+            kind="file",
+            path=path,
+            file_name=upload.filename,
+            declared_type=upload.declared_type,
+            sniffed_type=upload.sniffed_type,
+            file_size=upload.size,
+            sha256=upload.sha256,
+        )
+
+
+def run_check(
+    check: CheckInput,
+    progress: Optional[ProgressCallback] = None,
+    on_issues: Optional[IssuesCallback] = None,
+) -> dict:
+    """Run one check end to end and return the report as a dict"""
+    report_progress = progress or (lambda stage, fraction: None)
+
+    report_progress("analyzing", 0.1)
+    if check.kind == "file":
+        with open(check.path, "rb") as f:
+            upload = IngestedUpload(
+                file=f,
+                filename=check.file_name or "upload",
+                declared_type=check.declared_type,
+                sniffed_type=check.sniffed_type,
+                size=check.file_size,
+                sha256=check.sha256 or "",
+            )
+            report = analyze_upload(upload, check.path, report_progress, on_issues)
+    elif check.kind == "url":
+        report = analyze_url(check.url, check.page)
+    elif check.kind == "text":
+        report = analyze_text(check.text)
+    else:
+        raise ValueError(f"Unknown check kind: {check.kind}")
+
+    report_progress("serializing", 0.9)
+    return report_to_dict(report)
@@ -0,0 +1,329 @@
+"""
+AUDIO ANALYSIS
+
+Checks a WAV file's samples in fixed-size blocks, so an hour-long recording
+takes the same memory as a ten-second one:
+
+- The RIFF chunks are walked with seek+read to find the fmt and data
+  chunks; the data chunk is then read BLOCK_SECONDS at a time into one
+  reused buffer.
+- Each block is converted to float32 and cut into FRAME_SECONDS analysis
+  frames. Per-frame RMS and clipped-sample counts are computed with NumPy
+  over the whole block at once.
+- Silent frames (RMS below SILENCE_NOISE_DB) and clipped frames are joined
+  into runs as the blocks go by; only the open run is carried over from
+  one block to the next. Runs become the same "silence" / "clipping"
+  Issues (with timestamps) that the video segment analysis reports.
+- Clipped runs less than CLIP_MERGE_GAP_SECONDS apart count as one run
+  (a track that clips on every beat is one issue, not one per beat), runs
+  shorter than CLIP_MIN_SECONDS are ignored, and no more than
+  MAX_ISSUES_PER_SCAN issues are reported per file.
+- Loudness is the RMS level of the non-silent frames. A track that is
+  quiet throughout gets a "quiet" Issue.
+
+PCM 8/16/24/32-bit, 32/64-bit float and WAVE_FORMAT_EXTENSIBLE files are
+supported. NumPy is optional - without it audio files only get the probe
+metadata.
+"""
+
+import logging
+import math
+import struct
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import BinaryIO, Iterator, Optional, Union
+
+from backend.models import Issue
+from backend.scanner import MAX_ISSUES_PER_SCAN
+from backend.segments import CLIPPING_DB, SILENCE_MIN_SECONDS, SILENCE_NOISE_DB, events_to_issues, merge_events
+
+try:
+    import numpy as np
+except ImportError:         # optional - see module docstring
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+WAV_TYPES = {"audio/wav", "audio/x-wav", "audio/wave", "audio/vnd.wave"}
+
+FRAME_SECONDS = 0.05            # RMS / clipping resolution
+BLOCK_SECONDS = 10              # samples read and converted per NumPy pass
+CLIP_MIN_SAMPLES = 3            # clipped samples in a frame before it counts as clipping
+CLIP_MIN_SECONDS = 0.1          # shorter clipping (after merging) is not reported
+CLIP_MERGE_GAP_SECONDS = 1.0    # clipped runs closer than this are one run
+QUIET_DB = -35                  # loudness below this (and not silent) is "too quiet"
+
+_FORMAT_PCM = 1
+_FORMAT_FLOAT = 3
+_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+def audio_analysis_available() -> bool:
+    return np is not None
+
+
+def is_wav(content_type: Optional[str]) -> bool:
+    return (content_type or "") in WAV_TYPES
+
+
+class AudioError(Exception):
+    """The file is not a WAV file this module can read"""
+
+
+# ========================================
+# WAV HEADER
+# ========================================
+@dataclass
+class WavFormat:
+    sample_format: int              # _FORMAT_PCM or _FORMAT_FLOAT
+    channels: int
+    sample_rate: int
+    bits: int
+    data_offset: int
+    data_size: int
+
+    @property
+    def frame_bytes(self) -> int:
+        return self.channels * self.bits // 8
+
+    @property
+    def duration_sec(self) -> float:
+        return self.data_size / self.frame_bytes / self.sample_rate
+
+    @property
+    def codec(self) -> str:
+        if self.sample_format == _FORMAT_FLOAT:
+            return f"pcm_f{self.bits}le"
+        return "pcm_u8" if self.bits == 8 else f"pcm_s{self.bits}le"
+
+
+def read_wav_format(f: BinaryIO) -> WavFormat:
+    """Find the fmt and data chunks (the samples themselves are not read)"""
+    f.seek(0, 2)
+    file_size = f.tell()
+    f.seek(0)
+    riff = f.read(12)
+    if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+        raise AudioError("not a RIFF/WAVE file")
+
+    fmt = None
+    pos = 12
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        chunk_id, size = struct.unpack("<4sI", f.read(8))
+        body = pos + 8
+        if chunk_id == b"fmt ":
+            fmt = f.read(min(size, 40))
+        elif chunk_id == b"data":
+            if fmt is None:
+                raise AudioError("data chunk before fmt chunk")
+            # Streaming writers leave the size at 0 or 0xFFFFFFFF - use what is there
+            if size == 0 or body + size > file_size:
+                size = file_size - body
+            return _parse_fmt(fmt, body, size)
+        pos = body + size + (size & 1)
+    raise AudioError("no data chunk")
+
+
+def _parse_fmt(fmt: bytes, data_offset: int, data_size: int) -> WavFormat:
+    if len(fmt) < 16:
+        raise AudioError("fmt chunk too short")
+    sample_format, channels, sample_rate, _, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+    if sample_format == _FORMAT_EXTENSIBLE:
+        if len(fmt) < 26:
+            raise AudioError("extensible fmt chunk too short")
+        sample_format, = struct.unpack("<H", fmt[24:26])      # first bytes of the sub-format GUID
+    supported = (sample_format == _FORMAT_PCM and bits in (8, 16, 24, 32)) or \
+                (sample_format == _FORMAT_FLOAT and bits in (32, 64))
+    if not supported or not channels or not sample_rate:
+        raise AudioError(f"unsupported WAV format {sample_format} ({bits}-bit, {channels} channels)")
+    frame_bytes = channels * bits // 8
+    return WavFormat(sample_format, channels, sample_rate, bits, data_offset,
+                     data_size - data_size % frame_bytes)
+
+
+def _to_float(raw: memoryview, wav: WavFormat) -> "np.ndarray":
+    """Interleaved sample bytes -> (frames, channels) float32 in [-1, 1]"""
+    if wav.sample_format == _FORMAT_FLOAT:
+        samples = np.frombuffer(raw, dtype="<f4" if wav.bits == 32 else "<f8").astype(np.float32)
+    elif wav.bits == 8:
+        samples = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif wav.bits == 16:
+        samples = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768
+    elif wav.bits == 24:
+        b = np.frombuffer(raw, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        samples = ((b[:, 0] << 8 | b[:, 1] << 16 | b[:, 2] << 24) >> 8).astype(np.float32) / 8388608
+    else:
+        samples = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648
+    return samples.reshape(-1, wav.channels)
+
+
+# ========================================
+# RUNS
+# ========================================
+class _Runs:
+    """
+    Joins flagged frames into (start, end) runs across blocks
+
+    Only the open run and the last closed one (which a run starting within
+    gap_seconds still extends) are kept back; at most max_events runs are
+    recorded, the rest are only counted.
+    """
+
+    def __init__(self, kind: str, frame_seconds: float, min_seconds: float, gap_seconds: float = 0.0,
+                 max_events: int = MAX_ISSUES_PER_SCAN):
+        self.kind = kind
+        self.frame_seconds = frame_seconds
+        self.min_frames = max(1, math.ceil(min_seconds / frame_seconds - 1e-9))
+        self.gap_frames = round(gap_seconds / frame_seconds)
+        self.max_events = max_events
+        self.events: list[dict] = []
+        self.dropped = 0
+        self._open: Optional[int] = None        # first frame of the run still going at the block end
+        self._last: Optional[list[int]] = None  # [start, end) of the last closed run, not yet recorded
+
+    def feed(self, flags: "np.ndarray", first_frame: int) -> None:
+        if self._open is not None and not flags[0]:
+            self._close(self._open, first_frame)
+            self._open = None
+        edges = np.flatnonzero(np.diff(flags.astype(np.int8), prepend=0, append=0))
+        block_end = first_frame + len(flags)
+        for start, end in zip((edges[::2] + first_frame).tolist(), (edges[1::2] + first_frame).tolist()):
+            if start == first_frame and self._open is not None:
+                start = self._open
+                self._open = None
+            if end == block_end:
+                self._open = start
+            else:
+                self._close(start, end)
+
+    def finish(self, total_frames: int) -> list[dict]:
+        if self._open is not None:
+            self._close(self._open, total_frames)
+            self._open = None
+        self._record()
+        return self.events
+
+    def _close(self, start: int, end: int) -> None:
+        if self._last is not None and start - self._last[1] < self.gap_frames:
+            self._last[1] = end
+            return
+        self._record()
+        self._last = [start, end]
+
+    def _record(self) -> None:
+        if self._last is None:
+            return
+        start, end = self._last
+        self._last = None
+        if end - start < self.min_frames:
+            return
+        if len(self.events) >= self.max_events:
+            self.dropped += 1
+            return
+        self.events.append({"kind": self.kind, "start": start * self.frame_seconds,
+                            "end": end * self.frame_seconds, "detail": ""})
+
+
+# ========================================
+# ANALYSIS
+# ========================================
+@dataclass
+class AudioResult:
+    wav: WavFormat
+    issues: list[Issue]
+    loudness_db: Optional[float]        # RMS level of the non-silent audio (dBFS)
+    peak_db: Optional[float]
+
+    def metadata_fields(self) -> dict:
+        return {
+            "durationSec": round(self.wav.duration_sec),
+            "container": "wav",
+            "codecs": [self.wav.codec],
+            "streamCount": 1,
+            "loudnessDb": self.loudness_db,
+            "peakDb": self.peak_db,
+        }
+
+
+def analyze_wav(source: Union[str, BinaryIO]) -> AudioResult:
+    """Silence, clipping and loudness of a WAV file, read BLOCK_SECONDS at a time"""
+    with _open(source) as f:
+        wav = read_wav_format(f)
+        frame_len = max(1, round(wav.sample_rate * FRAME_SECONDS))
+        frame_seconds = frame_len / wav.sample_rate
+        frames_per_block = max(1, round(BLOCK_SECONDS / frame_seconds))
+        buffer = bytearray(frame_len * frames_per_block * wav.frame_bytes)
+        view = memoryview(buffer)
+
+        silence_level = 10 ** (SILENCE_NOISE_DB / 20)
+        clip_level = 10 ** (CLIPPING_DB / 20) - 1e-6
+        silence = _Runs("silence", frame_seconds, SILENCE_MIN_SECONDS)
+        clipping = _Runs("clipping", frame_seconds, CLIP_MIN_SECONDS, CLIP_MERGE_GAP_SECONDS)
+        sound_energy = 0.0
+        sound_samples = 0
+        peak = 0.0
+        frame = 0
+
+        f.seek(wav.data_offset)
+        remaining = wav.data_size
+        while remaining > 0:
+            read = f.readinto(view[:min(len(buffer), remaining)])
+            if not read:
+                break
+            remaining -= read
+            usable = read - read % wav.frame_bytes
+            samples = _to_float(view[:usable], wav)
+            if not len(samples):
+                break
+
+            # Pad the last partial frame with silence so every frame has frame_len samples
+            count = -(-len(samples) // frame_len)
+            if count * frame_len != len(samples):
+                samples = np.concatenate([samples, np.zeros((count * frame_len - len(samples), wav.channels),
+                                                            dtype=np.float32)])
+            frames = samples.reshape(count, frame_len * wav.channels)
+            energy = np.einsum("ij,ij->i", frames, frames, dtype=np.float64)
+            rms = np.sqrt(energy / frames.shape[1])
+            magnitude = np.abs(frames)
+            clipped = np.count_nonzero(magnitude >= clip_level, axis=1)
+
+            silent = rms < silence_level
+            silence.feed(silent, frame)
+            clipping.feed(clipped >= CLIP_MIN_SAMPLES, frame)
+            sound_energy += float(energy[~silent].sum())
+            sound_samples += int(np.count_nonzero(~silent)) * frames.shape[1]
+            peak = max(peak, float(magnitude.max()))
+            frame += count
+
+    events = merge_events(silence.finish(frame) + clipping.finish(frame))
+    dropped = silence.dropped + clipping.dropped + max(0, len(events) - MAX_ISSUES_PER_SCAN)
+    if dropped:
+        logger.warning("⚠️ Audio analysis: %d more silence/clipping runs not reported", dropped)
+        events = sorted(events, key=lambda e: e["start"])[:MAX_ISSUES_PER_SCAN]
+    loudness_db = _db(math.sqrt(sound_energy / sound_samples)) if sound_samples else None
+    if loudness_db is not None and loudness_db < QUIET_DB:
+        events.append({"kind": "quiet", "start": 0.0, "end": wav.duration_sec,
+                       "detail": f"average level {loudness_db:.1f} dBFS"})
+    return AudioResult(
+        wav=wav,
+        issues=events_to_issues(sorted(events, key=lambda e: (e["start"], e["kind"]))),
+        loudness_db=loudness_db,
+        peak_db=_db(peak) if peak else None,
+    )
+
+
+def _db(level: float) -> float:
+    return round(20 * math.log10(max(level, 1e-10)), 1) or 0.0
+
+
+@contextmanager
+def _open(source: Union[str, BinaryIO]) -> Iterator[BinaryIO]:
+    if isinstance(source, str):
+        with open(source, "rb") as f:
+            yield f
+    else:
+        yield source
@@ -0,0 +1,146 @@
+"""
+KEYWORD AUTOMATON (Aho-Corasick)
+
+Compiles a set of keywords once and then finds every occurrence of all of
+them in a single left-to-right pass, so the cost per character does not
+grow with the number of keywords.
+
+Transitions are memoized into a DFA the first time each (state, char) pair
+is seen, which keeps the hot loop down to one dict lookup per character.
+The scan state can be carried from one chunk to the next, so matches that
+straddle a chunk boundary are still found.
+"""
+
+from collections import deque
+from typing import Generic, Iterable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+def fold_case(text: str) -> str:
+    """Lowercase without changing the length (keeps character offsets valid)"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    # A few characters (e.g. 'İ') lowercase to two code points
+    return "".join(ch.lower()[:1] for ch in text)
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+class KeywordAutomaton(Generic[T]):
+    """
+    Multi-keyword matcher
+
+    keywords: (keyword, payload) pairs - the payload comes back with each match
+    whole_words: only report matches that are not part of a larger word
+    """
+
+    def __init__(
+        self,
+        keywords: Iterable[tuple[str, T]],
+        case_sensitive: bool = False,
+        whole_words: bool = False,
+    ):
+        self.case_sensitive = case_sensitive
+        self.whole_words = whole_words
+
+        self._goto: list[dict[str, int]] = [{}]
+        self._fail: list[int] = [0]
+        # Per state: (keyword length, payload) for every keyword ending there
+        self._out: list[tuple] = [()]
+        self.payloads: list[T] = []
+        self.max_length = 0
+
+        for keyword, payload in keywords:
+            if not keyword:
+                continue
+            if not case_sensitive:
+                keyword = fold_case(keyword)
+            self._add(keyword, payload)
+
+        self._build_failure_links()
+        # Memoized DFA, seeded with the trie edges
+        self._delta: list[dict[str, int]] = [dict(edges) for edges in self._goto]
+
+    def __len__(self) -> int:
+        return len(self.payloads)
+
+    # ---------- construction ----------
+
+    def _add(self, keyword: str, payload: T) -> None:
+        state = 0
+        for ch in keyword:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state] = self._out[state] + ((len(keyword), payload),)
+        self.payloads.append(payload)
+        self.max_length = max(self.max_length, len(keyword))
+
+    def _build_failure_links(self) -> None:
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fallback = self._fail[state]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def _transition(self, state: int, ch: str) -> int:
+        goto, fail = self._goto, self._fail
+        while state and ch not in goto[state]:
+            state = fail[state]
+        return goto[state].get(ch, 0)
+
+    # ---------- matching ----------
+
+    def scan_chunk(self, text: str, state: int = 0, offset: int = 0) -> tuple[list, int]:
+        """
+        Scan one chunk of a longer stream -> (matches, state to pass to the next chunk)
+
+        Matches are (start, end, payload) with offset added to the positions.
+        Word-boundary filtering is left to the caller for streamed input,
+        since the character after a match may be in the next chunk.
+        """
+        if not self.case_sensitive:
+            text = fold_case(text)
+        delta, out, transition = self._delta, self._out, self._transition
+        matches = []
+
+        for i, ch in enumerate(text):
+            edges = delta[state]
+            nxt = edges.get(ch)
+            if nxt is None:
+                nxt = transition(state, ch)
+                edges[ch] = nxt
+            state = nxt
+            if out[state]:
+                end = offset + i + 1
+                for length, payload in out[state]:
+                    matches.append((end - length, end, payload))
+        return matches, state
+
+    def find_all(self, text: str) -> list[tuple[int, int, T]]:
+        """All matches in a complete text, honoring whole_words"""
+        matches, _ = self.scan_chunk(text)
+        if not self.whole_words:
+            return matches
+        return [m for m in matches if self.is_whole_word(text, m[0], m[1])]
+
+    @staticmethod
+    def is_whole_word(text: str, start: int, end: int, next_char: Optional[str] = None) -> bool:
+        before = text[start - 1] if start > 0 else ""
+        after = text[end] if end < len(text) else (next_char or "")
+        return not (before and _is_word_char(before)) and not (after and _is_word_char(after))
@@ -0,0 +1,216 @@
+"""
+BATCH CHECKS (POST /run/batch)
+
+Runs many files / URLs / texts from one request and streams one NDJSON line
+per item as soon as that item is done - in completion order, not request
+order (each line carries the item's index).
+
+- Each input type has its own concurrency limit, so a folder of videos
+  doesn't hold up a list of quick text checks (and vice versa)
+- A failing item produces an error line for that item; the rest of the
+  batch carries on
+- NDJSON input is parsed as it arrives, so the first items are already
+  running while the rest of the request body is still uploading
+
+Output lines:
+    {"index": 0, "id": "...", "kind": "url", "status": "ok", "cached": false, "report": {...}}
+    {"index": 1, "id": null, "kind": "file", "status": "error", "statusCode": 413, "error": "..."}
+    {"done": true, "total": 2, "failed": 1}
+"""
+
+import asyncio
+import json
+import logging
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# LIMITS
+# ========================================
+BATCH_CONCURRENCY = {"file": 2, "url": 8, "text": 8}
+MAX_BATCH_ITEMS = 500
+MAX_NDJSON_LINE_BYTES = 10 * 1024 * 1024
+
+
+class BatchItemError(Exception):
+    """An item that can't be checked (bad NDJSON line, unknown kind, ...)"""
+    status_code = 400
+
+
+@dataclass
+class BatchItem:
+    index: int
+    kind: str                   # "file", "url" or "text"
+    value: Any                  # UploadFile for files, str otherwise
+    id: Optional[str] = None    # echoed back so clients can match results
+
+
+_INPUT_DONE = object()
+
+# check(item) -> (report, was_cached)
+ItemChecker = Callable[[BatchItem], Awaitable[tuple[dict, bool]]]
+
+
+# ========================================
+# INPUT
+# ========================================
+def item_from_json(index: int, data: Any) -> BatchItem:
+    """{"url": ...} / {"text": ...}, optionally with an "id" """
+    if not isinstance(data, dict):
+        raise BatchItemError("Each line must be a JSON object")
+    item_id = data.get("id")
+    item_id = str(item_id) if item_id is not None else None
+    for kind in ("url", "text"):
+        if isinstance(data.get(kind), str) and data[kind]:
+            return BatchItem(index=index, kind=kind, value=data[kind], id=item_id)
+    raise BatchItemError("Each line needs a non-empty 'url' or 'text'")
+
+
+async def ndjson_items(body: AsyncIterator[bytes]) -> AsyncIterator[BatchItem]:
+    """
+    Items from an NDJSON request body, yielded as each line arrives
+
+    A malformed line becomes an item of kind "invalid" so it gets its own
+    error line instead of failing the batch.
+    """
+    buffer = bytearray()
+    scanned = 0         # buffer[:scanned] holds no newline - only new bytes are searched
+    index = 0
+
+    def parse(line: bytes) -> BatchItem:
+        try:
+            return item_from_json(index, json.loads(line))
+        except (ValueError, BatchItemError) as e:
+            return BatchItem(index=index, kind="invalid", value=str(e))
+
+    async for chunk in body:
+        buffer += chunk
+        start = 0
+        while (end := buffer.find(b"\n", scanned)) != -1:
+            line = bytes(buffer[start:end])
+            start = scanned = end + 1
+            if line.strip():
+                yield parse(line)
+                index += 1
+        del buffer[:start]
+        scanned = len(buffer)
+        if len(buffer) > MAX_NDJSON_LINE_BYTES:
+            raise BatchItemError(f"NDJSON line longer than {MAX_NDJSON_LINE_BYTES} bytes")
+    if buffer.strip():
+        yield parse(bytes(buffer))
+
+
+# ========================================
+# RUNNER
+# ========================================
+class BatchRunner:
+    """
+    Checks items with per-kind concurrency limits and yields result lines
+
+        runner.start(items)           # items start running as they are read
+        await runner.input_read()     # whole request body consumed
+        async for line in runner.results(): ...
+
+    The request body must be fully read before the streaming response
+    starts - the response listens on the same ASGI receive channel for
+    client disconnects.
+    """
+
+    def __init__(
+        self,
+        check: ItemChecker,
+        concurrency: Optional[dict[str, int]] = None,
+        max_items: int = MAX_BATCH_ITEMS,
+    ):
+        self.check = check
+        self.max_items = max_items
+        self._limits = {kind: asyncio.Semaphore(limit)
+                        for kind, limit in (concurrency or BATCH_CONCURRENCY).items()}
+        self._results: asyncio.Queue = asyncio.Queue()
+        self._tasks: set[asyncio.Task] = set()
+        self._submitted = 0
+        self._feeder: Optional[asyncio.Task] = None
+
+    def start(self, items: AsyncIterator[BatchItem]) -> None:
+        self._feeder = asyncio.create_task(self._feed(items))
+
+    async def input_read(self) -> None:
+        await asyncio.shield(self._feeder)
+
+    async def results(self) -> AsyncIterator[dict]:
+        """Result lines in completion order, then a final {"done": true, ...} line"""
+        received = failed = 0
+        try:
+            while not self._feeder.done() or received < self._submitted:
+                line = await self._results.get()
+                if line is _INPUT_DONE:
+                    continue
+                received += 1
+                if line["status"] == "error":
+                    failed += 1
+                yield line
+            yield {"done": True, "total": received, "failed": failed}
+        finally:
+            self.cancel()
+
+    def cancel(self) -> None:
+        if self._feeder is not None:
+            self._feeder.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+
+    async def _feed(self, items: AsyncIterator[BatchItem]) -> None:
+        try:
+            async for item in items:
+                if self._submitted >= self.max_items:
+                    await self._results.put(_error_line(item, BatchItemError(
+                        f"Batch is limited to {self.max_items} items")))
+                    self._submitted += 1
+                    break
+                task = asyncio.create_task(self._run(item))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+                self._submitted += 1
+        except Exception as e:
+            # The request body itself broke (bad multipart, client gone, ...)
+            logger.error("❌ Batch input failed after %s items: %s", self._submitted, e)
+            await self._results.put({"index": self._submitted, "id": None, "kind": "invalid",
+                                     "status": "error", "statusCode": getattr(e, "status_code", 400),
+                                     "error": str(e)})
+            self._submitted += 1
+        finally:
+            # Wakes results() up if it is waiting when the input runs out
+            await self._results.put(_INPUT_DONE)
+
+    async def _run(self, item: BatchItem) -> None:
+        await self._results.put(await self._check_one(item))
+
+    async def _check_one(self, item: BatchItem) -> dict:
+        if item.kind == "invalid":
+            return _error_line(item, BatchItemError(item.value))
+        limit = self._limits.get(item.kind)
+        if limit is None:
+            return _error_line(item, BatchItemError(f"Unknown item kind: {item.kind}"))
+        async with limit:
+            try:
+                report, cached = await self.check(item)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("⚠️ Batch item %s (%s) failed: %s", item.index, item.kind, e)
+                return _error_line(item, e)
+        return {"index": item.index, "id": item.id, "kind": item.kind, "status": "ok",
+                "cached": cached, "report": report}
+
+
+def _error_line(item: BatchItem, error: Exception) -> dict:
+    return {
+        "index": item.index,
+        "id": item.id,
+        "kind": item.kind,
+        "status": "error",
+        "statusCode": getattr(error, "status_code", 500),
+        "error": str(getattr(error, "detail", None) or error),
+    }
@@ -0,0 +1,267 @@
+"""
+CONTENT-ADDRESSED RESULT CACHE
+
+Caches finished compliance reports by what was checked, not by who sent it:
+the SHA-256 of an upload, the normalized text of a text check, or the
+canonical URL (and fetched content) of a URL check.
+
+- Memory tier: LRU bounded by entry count and bytes
+- Disk tier: one JSON file per key, bounded by total bytes
+- Both tiers expire entries after ttl_seconds
+- Concurrent requests for the same key share one in-flight computation
+"""
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from backend.analysis import ANALYSIS_VERSION
+from backend.config import DATA_DIR
+from backend.fetcher import canonical_url
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# DEFAULT LIMITS
+# ========================================
+MEMORY_MAX_ENTRIES = 1024
+MEMORY_MAX_BYTES = 64 * 1024 * 1024
+DISK_MAX_BYTES = 1024 * 1024 * 1024
+TTL_SECONDS = 24 * 60 * 60
+CACHE_DIR = DATA_DIR / "cache"
+
+
+# ========================================
+# CACHE KEYS
+# ========================================
+def _make_key(kind: str, value: str) -> str:
+    raw = f"v{ANALYSIS_VERSION}:{kind}:{value}".encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()
+
+
+def normalize_text(text: str) -> str:
+    """Unicode-normalize and collapse whitespace so trivially different pastes match"""
+    text = unicodedata.normalize("NFKC", text)
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def key_for_upload(sha256: str) -> str:
+    return _make_key("file", sha256)
+
+
+def key_for_text(text: str) -> str:
+    return _make_key("text", normalize_text(text))
+
+
+def key_for_url(url: str, content_sha256: Optional[str] = None) -> str:
+    """By canonical URL, plus the fetched content when there is one - an edited page is a new check"""
+    value = canonical_url(url)
+    return _make_key("url", f"{value}#{content_sha256}" if content_sha256 else value)
+
+
+# ========================================
+# RESULT CACHE
+# ========================================
+class ResultCache:
+    """Two-tier (memory + disk) report cache with single-flight dedupe"""
+
+    def __init__(
+        self,
+        directory: Path = CACHE_DIR,
+        max_entries: int = MEMORY_MAX_ENTRIES,
+        max_memory_bytes: int = MEMORY_MAX_BYTES,
+        max_disk_bytes: int = DISK_MAX_BYTES,
+        ttl_seconds: float = TTL_SECONDS,
+    ):
+        self.directory = Path(directory)
+        self.max_entries = max_entries
+        self.max_memory_bytes = max_memory_bytes
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+
+        # key -> (expires_at, encoded JSON)
+        self._memory: "OrderedDict[str, tuple[float, bytes]]" = OrderedDict()
+        self._memory_bytes = 0
+        # key -> file size, oldest first
+        self._disk: "OrderedDict[str, int]" = OrderedDict()
+        self._disk_bytes = 0
+        self._inflight: dict[str, asyncio.Future] = {}
+
+        self._stats = {
+            "memoryHits": 0,
+            "diskHits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "expired": 0,
+        }
+        self._load_disk_index()
+
+    # ---------- public API ----------
+
+    async def get_or_compute(
+        self, key: str, compute: Callable[[], Awaitable[dict]]
+    ) -> tuple[dict, bool]:
+        """
+        Return (report, was_cached)
+
+        A request that arrives while the same key is being computed waits
+        for that computation instead of starting its own.
+        """
+        cached = await self.get(key)
+        if cached is not None:
+            return cached, True
+
+        pending = self._inflight.get(key)
+        if pending is not None:
+            self._stats["coalesced"] += 1
+            # Callers may tweak their copy (e.g. fileName), so don't share one dict
+            return copy.deepcopy(await asyncio.shield(pending)), True
+
+        self._stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            await self.put(key, value)
+            future.set_result(value)
+            return value, False
+        except BaseException as e:
+            future.set_exception(e)
+            # Nobody else may be waiting - don't let asyncio log it as unretrieved
+            future.exception()
+            raise
+        finally:
+            del self._inflight[key]
+
+    async def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+
+        entry = self._memory.get(key)
+        if entry is not None:
+            expires_at, payload = entry
+            if expires_at > now:
+                self._memory.move_to_end(key)
+                self._stats["memoryHits"] += 1
+                return json.loads(payload)
+            self._drop_memory(key)
+            self._stats["expired"] += 1
+
+        if key in self._disk:
+            payload = await asyncio.to_thread(self._read_file, self._path_for(key), now)
+            if payload is None:
+                await self._forget_disk(key)
+            else:
+                self._disk.move_to_end(key)
+                self._stats["diskHits"] += 1
+                self._put_memory(key, payload, now + self.ttl_seconds)
+                return json.loads(payload)
+
+        return None
+
+    async def put(self, key: str, value: dict) -> None:
+        payload = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        self._put_memory(key, payload, time.time() + self.ttl_seconds)
+
+        # File I/O runs off the loop; the index itself is only touched here
+        if not await asyncio.to_thread(self._write_file, self._path_for(key), payload):
+            return
+        self._disk_bytes -= self._disk.pop(key, 0)
+        self._disk[key] = len(payload)
+        self._disk_bytes += len(payload)
+
+        while self._disk_bytes > self.max_disk_bytes and len(self._disk) > 1:
+            await self._forget_disk(next(iter(self._disk)))
+            self._stats["evictions"] += 1
+
+    def stats(self) -> dict:
+        hits = self._stats["memoryHits"] + self._stats["diskHits"] + self._stats["coalesced"]
+        lookups = hits + self._stats["misses"]
+        return {
+            **self._stats,
+            "hitRatio": round(hits / lookups, 4) if lookups else 0.0,
+            "memoryEntries": len(self._memory),
+            "memoryBytes": self._memory_bytes,
+            "diskEntries": len(self._disk),
+            "diskBytes": self._disk_bytes,
+            "inflight": len(self._inflight),
+        }
+
+    # ---------- memory tier ----------
+
+    def _put_memory(self, key: str, payload: bytes, expires_at: float) -> None:
+        if len(payload) > self.max_memory_bytes:
+            return
+        self._drop_memory(key)
+        self._memory[key] = (expires_at, payload)
+        self._memory_bytes += len(payload)
+
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+            oldest = next(iter(self._memory))
+            self._drop_memory(oldest)
+            self._stats["evictions"] += 1
+
+    def _drop_memory(self, key: str) -> None:
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= len(entry[1])
+
+    # ---------- disk tier ----------
+
+    def _path_for(self, key: str) -> Path:
+        return self.directory / key[:2] / f"{key}.json"
+
+    def _load_disk_index(self) -> None:
+        if not self.directory.exists():
+            return
+        now = time.time()
+        found = []
+        for path in self.directory.glob("*/*.json"):
+            try:
+                st = path.stat()
+            except OSError:
+                continue
+            if st.st_mtime + self.ttl_seconds <= now:
+                path.unlink(missing_ok=True)
+                continue
+            found.append((st.st_mtime, path.stem, st.st_size))
+
+        for _, key, size in sorted(found):
+            self._disk[key] = size
+            self._disk_bytes += size
+        logger.info("💾 Result cache: %s entries on disk (%s bytes)", len(self._disk), self._disk_bytes)
+
+    def _read_file(self, path: Path, now: float) -> Optional[bytes]:
+        try:
+            if path.stat().st_mtime + self.ttl_seconds <= now:
+                self._stats["expired"] += 1
+                return None
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def _write_file(self, path: Path, payload: bytes) -> bool:
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix(f".{os.getpid()}.tmp")
+            tmp.write_bytes(payload)
+            os.replace(tmp, path)
+            return True
+        except OSError as e:
+            logger.warning("⚠️ Could not write cache entry %s: %s", path.name, e)
+            return False
+
+    async def _forget_disk(self, key: str) -> None:
+        size = self._disk.pop(key, None)
+        if size is not None:
+            self._disk_bytes -= size
+        await asyncio.to_thread(self._path_for(key).unlink, missing_ok=True)
@@ -0,0 +1,209 @@
+"""
+CONTENT-DEFINED CHUNKING + CHUNK RESULT INDEX
+
+Editors upload v2, v3, v4 of the same video with small edits. The SHA-256
+of the whole file changes every time, so the result cache can't help - but
+most of the bytes are the same.
+
+- The file is cut into chunks where a rolling (gear) hash of the last 32
+  bytes hits a bit pattern. Cut points depend only on nearby content, so an
+  edit moves the boundaries around it and leaves every other chunk intact.
+- Each analysis window (see backend/segments.py) gets a fingerprint from the
+  hashes of the chunks holding its media data.
+- ChunkResultIndex maps fingerprint -> the window's analysis result. A new
+  version re-analyzes only the windows whose fingerprint is new.
+
+The gear hash is vectorized with NumPy (several hundred MB/s). Without NumPy
+incremental reuse is switched off - a per-byte Python loop would cost more
+than the analysis it saves.
+"""
+
+import bisect
+import hashlib
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import time
+from typing import Optional
+
+from backend.config import DATA_DIR
+from backend.probe import window_byte_ranges
+
+try:
+    import numpy as np
+except ImportError:         # optional - see module docstring
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# CHUNKING PARAMETERS
+# ========================================
+# Changing any of these changes every chunk hash (and so every fingerprint)
+GEAR_WINDOW = 32
+AVG_CHUNK_BITS = 18                 # ~256 KB average chunk
+MIN_CHUNK = 64 * 1024
+MAX_CHUNK = 1024 * 1024
+CUT_MASK = ((1 << AVG_CHUNK_BITS) - 1) << (32 - AVG_CHUNK_BITS)
+SCAN_BLOCK = 4 * 1024 * 1024        # bytes hashed per NumPy pass
+
+GEAR = [int.from_bytes(hashlib.sha256(b"gear:%d" % i).digest()[:4], "big") for i in range(256)]
+
+INDEX_PATH = DATA_DIR / "chunk-index.sqlite3"
+INDEX_MAX_ROWS = 500_000
+
+
+def chunking_available() -> bool:
+    return np is not None
+
+
+def _cut_candidates(buf) -> "np.ndarray":
+    """
+    Positions p (cut before byte p) where the gear hash of the 32 bytes
+    ending at p-1 matches CUT_MASK
+
+    h[i] = sum(GEAR[b[i-k]] << k for k in 0..31) mod 2**32 - the same value
+    as the rolling form h = (h << 1) + GEAR[b], computed by doubling.
+    """
+    data = np.frombuffer(buf, dtype=np.uint8)
+    gear = np.array(GEAR, dtype=np.uint32)
+    found = []
+    for block_start in range(0, len(data), SCAN_BLOCK):
+        lead = min(block_start, GEAR_WINDOW - 1)        # context from the previous block
+        h = gear[data[block_start - lead:block_start + SCAN_BLOCK]]
+        shift = 1
+        while shift < GEAR_WINDOW:
+            h[shift:] += h[:-shift] << np.uint32(shift)
+            shift <<= 1
+        hits = np.flatnonzero((h[lead:] & np.uint32(CUT_MASK)) == 0)
+        found.append(hits + (block_start + 1))
+    return np.concatenate(found) if found else np.empty(0, dtype=np.int64)
+
+
+def chunk_boundaries(buf) -> list[tuple[int, int]]:
+    """(offset, length) of each chunk, honouring MIN_CHUNK / MAX_CHUNK"""
+    size = len(buf)
+    chunks = []
+    last = 0
+    for cut in _cut_candidates(buf).tolist():
+        if cut - last < MIN_CHUNK:
+            continue
+        while cut - last > MAX_CHUNK:
+            chunks.append((last, MAX_CHUNK))
+            last += MAX_CHUNK
+        if cut - last >= MIN_CHUNK:
+            chunks.append((last, cut - last))
+            last = cut
+    while last < size:
+        length = min(MAX_CHUNK, size - last)
+        chunks.append((last, length))
+        last += length
+    return chunks
+
+
+def window_fingerprints(path: str, windows: list[tuple[float, float]], salt: str) -> Optional[list[str]]:
+    """
+    One fingerprint per window: a hash of the chunks holding its media data
+
+    salt covers whatever else the result depends on (analyzer version,
+    settings). None if chunking is unavailable or the container has no index.
+    """
+    if not chunking_available() or not windows:
+        return None
+
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            ranges = window_byte_ranges(buf, windows)
+            if ranges is None:
+                return None
+
+            view = memoryview(buf)
+            try:
+                chunks = chunk_boundaries(buf)
+                offsets = [offset for offset, _ in chunks]
+                hashes: dict[int, bytes] = {}
+
+                fingerprints = []
+                for (start, end), window_ranges in zip(windows, ranges):
+                    digest = hashlib.sha256(f"{salt}:{end - start:.3f}".encode())
+                    used = set()
+                    for range_start, range_end in window_ranges:
+                        i = bisect.bisect_right(offsets, range_start) - 1
+                        while i < len(chunks) and chunks[i][0] < range_end:
+                            used.add(i)
+                            i += 1
+                    for i in sorted(used):
+                        if i not in hashes:
+                            offset, length = chunks[i]
+                            hashes[i] = hashlib.blake2b(view[offset:offset + length], digest_size=16).digest()
+                        digest.update(hashes[i])
+                    fingerprints.append(digest.hexdigest())
+            finally:
+                view.release()
+
+    logger.info("🧩 %s chunks, %s window fingerprints for %s",
+                len(chunks), len(fingerprints), os.path.basename(path))
+    return fingerprints
+
+
+# ========================================
+# INDEX
+# ========================================
+class ChunkResultIndex:
+    """fingerprint -> analysis result (any JSON), shared across files and processes"""
+
+    def __init__(self, path=INDEX_PATH, max_rows: int = INDEX_MAX_ROWS):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_rows = max_rows
+        self._db = sqlite3.connect(str(path), timeout=30)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " fingerprint TEXT PRIMARY KEY,"
+            " result TEXT NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_used_at ON results(used_at)")
+        self._db.commit()
+
+    def get_many(self, fingerprints: list[str]) -> dict[str, object]:
+        found = {}
+        unique = list(dict.fromkeys(fingerprints))
+        for i in range(0, len(unique), 500):
+            batch = unique[i:i + 500]
+            rows = self._db.execute(
+                f"SELECT fingerprint, result FROM results WHERE fingerprint IN ({','.join('?' * len(batch))})",
+                batch,
+            ).fetchall()
+            found.update((fp, json.loads(result)) for fp, result in rows)
+        if found:
+            now = time.time()
+            self._db.executemany("UPDATE results SET used_at = ? WHERE fingerprint = ?",
+                                 [(now, fp) for fp in found])
+            self._db.commit()
+        return found
+
+    def put(self, fingerprint: str, result) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO results (fingerprint, result, used_at) VALUES (?, ?, ?)",
+            (fingerprint, json.dumps(result), time.time()),
+        )
+        self._db.commit()
+
+    def prune(self) -> None:
+        """Drop the least recently used rows beyond max_rows"""
+        count, = self._db.execute("SELECT COUNT(*) FROM results").fetchone()
+        if count > self.max_rows:
+            self._db.execute(
+                "DELETE FROM results WHERE fingerprint IN ("
+                " SELECT fingerprint FROM results ORDER BY used_at LIMIT ?)",
+                (count - self.max_rows,),
+            )
+            self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,360 @@
+"""
+CHAT SESSIONS (POST /chat)
+
+Conversation state for the assistant that follows a directory submission.
+Many sessions stay open for a long time, so the API process only keeps the
+recently used ones:
+
+- History is stored compactly (role code, text, time) and capped at
+  MAX_HISTORY_MESSAGES per session
+- Sessions beyond MAX_LIVE_SESSIONS (least recently used first) or idle
+  for IDLE_SPILL_SECONDS are spilled to a SQLite file as compressed JSON
+  and loaded back on their next message; spilled sessions expire after
+  SPILL_TTL_SECONDS
+- The media context (what was checked, what was found) is derived from the
+  directory session and its jobs, and cached per session until those change
+
+Replies are streamed token by token (see stream_reply), so the first byte
+goes out as soon as the first token exists. The built-in reply generator
+answers from the check results; swap in an LLM client via ReplyGenerator.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from collections import Counter, OrderedDict
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Optional
+
+from backend.config import DATA_DIR
+from backend.directory_index import DirectoryIndexer, DirectorySession
+from backend.jobs import TERMINAL_STATES, JobManager
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# LIMITS
+# ========================================
+SPILL_PATH = DATA_DIR / "chat-sessions.sqlite3"
+MAX_LIVE_SESSIONS = 1000
+MAX_HISTORY_MESSAGES = 50
+MAX_MESSAGE_CHARS = 8000
+IDLE_SPILL_SECONDS = 15 * 60
+SPILL_TTL_SECONDS = 7 * 24 * 60 * 60
+SWEEP_INTERVAL_SECONDS = 60
+TOP_ISSUES = 5
+
+USER, ASSISTANT = "u", "a"
+
+
+# ========================================
+# SESSION STATE
+# ========================================
+@dataclass
+class MediaContext:
+    """What the assistant knows about the session's directory"""
+    directory: str
+    files: int = 0
+    checked: int = 0
+    pending: int = 0
+    failed: int = 0
+    unchanged: int = 0
+    severities: Counter = field(default_factory=Counter)
+    top_issues: list = field(default_factory=list)      # (file, severity, title, timestamp)
+    indexing: bool = False
+
+
+@dataclass
+class ChatSession:
+    id: str
+    history: list = field(default_factory=list)     # [role, text, unix time]
+    updated_at: float = field(default_factory=time.time)
+    # Derived, never spilled - rebuilt after a reload
+    context_version: Optional[tuple] = None
+    context: Optional[MediaContext] = None
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+
+    def append(self, role: str, text: str) -> None:
+        self.history.append([role, text, round(time.time(), 3)])
+        if len(self.history) > MAX_HISTORY_MESSAGES:
+            del self.history[:len(self.history) - MAX_HISTORY_MESSAGES]
+        self.updated_at = time.time()
+
+
+class SessionSpill:
+    """SQLite file holding sessions evicted from memory"""
+
+    def __init__(self, path=SPILL_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " id TEXT PRIMARY KEY,"
+            " history BLOB NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS sessions_updated_at ON sessions(updated_at)")
+        self._db.commit()
+
+    def save(self, sessions: list[ChatSession]) -> None:
+        rows = [(s.id, zlib.compress(json.dumps(s.history, separators=(",", ":")).encode()), s.updated_at)
+                for s in sessions]
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO sessions (id, history, updated_at) VALUES (?, ?, ?)", rows)
+            self._db.commit()
+
+    def take(self, session_id: str) -> Optional[ChatSession]:
+        """Load a spilled session (and drop its row - it is live again)"""
+        with self._lock:
+            row = self._db.execute(
+                "SELECT history, updated_at FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            if row is None:
+                return None
+            self._db.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
+            self._db.commit()
+        history = json.loads(zlib.decompress(row[0]))
+        return ChatSession(id=session_id, history=history, updated_at=row[1])
+
+    def expire(self, cutoff: float) -> int:
+        with self._lock:
+            deleted = self._db.execute("DELETE FROM sessions WHERE updated_at < ?", (cutoff,)).rowcount
+            self._db.commit()
+        return deleted
+
+    def close(self) -> None:
+        self._db.close()
+
+
+# ========================================
+# MEDIA CONTEXT
+# ========================================
+def _context_version(directory: DirectorySession, job_manager: JobManager) -> tuple:
+    finished = 0
+    for queued in directory.queued:
+        job = job_manager.get(queued["jobId"])
+        if job is None or job.status in TERMINAL_STATES:
+            finished += 1
+    return directory.updated_at, len(directory.queued), finished
+
+
+def build_media_context(directory: DirectorySession, job_manager: JobManager) -> MediaContext:
+    context = MediaContext(
+        directory=directory.root,
+        files=directory.found,
+        unchanged=directory.unchanged,
+        failed=directory.failed,
+        indexing=directory.status not in ("done", "failed"),
+    )
+    issues = []
+    for queued in directory.queued:
+        job = job_manager.get(queued["jobId"])
+        if job is None:
+            continue
+        if job.status == "failed":
+            context.failed += 1
+        elif job.status != "done":
+            context.pending += 1
+        else:
+            context.checked += 1
+            for issue in job.report.get("issues", []):
+                context.severities[issue["severity"]] += 1
+                issues.append((queued["path"], issue["severity"], issue["title"], issue.get("timestamp")))
+    rank = {"high": 0, "medium": 1, "low": 2}
+    issues.sort(key=lambda issue: rank.get(issue[1], 3))
+    context.top_issues = issues[:TOP_ISSUES]
+    return context
+
+
+# ========================================
+# REPLIES
+# ========================================
+# reply(message, history, context) -> async iterator of text tokens
+ReplyGenerator = Callable[[str, list, Optional[MediaContext]], AsyncIterator[str]]
+
+
+def _describe(context: Optional[MediaContext], message: str) -> str:
+    if context is None:
+        return ("I don't have a directory for this session yet. Submit a folder of media "
+                "files and I can tell you what the compliance checks found.")
+
+    lowered = message.lower()
+    total_issues = sum(context.severities.values())
+    status = (f"Still indexing {context.directory}: " if context.indexing
+              else f"In {context.directory}: ")
+    overview = (f"{status}{context.files} files, {context.unchanged} unchanged since the last "
+                f"submission, {context.checked} newly checked, {context.pending} still in progress"
+                + (f" and {context.failed} that could not be checked" if context.failed else "") + ".")
+
+    if any(word in lowered for word in ("issue", "problem", "violation", "wrong", "fail")):
+        if not total_issues:
+            return overview + " No issues have been found in the checked files so far."
+        lines = [f"{total_issues} issues so far ("
+                 + ", ".join(f"{count} {severity}" for severity, count in context.severities.most_common())
+                 + "). The most serious:"]
+        for path, severity, title, timestamp in context.top_issues:
+            where = f" at {timestamp}" if timestamp else ""
+            lines.append(f"- {path}{where}: {title} ({severity})")
+        return "\n".join(lines)
+
+    if total_issues:
+        return overview + f" {total_issues} issues found so far - ask me about them for details."
+    if context.pending or context.indexing:
+        return overview + " Ask me about issues once the checks finish."
+    return overview + " No issues were found."
+
+
+async def default_reply(message: str, history: list, context: Optional[MediaContext]) -> AsyncIterator[str]:
+    """Answers from the check results, one word at a time"""
+    for token in _describe(context, message).split(" "):
+        yield token + " "
+        await asyncio.sleep(0)
+
+
+# ========================================
+# STORE
+# ========================================
+class ChatSessionStore:
+    """Live sessions in an LRU dict, the rest in the SQLite spill file"""
+
+    def __init__(
+        self,
+        directory_indexer: DirectoryIndexer,
+        job_manager: JobManager,
+        spill: Optional[SessionSpill] = None,
+        reply: ReplyGenerator = default_reply,
+        max_live: int = MAX_LIVE_SESSIONS,
+    ):
+        self.directory_indexer = directory_indexer
+        self.job_manager = job_manager
+        self.spill = spill or SessionSpill()
+        self.reply = reply
+        self.max_live = max_live
+        self._live: OrderedDict[str, ChatSession] = OrderedDict()
+        self._spilling: dict[str, ChatSession] = {}     # being written out right now
+        self._loading: dict[str, asyncio.Future] = {}   # being read back right now
+        self._hits = self._loads = self._spilled = 0
+
+    async def get_or_create(self, session_id: Optional[str]) -> ChatSession:
+        if not session_id:
+            session_id = uuid.uuid4().hex
+        session = self._live.get(session_id)
+        if session is not None:
+            self._live.move_to_end(session_id)
+            self._hits += 1
+            return session
+
+        # take() deletes the spilled row, so concurrent callers must share one load
+        pending = self._loading.get(session_id)
+        if pending is not None:
+            return await asyncio.shield(pending)
+        pending = self._loading[session_id] = asyncio.get_running_loop().create_future()
+        try:
+            session = self._spilling.get(session_id) or await asyncio.to_thread(self.spill.take, session_id)
+            if session is not None:
+                self._loads += 1
+            else:
+                session = ChatSession(id=session_id)
+            self._live[session_id] = session
+            pending.set_result(session)
+        except asyncio.CancelledError:
+            pending.cancel()
+            raise
+        except Exception as e:
+            pending.set_exception(e)
+            pending.exception()     # may have no other waiter; don't log it as never retrieved
+            raise
+        finally:
+            del self._loading[session_id]
+        await self._evict_over_limit()
+        return session
+
+    def media_context(self, session: ChatSession) -> Optional[MediaContext]:
+        """Cached until the directory session or one of its jobs changes"""
+        directory = self.directory_indexer.get(session.id)
+        if directory is None:
+            return session.context
+        version = _context_version(directory, self.job_manager)
+        if version != session.context_version:
+            session.context = build_media_context(directory, self.job_manager)
+            session.context_version = version
+        return session.context
+
+    async def stream_reply(self, session: ChatSession, message: str) -> AsyncIterator[str]:
+        """
+        Record the user's message, yield reply tokens, then record the reply
+
+        One reply per session at a time, so history stays in order.
+        """
+        async with session.lock:
+            session.append(USER, message[:MAX_MESSAGE_CHARS])
+            context = self.media_context(session)
+            parts = []
+            try:
+                async for token in self.reply(message, session.history, context):
+                    parts.append(token)
+                    yield token
+            finally:
+                # A client that hangs up mid-reply still gets what was sent into history
+                if parts:
+                    session.append(ASSISTANT, "".join(parts).strip())
+
+    async def run_sweeper_forever(self) -> None:
+        """Spill idle sessions and expire old spilled ones"""
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL_SECONDS)
+            try:
+                now = time.time()
+                idle = [s for s in self._live.values()
+                        if s.updated_at < now - IDLE_SPILL_SECONDS and not s.lock.locked()]
+                await self._spill(idle)
+                expired = await asyncio.to_thread(self.spill.expire, now - SPILL_TTL_SECONDS)
+                if idle or expired:
+                    logger.info("💬 Spilled %s idle chat sessions, expired %s", len(idle), expired)
+            except Exception as e:
+                logger.error("❌ Chat session sweep failed: %s", e)
+
+    def stats(self) -> dict:
+        return {
+            "liveSessions": len(self._live),
+            "maxLiveSessions": self.max_live,
+            "hits": self._hits,
+            "loadedFromSpill": self._loads,
+            "spilled": self._spilled,
+        }
+
+    def close(self) -> None:
+        """Spill everything (call on shutdown)"""
+        self.spill.save(list(self._live.values()))
+        self._live.clear()
+        self.spill.close()
+
+    async def _evict_over_limit(self) -> None:
+        overflow = []
+        for session in self._live.values():
+            if len(self._live) - len(overflow) <= self.max_live:
+                break
+            if not session.lock.locked():
+                overflow.append(session)
+        await self._spill(overflow)
+
+    async def _spill(self, sessions: list[ChatSession]) -> None:
+        if not sessions:
+            return
+        for session in sessions:
+            self._live.pop(session.id, None)
+            self._spilling[session.id] = session
+        try:
+            await asyncio.to_thread(self.spill.save, sessions)
+        finally:
+            for session in sessions:
+                self._spilling.pop(session.id, None)
+        self._spilled += len(sessions)
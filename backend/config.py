@@ -0,0 +1,11 @@
+"""
+BACKEND SETTINGS
+
+Everything the backend writes to disk lives under DATA_DIR. Override it with
+the MEDIA_CHECKER_DATA_DIR environment variable.
+"""
+
+import os
+from pathlib import Path
+
+DATA_DIR = Path(os.environ.get("MEDIA_CHECKER_DATA_DIR", ".media-checker"))
@@ -0,0 +1,417 @@
+"""
+LOCAL DIRECTORY INDEXING (POST /submit-directory)
+
+Checks every media file in a directory on the server's disk. Directories
+hold thousands of files and change a little between submissions, so a
+persistent manifest remembers each file's size, mtime and SHA-256:
+
+- Files whose size and mtime match the manifest are not read at all
+- New or changed files are hashed on a thread pool (hashlib releases the
+  GIL, so several files hash at once)
+- Only files whose content hasn't been checked yet are queued as jobs;
+  a file is marked checked once its job finishes, so a failed check is
+  retried on the next submission
+
+submit() returns a session straight away; the scan runs in the background
+and its progress is in GET /directories/{sessionId}.
+
+Only directories under MEDIA_CHECKER_DIRECTORY_ROOTS (os.pathsep-separated)
+can be submitted, compared after symlinks are resolved. With it unset,
+every directory is refused.
+"""
+
+import asyncio
+import hashlib
+import logging
+import mimetypes
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Iterator, Optional
+
+from backend.analysis import CheckInput
+from backend.cache import key_for_upload
+from backend.config import DATA_DIR
+from backend.ingest import CHUNK_SIZE, SNIFF_BYTES, sniff_mime
+from backend.jobs import JobManager, TooManyJobs
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+MANIFEST_PATH = DATA_DIR / "directory-manifest.sqlite3"
+HASH_WORKERS = min(8, (os.cpu_count() or 1) * 2)
+MANIFEST_BATCH = 200                    # manifest rows written per transaction
+QUEUE_RETRY_SECONDS = 2.0               # wait this long when the job queue is full
+SESSION_TTL_SECONDS = 60 * 60
+ALLOWED_ROOTS = [os.path.realpath(root) for root in
+                 os.environ.get("MEDIA_CHECKER_DIRECTORY_ROOTS", "").split(os.pathsep) if root]
+
+CHECKED_TYPE_PREFIXES = ("video/", "audio/", "image/", "text/plain", "application/pdf",
+                         "application/msword",
+                         "application/vnd.openxmlformats-officedocument.wordprocessingml.document")
+
+
+class DirectoryIndexError(Exception):
+    """status_code is what the endpoint should return"""
+    status_code = 400
+
+
+class DirectoryNotAllowed(DirectoryIndexError):
+    status_code = 403
+
+
+class DirectoryNotFound(DirectoryIndexError):
+    status_code = 404
+
+
+# ========================================
+# MANIFEST
+# ========================================
+@dataclass
+class ManifestEntry:
+    size: int
+    mtime_ns: int
+    sha256: str
+    checked_sha256: Optional[str] = None    # content the last finished check saw
+
+
+class DirectoryManifest:
+    """(root, relative path) -> size / mtime / hash, shared by all sessions"""
+
+    def __init__(self, path=MANIFEST_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            " root TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime_ns INTEGER NOT NULL,"
+            " sha256 TEXT NOT NULL,"
+            " checked_sha256 TEXT,"
+            " PRIMARY KEY (root, path))"
+        )
+        self._db.commit()
+
+    def load(self, root: str) -> dict[str, ManifestEntry]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT path, size, mtime_ns, sha256, checked_sha256 FROM files WHERE root = ?", (root,)
+            ).fetchall()
+        return {path: ManifestEntry(*values) for path, *values in rows}
+
+    def upsert(self, root: str, entries: list[tuple[str, ManifestEntry]]) -> None:
+        with self._lock:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO files (root, path, size, mtime_ns, sha256, checked_sha256)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [(root, path, e.size, e.mtime_ns, e.sha256, e.checked_sha256) for path, e in entries],
+            )
+            self._db.commit()
+
+    def mark_checked(self, root: str, path: str, sha256: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE files SET checked_sha256 = ? WHERE root = ? AND path = ? AND sha256 = ?",
+                (sha256, root, path, sha256),
+            )
+            self._db.commit()
+
+    def remove(self, root: str, paths: list[str]) -> None:
+        with self._lock:
+            self._db.executemany("DELETE FROM files WHERE root = ? AND path = ?",
+                                 [(root, path) for path in paths])
+            self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+# ========================================
+# SCANNING + HASHING
+# ========================================
+@dataclass
+class FoundFile:
+    path: str               # relative to the session root, "/"-separated
+    size: int
+    mtime_ns: int
+    declared_type: str
+
+
+def walk_media_files(root: str) -> Iterator[FoundFile]:
+    """Media/document files under root (hidden files and folders skipped, symlinks not followed)"""
+    stack = [root]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = list(os.scandir(current))
+        except OSError as e:
+            logger.warning("⚠️ Skipping unreadable directory %s: %s", current, e)
+            continue
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+                if not entry.is_file(follow_symlinks=False):
+                    continue
+                declared_type, _ = mimetypes.guess_type(entry.name)
+                if not declared_type or not declared_type.startswith(CHECKED_TYPE_PREFIXES):
+                    continue
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            relative = os.path.relpath(entry.path, root).replace(os.sep, "/")
+            yield FoundFile(relative, stat.st_size, stat.st_mtime_ns, declared_type)
+
+
+def hash_file(path: str) -> tuple[str, Optional[str]]:
+    """(sha256, sniffed MIME type) - runs on the hash pool"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        digest.update(head)
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest(), sniff_mime(head)
+
+
+# ========================================
+# SESSIONS
+# ========================================
+@dataclass
+class DirectorySession:
+    id: str
+    root: str
+    status: str = "scanning"            # scanning -> hashing -> done | failed
+    found: int = 0
+    unchanged: int = 0
+    hashed: int = 0
+    to_hash: int = 0
+    removed: int = 0
+    failed: int = 0
+    queued: list = field(default_factory=list)      # {"path", "sha256", "jobId"} per queued file
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    def to_dict(self) -> dict:
+        data = {
+            "sessionId": self.id,
+            "directoryPath": self.root,
+            "status": self.status,
+            "filesFound": self.found,
+            "filesUnchanged": self.unchanged,
+            "filesHashed": self.hashed,
+            "filesToHash": self.to_hash,
+            "filesRemoved": self.removed,
+            "filesFailed": self.failed,
+            "queued": self.queued,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class DirectoryIndexer:
+    """Runs directory scans in the background and queues changed files as jobs"""
+
+    def __init__(self, job_manager: JobManager, manifest: Optional[DirectoryManifest] = None,
+                 hash_workers: int = HASH_WORKERS):
+        self.job_manager = job_manager
+        self.manifest = manifest or DirectoryManifest()
+        self._hash_pool = ThreadPoolExecutor(max_workers=hash_workers, thread_name_prefix="dir-hash")
+        self._sessions: dict[str, DirectorySession] = {}
+        self._active_by_root: dict[str, str] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    # ---------- public API ----------
+
+    def submit(self, directory_path: str) -> DirectorySession:
+        """
+        Start indexing a directory and return its session immediately
+
+        A directory that is already being indexed returns the running
+        session instead of starting a second scan.
+        """
+        self._purge_expired()
+        root = resolve_directory(directory_path)
+
+        active_id = self._active_by_root.get(root)
+        if active_id is not None and active_id in self._sessions:
+            return self._sessions[active_id]
+
+        session = DirectorySession(id=uuid.uuid4().hex, root=root)
+        self._sessions[session.id] = session
+        self._active_by_root[root] = session.id
+        self._spawn(self._index(session))
+        return session
+
+    def get(self, session_id: str) -> Optional[DirectorySession]:
+        return self._sessions.get(session_id)
+
+    def shutdown(self) -> None:
+        for task in list(self._tasks):
+            task.cancel()
+        self._hash_pool.shutdown(wait=False, cancel_futures=True)
+        self.manifest.close()
+
+    # ---------- internals ----------
+
+    def _spawn(self, coro) -> None:
+        task = asyncio.get_running_loop().create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _index(self, session: DirectorySession) -> None:
+        root = session.root
+        loop = asyncio.get_running_loop()
+        try:
+            known, files = await asyncio.gather(
+                asyncio.to_thread(self.manifest.load, root),
+                asyncio.to_thread(lambda: list(walk_media_files(root))),
+            )
+            session.found = len(files)
+
+            changed = []
+            for found in files:
+                entry = known.get(found.path)
+                if entry is not None and entry.size == found.size and entry.mtime_ns == found.mtime_ns:
+                    if entry.checked_sha256 == entry.sha256:
+                        session.unchanged += 1
+                    else:
+                        await self._queue(session, found, entry.sha256, None)
+                else:
+                    changed.append(found)
+
+            seen = {found.path for found in files}
+            removed = [path for path in known if path not in seen]
+            if removed:
+                await asyncio.to_thread(self.manifest.remove, root, removed)
+            session.removed = len(removed)
+
+            session.to_hash = len(changed)
+            self._touch(session, "hashing")
+            logger.info("📁 %s: %s files, %s unchanged, %s to hash, %s removed",
+                        root, len(files), session.unchanged, len(changed), len(removed))
+
+            async def hash_one(found: FoundFile):
+                try:
+                    return found, await loop.run_in_executor(
+                        self._hash_pool, hash_file, os.path.join(root, found.path))
+                except OSError as e:        # vanished or unreadable since the scan
+                    logger.warning("⚠️ Could not hash %s: %s", found.path, e)
+                    return found, None
+
+            pending_rows: list[tuple[str, ManifestEntry]] = []
+            for next_done in asyncio.as_completed([hash_one(found) for found in changed]):
+                found, hashed = await next_done
+                session.hashed += 1
+                if hashed is None:
+                    session.failed += 1
+                    continue
+                sha256, sniffed_type = hashed
+
+                previous = known.get(found.path)
+                checked = previous.checked_sha256 if previous is not None else None
+                pending_rows.append((found.path, ManifestEntry(found.size, found.mtime_ns, sha256, checked)))
+                if len(pending_rows) >= MANIFEST_BATCH:
+                    await asyncio.to_thread(self.manifest.upsert, root, pending_rows)
+                    pending_rows = []
+
+                if checked == sha256:
+                    session.unchanged += 1          # touched, not edited
+                else:
+                    await self._queue(session, found, sha256, sniffed_type)
+                self._touch(session)
+
+            if pending_rows:
+                await asyncio.to_thread(self.manifest.upsert, root, pending_rows)
+            self._touch(session, "done")
+            logger.info("✅ %s: indexed, %s files queued for checking", root, len(session.queued))
+        except Exception as e:
+            logger.error("❌ Indexing %s failed: %s", root, e, exc_info=True)
+            session.error = str(e)
+            self._touch(session, "failed")
+        finally:
+            if self._active_by_root.get(root) == session.id:
+                del self._active_by_root[root]
+
+    async def _queue(self, session: DirectorySession, found: FoundFile, sha256: str,
+                     sniffed_type: Optional[str]) -> None:
+        check = CheckInput(
+            kind="file",
+            path=os.path.join(session.root, found.path),
+            file_name=found.path,
+            declared_type=found.declared_type,
+            sniffed_type=sniffed_type,
+            file_size=found.size,
+            sha256=sha256,
+            keep_file=True,
+        )
+        while True:
+            try:
+                job = await self.job_manager.submit(key_for_upload(sha256), check)
+                break
+            except TooManyJobs:
+                # Back off instead of failing - a big directory is expected to fill the queue
+                await asyncio.sleep(QUEUE_RETRY_SECONDS)
+
+        session.queued.append({"path": found.path, "sha256": sha256, "jobId": job.id})
+        self._spawn(self._mark_when_checked(session.root, found.path, sha256, job))
+
+    async def _mark_when_checked(self, root: str, path: str, sha256: str, job) -> None:
+        async for _ in self.job_manager.events(job):
+            pass
+        if job.status == "done":
+            await asyncio.to_thread(self.manifest.mark_checked, root, path, sha256)
+
+    @staticmethod
+    def _touch(session: DirectorySession, status: Optional[str] = None) -> None:
+        if status is not None:
+            session.status = status
+        session.updated_at = time.time()
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - SESSION_TTL_SECONDS
+        for session_id, session in list(self._sessions.items()):
+            if session.status in ("done", "failed") and session.updated_at < cutoff:
+                del self._sessions[session_id]
+
+
+def _is_under(path: str, root: str) -> bool:
+    """Whether path is root or inside it (paths on different drives never are)"""
+    path, root = os.path.normcase(path), os.path.normcase(root)
+    try:
+        return os.path.commonpath([path, root]) == root
+    except ValueError:          # Windows: different drives, or relative against absolute
+        return False
+
+
+def resolve_directory(directory_path: str) -> str:
+    """Absolute real path of an existing, allowed directory"""
+    if not directory_path or not directory_path.strip():
+        raise DirectoryIndexError("No directoryPath provided")
+    if not ALLOWED_ROOTS:
+        raise DirectoryNotAllowed("Directory checks are disabled (MEDIA_CHECKER_DIRECTORY_ROOTS is not set)")
+    root = os.path.realpath(os.path.expanduser(directory_path.strip()))
+    if not any(_is_under(root, allowed) for allowed in ALLOWED_ROOTS):
+        raise DirectoryNotAllowed(f"Directory is outside the allowed roots: {directory_path.strip()}")
+    if not os.path.isdir(root):
+        raise DirectoryNotFound(f"Directory not found: {root}")
+    return root
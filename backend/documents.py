@@ -0,0 +1,250 @@
+"""
+DOCUMENT TEXT EXTRACTION (PDF / DOCX)
+
+Pulls text out of uploaded documents a page (PDF) or paragraph (DOCX) at a
+time and feeds it straight into the phrase scanner, so issues are found
+while the rest of the document is still being parsed.
+
+- PDF: page ranges are spread over the shared analysis pool
+  (backend/pools.py). Only a few batches are
+  in flight at once and pages are scanned in order as their batch lands, so
+  memory is bounded by PAGE_BATCH * MAX_INFLIGHT_BATCHES pages of text no
+  matter how long the document is. Short PDFs (and PDFs checked inside a
+  job worker) are read in-process.
+- PDFs are read through a file handle, so pypdf only loads the objects it
+  needs: the API process reads just the page tree (for the page count), and
+  each worker opens the document on its first batch and keeps it open for
+  the next ones.
+- DOCX: word/document.xml is stream-parsed out of the zip, paragraph by
+  paragraph. Inflating a zip member is sequential, so there is no pool.
+
+PDF support needs pypdf (optional). Legacy .doc files are not parsed.
+"""
+
+import bisect
+import logging
+import os
+import zipfile
+from collections import deque
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional
+from xml.etree.ElementTree import ParseError, iterparse
+
+from backend.models import Issue
+from backend.pools import POOL_WORKERS, in_worker_process, shared_pool
+from backend.scanner import MAX_ISSUES_PER_SCAN, RuleSet, get_default_ruleset, hits_to_issues
+
+try:
+    from pypdf import PdfReader
+    from pypdf.errors import PyPdfError
+except ImportError:         # optional - PDFs are skipped without it
+    PdfReader = None
+    PyPdfError = ValueError
+
+logger = logging.getLogger(__name__)
+
+PDF_TYPE = "application/pdf"
+DOCX_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+
+PAGE_BATCH = 8                              # pages per pool task
+MAX_INFLIGHT_BATCHES = POOL_WORKERS * 2
+IN_PROCESS_MAX_PAGES = PAGE_BATCH * 2       # below this a pool costs more than it saves
+PAGE_SEPARATOR = "\n\n"
+
+_W = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+# on_issues(new_issues) - called as soon as a page's issues are known
+IssuesCallback = Callable[[list], None]
+# progress(pages_done, total_pages or None)
+PageProgress = Callable[[int, Optional[int]], None]
+
+
+class DocumentError(Exception):
+    """The document could not be parsed (corrupt, encrypted, not really a PDF/DOCX)"""
+
+
+@dataclass
+class DocumentPage:
+    number: int         # 1-based page (PDF) or paragraph (DOCX) number
+    text: str
+
+
+def can_extract(content_type: Optional[str]) -> bool:
+    if content_type == PDF_TYPE:
+        return PdfReader is not None
+    return content_type == DOCX_TYPE
+
+
+# ========================================
+# PDF
+# ========================================
+_worker_reader = None           # (path, file, PdfReader) of the document this pool worker is on
+
+
+def _open_pdf(path: str):
+    """
+    (file, PdfReader) over an open file handle
+
+    Given a path, pypdf reads the whole file into memory; given a file it
+    only reads the objects that are asked for.
+    """
+    f = open(path, "rb")
+    try:
+        return f, PdfReader(f)
+    except BaseException:
+        f.close()
+        raise
+
+
+def _page_texts(reader, first: int, last: int) -> list[str]:
+    texts = []
+    for index in range(first, last):
+        try:
+            texts.append(reader.pages[index].extract_text() or "")
+        except Exception as e:      # one broken page shouldn't sink the document
+            logger.warning("⚠️ Could not extract page %s: %s", index + 1, e)
+            texts.append("")
+    return texts
+
+
+def _extract_pdf_pages(path: str, first: int, last: int) -> list[str]:
+    """Runs in a pool process: text of pages [first, last)"""
+    global _worker_reader
+    if not in_worker_process():
+        f, reader = _open_pdf(path)
+        with f:
+            return _page_texts(reader, first, last)
+    # The next batches of the same document go to the same workers - keep it open
+    if _worker_reader is None or _worker_reader[0] != path:
+        if _worker_reader is not None:
+            _worker_reader[1].close()
+        _worker_reader = (path, *_open_pdf(path))
+    return _page_texts(_worker_reader[2], first, last)
+
+
+def iter_pdf_pages(path: str, progress: Optional[PageProgress] = None) -> Iterator[DocumentPage]:
+    """Pages in order, extracted in parallel batches"""
+    f, reader = _open_pdf(path)
+    with f:
+        # The page count comes from the page tree - no page is parsed for it
+        page_count = len(reader.pages)
+        if progress:
+            progress(0, page_count)
+
+        pool = shared_pool() if page_count > IN_PROCESS_MAX_PAGES and POOL_WORKERS > 1 else None
+        if pool is None:
+            for index in range(page_count):
+                yield DocumentPage(index + 1, _page_texts(reader, index, index + 1)[0])
+                if progress:
+                    progress(index + 1, page_count)
+            return
+
+    batches = [(first, min(first + PAGE_BATCH, page_count)) for first in range(0, page_count, PAGE_BATCH)]
+    inflight: deque = deque()
+    next_batch = 0
+    pages_done = 0
+    try:
+        while next_batch < len(batches) or inflight:
+            while next_batch < len(batches) and len(inflight) < MAX_INFLIGHT_BATCHES:
+                first, last = batches[next_batch]
+                inflight.append((first, pool.submit(_extract_pdf_pages, path, first, last)))
+                next_batch += 1
+            # Oldest batch first, so pages come out in document order
+            first, future = inflight.popleft()
+            texts = future.result()
+            for offset, text in enumerate(texts):
+                yield DocumentPage(first + offset + 1, text)
+            pages_done += len(texts)
+            if progress:
+                progress(pages_done, page_count)
+    finally:
+        for _, future in inflight:
+            future.cancel()
+
+
+# ========================================
+# DOCX
+# ========================================
+def iter_docx_paragraphs(path: str) -> Iterator[DocumentPage]:
+    """Paragraph text from word/document.xml without building the whole tree"""
+    with zipfile.ZipFile(path) as archive:
+        with archive.open("word/document.xml") as xml:
+            number = 0
+            parts: list[str] = []
+            for event, element in iterparse(xml, events=("end",)):
+                if element.tag == f"{_W}t":
+                    parts.append(element.text or "")
+                elif element.tag == f"{_W}tab":
+                    parts.append("\t")
+                elif element.tag == f"{_W}p":
+                    number += 1
+                    text = "".join(parts)
+                    parts = []
+                    element.clear()
+                    if text.strip():
+                        yield DocumentPage(number, text)
+                elif element.tag == f"{_W}body":
+                    element.clear()
+
+
+# ========================================
+# EXTRACT + SCAN
+# ========================================
+def iter_document(path: str, content_type: str, progress: Optional[PageProgress] = None) -> Iterator[DocumentPage]:
+    if content_type == PDF_TYPE:
+        pages = iter_pdf_pages(path, progress=progress)
+    elif content_type == DOCX_TYPE:
+        pages = iter_docx_paragraphs(path)
+    else:
+        raise ValueError(f"Unsupported document type: {content_type}")
+    try:
+        yield from pages
+    except (PyPdfError, zipfile.BadZipFile, KeyError, ParseError) as e:
+        raise DocumentError(f"Could not read document: {e}") from e
+
+
+def scan_document(
+    path: str,
+    content_type: str,
+    ruleset: Optional[RuleSet] = None,
+    on_issues: Optional[IssuesCallback] = None,
+    progress: Optional[PageProgress] = None,
+    limit: int = MAX_ISSUES_PER_SCAN,
+) -> tuple[list[Issue], int]:
+    """
+    Scan a document page by page -> (issues, characters scanned)
+
+    Issue offsets are into the document's text with pages joined by a blank
+    line; timestamp says which page (or paragraph) the phrase is on.
+    """
+    ruleset = ruleset or get_default_ruleset()
+    label = "Page" if content_type == PDF_TYPE else "Paragraph"
+    scanner = ruleset.scanner()
+    page_starts: list[int] = []
+    page_numbers: list[int] = []
+    issues: list[Issue] = []
+    position = 0
+
+    def collect(hits) -> None:
+        new = []
+        for hit in hits:
+            if len(issues) + len(new) >= limit:
+                break
+            page = page_numbers[bisect.bisect_right(page_starts, hit.start) - 1]
+            new.extend(hits_to_issues([hit], timestamp=f"{label} {page}"))
+        if new:
+            issues.extend(new)
+            if on_issues:
+                on_issues(new)
+
+    for page in iter_document(path, content_type, progress):
+        text = page.text + PAGE_SEPARATOR
+        page_starts.append(position)
+        page_numbers.append(page.number)
+        position += len(text)
+        collect(scanner.feed(text))
+        if len(issues) >= limit:
+            logger.warning("⚠️ Document scan stopped after %s issues", limit)
+            break
+    collect(scanner.finish())
+    return issues, position
@@ -0,0 +1,152 @@
+"""
+ISSUE EXTRACTION ENGINE
+
+Turns a free-text LLM compliance answer into structured Issues. This is the
+server-side replacement for extractIssuesFromText / determineSeverity /
+extractRecommendation in src/utils/responseMapper.ts.
+
+The frontend ran three global regexes plus a keyword scan per match, and a
+line could match more than one pattern and show up as a duplicate issue.
+Here:
+
+- one combined regex walks the text once; each line matches at most one form
+- one keyword automaton pass over each matched line finds both the severity
+  words and the recommendation markers
+- identical issues are collapsed
+"""
+
+import re
+from datetime import datetime
+from typing import Optional
+
+from backend.automaton import KeywordAutomaton
+from backend.models import ComplianceReport, Issue, Metadata, build_report
+from backend.scoring import SEVERITY_RANK, build_summary
+
+MAX_TITLE_LENGTH = 100
+MAX_DESCRIPTION_LENGTH = 500
+DEFAULT_RECOMMENDATION = "Please review and address this issue."
+
+# ========================================
+# PATTERNS
+# ========================================
+# The three issue forms the frontend recognised, as one alternation:
+#   "ISSUE: title - description"   (also Problem / Warning / Error)
+#   "- High: description"          (bullet with a severity label)
+#   "1. description"               (numbered list item)
+# A list item that is itself "ISSUE: ..." is parsed as the ISSUE form, once.
+_ISSUE_LINE = re.compile(
+    r"""
+      (?:^[ \t]*(?:\d+\.|[-•])[ \t]*)?\b(?:ISSUE|Problem|Warning|Error):[ \t]*(?P<title>[^\n-]+)(?:[ \t]*-[ \t]*(?P<detail>[^\n]+))?
+    | ^[ \t]*[-•][ \t]*(?P<level>Critical|High|Medium|Low):[ \t]*(?P<leveled>[^\n]+)
+    | ^[ \t]*\d+\.[ \t]*(?P<item>[^\n]+)
+    """,
+    re.IGNORECASE | re.MULTILINE | re.VERBOSE,
+)
+
+# Same word lists as determineSeverity / extractRecommendation
+SEVERITY_KEYWORDS = {
+    "high": ["critical", "severe", "violation", "illegal", "prohibited"],
+    "medium": ["warning", "concern", "issue", "problem"],
+}
+RECOMMENDATION_MARKERS = [
+    "recommendation:", "suggest:", "should:", "must:", "need to:",
+    "fix:", "resolve:", "address:",
+]
+
+LEVEL_SEVERITY = {"critical": "high", "high": "high", "medium": "medium", "low": "low"}
+
+_KEYWORDS = KeywordAutomaton(
+    [(word, ("severity", level)) for level, words in SEVERITY_KEYWORDS.items() for word in words]
+    + [(marker, ("recommendation", None)) for marker in RECOMMENDATION_MARKERS]
+)
+
+
+# ========================================
+# EXTRACTION
+# ========================================
+def _scan_line(line: str) -> tuple[str, Optional[str]]:
+    """One automaton pass over a line -> (severity, recommendation or None)"""
+    severity = "low"
+    recommendation = None
+    for start, end, (kind, level) in _KEYWORDS.find_all(line):
+        if kind == "severity":
+            if SEVERITY_RANK[level] > SEVERITY_RANK[severity]:
+                severity = level
+        elif recommendation is None:
+            recommendation = line[end:].strip() or None
+    return severity, recommendation
+
+
+def extract_issues(text: str) -> list[Issue]:
+    """Structured, de-duplicated issues from an LLM response"""
+    issues: list[Issue] = []
+    seen: set[tuple[str, str]] = set()
+
+    for match in _ISSUE_LINE.finditer(text):
+        groups = match.groupdict()
+        line = match.group(0)
+
+        if groups["title"] is not None:
+            title = groups["title"].strip()
+            description = (groups["detail"] or groups["title"]).strip()
+        elif groups["level"] is not None:
+            description = groups["leveled"].strip()
+            title = description
+        else:
+            title = description = groups["item"].strip()
+
+        if not title:
+            continue
+
+        key = (title.casefold(), " ".join(description.casefold().split()))
+        if key in seen:
+            continue
+        seen.add(key)
+
+        severity, recommendation = _scan_line(line)
+        if groups["level"] is not None:
+            labelled = LEVEL_SEVERITY[groups["level"].lower()]
+            if SEVERITY_RANK[labelled] > SEVERITY_RANK[severity]:
+                severity = labelled
+
+        issues.append(Issue(
+            id=f"issue-{len(issues) + 1}",
+            severity=severity,
+            title=title[:MAX_TITLE_LENGTH],
+            description=description[:MAX_DESCRIPTION_LENGTH],
+            recommendation=recommendation or DEFAULT_RECOMMENDATION,
+        ))
+
+    # No structured issues - one general issue from the whole response
+    if not issues and text.strip():
+        severity, _ = _scan_line(text)
+        issues.append(Issue(
+            id="issue-1",
+            severity=severity,
+            title="Compliance Review",
+            description=text[:MAX_DESCRIPTION_LENGTH],
+            recommendation="Please review the analysis and take appropriate action.",
+        ))
+
+    return issues
+
+
+def report_from_llm_response(
+    text: str,
+    file_name: str,
+    file_size: int,
+    duration_sec: Optional[int] = None,
+) -> ComplianceReport:
+    """Full ComplianceReport (issues, score, status) from an LLM response"""
+    issues = extract_issues(text)
+    return build_report(
+        summary=build_summary(issues),
+        issues=issues,
+        metadata=Metadata(
+            fileName=file_name,
+            fileSize=file_size,
+            durationSec=duration_sec,
+            checkedAt=datetime.now().isoformat()
+        )
+    )
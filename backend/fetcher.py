@@ -0,0 +1,619 @@
+"""
+URL FETCHER
+
+Fetches the article page or YouTube metadata behind a URL check. News links
+are re-checked constantly, so fetching is built to hit the network as
+little as possible:
+
+- URLs are canonicalized first - youtu.be/ID, watch?v=ID, /embed/ID and
+  /shorts/ID are one video, tracking parameters are dropped - so each
+  resource is fetched (and cached) once
+- One shared httpx connection pool, with at most PER_HOST_LIMIT requests
+  to the same host at a time
+- Responses are kept in a SQLite HTTP cache; fresh entries (Cache-Control
+  max-age) are served without a request, stale ones are revalidated with a
+  conditional GET (If-None-Match / If-Modified-Since), and a 304 reuses the
+  stored body
+- Concurrent fetches of the same URL share one request, and a URL that just
+  failed is not retried for FAILURE_TTL_SECONDS
+
+Only public addresses are fetched. Every connection (including each
+redirect hop - redirects are followed here, not by httpx) resolves the host
+once, refuses it if any address is loopback, private, link-local (cloud
+metadata) or otherwise non-global, and then connects to that vetted
+address - not to a second lookup a DNS-rebinding host could answer
+differently. A URL check must not become a way to read internal services.
+Hosts listed in allowed_private_hosts (MEDIA_CHECKER_FETCH_ALLOW_PRIVATE_
+HOSTS) are exempt; tests and benchmarks opt in to their stand-in server
+that way.
+
+When a refetch fails - network error or a 5xx - a cached copy is served
+stale rather than failing the check.
+
+YouTube videos are fetched through the oEmbed endpoint (title, channel),
+which needs no API key. Point youtube_oembed_url (MEDIA_CHECKER_YOUTUBE_
+OEMBED_URL) at a local server to test without the network.
+"""
+
+import asyncio
+import hashlib
+import ipaddress
+import json
+import logging
+import os
+import re
+import socket
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from typing import AsyncIterator, Optional
+from urllib.parse import parse_qsl, quote, urlencode, urljoin, urlsplit, urlunsplit
+
+import httpcore
+import httpx
+
+from backend.config import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# LIMITS
+# ========================================
+FETCH_CACHE_PATH = DATA_DIR / "fetch-cache.sqlite3"
+MAX_CONNECTIONS = 64
+MAX_KEEPALIVE_CONNECTIONS = 32
+PER_HOST_LIMIT = 4
+CONNECT_TIMEOUT_SECONDS = 5
+READ_TIMEOUT_SECONDS = 15
+MAX_BODY_BYTES = 2 * 1024 * 1024           # longer pages are truncated
+MAX_FRESH_SECONDS = 24 * 60 * 60           # cap on a server's max-age
+FAILURE_TTL_SECONDS = 60
+MAX_REDIRECTS = 5
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+CACHE_MAX_ENTRIES = 20_000
+USER_AGENT = "MediaComplianceChecker/1.0 (+compliance checks)"
+YOUTUBE_OEMBED_URL = os.environ.get("MEDIA_CHECKER_YOUTUBE_OEMBED_URL", "https://www.youtube.com/oembed")
+# Hosts that may resolve to loopback / private addresses (local stand-in servers only)
+ALLOWED_PRIVATE_HOSTS = frozenset(
+    host.strip().lower() for host in os.environ.get("MEDIA_CHECKER_FETCH_ALLOW_PRIVATE_HOSTS", "").split(",")
+    if host.strip()
+)
+
+YOUTUBE_HOSTS = {"youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com",
+                 "youtube-nocookie.com", "www.youtube-nocookie.com"}
+YOUTUBE_PATH_PREFIXES = ("/embed/", "/shorts/", "/live/", "/v/")
+TRACKING_PARAMS = {"fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid"}
+_VIDEO_ID = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+class FetchError(Exception):
+    status_code = 502
+
+
+class InvalidURL(FetchError):
+    status_code = 400
+
+
+class UpstreamServerError(FetchError):
+    """The server answered 5xx (a cached copy may still be served)"""
+
+
+# ========================================
+# CANONICAL URLS
+# ========================================
+def youtube_video_id(url: str) -> Optional[str]:
+    """The video id of any YouTube video URL form, else None"""
+    parts = urlsplit(url.strip())
+    host = (parts.hostname or "").lower()
+    candidate = None
+    if host == "youtu.be":
+        candidate = parts.path.strip("/").split("/", 1)[0]
+    elif host in YOUTUBE_HOSTS:
+        if parts.path.rstrip("/") == "/watch":
+            candidate = dict(parse_qsl(parts.query)).get("v")
+        elif parts.path.startswith(YOUTUBE_PATH_PREFIXES):
+            candidate = parts.path.split("/")[2]
+    return candidate if candidate and _VIDEO_ID.match(candidate) else None
+
+
+def canonical_url(url: str) -> str:
+    """
+    One spelling per resource
+
+    YouTube videos become https://www.youtube.com/watch?v=ID. Other URLs get
+    a lowercase scheme/host, no fragment, default port or tracking
+    parameters, and a sorted query.
+    """
+    video_id = youtube_video_id(url)
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    port = parts.port
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        host = f"{host}:{port}"
+    path = parts.path or "/"
+    query = urlencode(sorted(
+        (name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith("utm_") and name.lower() not in TRACKING_PARAMS
+    ))
+    return urlunsplit((scheme, host, path, query, ""))
+
+
+# ========================================
+# ADDRESS CHECKS
+# ========================================
+def is_public_address(address: str) -> bool:
+    """False for loopback, private, link-local, multicast, reserved... addresses"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+def _literal_address(host: str) -> Optional[str]:
+    """host if it is an IP address literal, else None"""
+    try:
+        return str(ipaddress.ip_address(host.strip("[]")))
+    except ValueError:
+        return None
+
+
+async def resolve_public(host: str, port: int, allowed_private_hosts: frozenset = frozenset()) -> list[str]:
+    """Addresses to connect to for host - InvalidURL if any of them is not public"""
+    host = host.lower()
+    if host in allowed_private_hosts:
+        return [host]
+    literal = _literal_address(host)
+    if literal is not None:
+        addresses = [literal]
+    else:
+        infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+    blocked = [address for address in addresses if not is_public_address(address)]
+    if blocked:
+        raise InvalidURL(f"{host} resolves to a non-public address ({blocked[0]})")
+    return addresses
+
+
+class PinnedNetworkBackend(httpcore.AsyncNetworkBackend):
+    """
+    httpcore network backend that connects only to addresses resolve_public vetted
+
+    httpcore still passes the URL's host name to start_tls, so SNI and
+    certificate checks use the name, and the Host header is unchanged.
+    """
+
+    def __init__(self, backend: httpcore.AsyncNetworkBackend, allowed_private_hosts: frozenset = frozenset()):
+        self._backend = backend
+        self.allowed_private_hosts = allowed_private_hosts
+
+    async def connect_tcp(self, host, port, timeout=None, local_address=None, socket_options=None):
+        try:
+            addresses = await asyncio.wait_for(resolve_public(host, port, self.allowed_private_hosts), timeout)
+        except asyncio.TimeoutError as e:
+            raise httpcore.ConnectTimeout(f"Resolving {host} timed out") from e
+        except (OSError, UnicodeError) as e:
+            raise httpcore.ConnectError(f"Could not resolve {host}") from e
+        error: Optional[Exception] = None
+        for address in addresses:
+            try:
+                return await self._backend.connect_tcp(address, port, timeout, local_address, socket_options)
+            except (httpcore.ConnectError, httpcore.ConnectTimeout) as e:
+                error = e
+        raise error
+
+    async def connect_unix_socket(self, path, timeout=None, socket_options=None):
+        raise httpcore.ConnectError("Unix sockets are not fetched")
+
+    async def sleep(self, seconds: float) -> None:
+        await self._backend.sleep(seconds)
+
+
+# ========================================
+# FETCHED PAGES
+# ========================================
+@dataclass
+class FetchedPage:
+    """A fetched (or cached) response body - picklable, so it can go to job workers"""
+    url: str                        # canonical URL
+    final_url: str                  # after redirects (the oEmbed URL for YouTube)
+    status: int
+    content_type: str
+    body: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    fetched_at: float = 0.0
+    fresh_until: float = 0.0
+    truncated: bool = False
+    source: str = "network"         # "network", "cache", "revalidated" or "stale"
+    extracted: Optional[tuple] = field(default=None, repr=False, compare=False)    # page_text() result
+
+    @property
+    def sha256(self) -> str:
+        return hashlib.sha256(self.body).hexdigest()
+
+    def text(self) -> str:
+        charset = re.search(r"charset=([\w.-]+)", self.content_type or "", re.I)
+        try:
+            return self.body.decode(charset.group(1) if charset else "utf-8", errors="replace")
+        except LookupError:
+            return self.body.decode("utf-8", errors="replace")
+
+
+class _PageText(HTMLParser):
+    """Title, description and visible text of an HTML page"""
+    SKIPPED = {"script", "style", "noscript", "template", "svg", "head"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.description = None
+        self.parts: list[str] = []
+        self._in_title = False
+        self._skipping = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "title":
+            self._in_title = True
+        elif tag == "meta":
+            values = dict(attrs)
+            name = (values.get("name") or values.get("property") or "").lower()
+            if name in ("description", "og:description") and not self.description:
+                self.description = values.get("content")
+            elif name == "og:title" and values.get("content"):
+                self.title = values["content"]
+        elif tag in self.SKIPPED:
+            self._skipping += 1
+
+    def handle_endtag(self, tag):
+        if tag == "title":
+            self._in_title = False
+        elif tag in self.SKIPPED and self._skipping:
+            self._skipping -= 1
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = self.title or data.strip() or None
+        elif not self._skipping and data.strip():
+            self.parts.append(data.strip())
+
+
+def page_text(page: FetchedPage) -> tuple[Optional[str], str]:
+    """(title, checkable text) of a fetched page - parsed once per page"""
+    if page.extracted is None:
+        page.extracted = _extract(page)
+    return page.extracted
+
+
+def _extract(page: FetchedPage) -> tuple[Optional[str], str]:
+    content_type = (page.content_type or "").lower()
+    if "json" in content_type:
+        # YouTube oEmbed
+        try:
+            data = json.loads(page.body)
+        except ValueError:
+            return None, ""
+        title = data.get("title")
+        return title, "\n".join(str(data[key]) for key in ("title", "author_name") if data.get(key))
+    if "html" in content_type or not content_type:
+        parser = _PageText()
+        parser.feed(page.text())
+        parser.close()
+        lines = [line for line in (parser.title, parser.description) if line] + parser.parts
+        return parser.title, "\n".join(lines)
+    if content_type.startswith("text/"):
+        return None, page.text()
+    return None, ""
+
+
+# ========================================
+# HTTP CACHE
+# ========================================
+class HTTPCache:
+    """Response bodies and validators by canonical URL, in SQLite"""
+
+    def __init__(self, path=FETCH_CACHE_PATH, max_entries: int = CACHE_MAX_ENTRIES):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._puts = 0
+        self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY,"
+            " final_url TEXT NOT NULL,"
+            " status INTEGER NOT NULL,"
+            " content_type TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " etag TEXT,"
+            " last_modified TEXT,"
+            " truncated INTEGER NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " fresh_until REAL NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_used_at ON responses(used_at)")
+        self._db.commit()
+
+    def get(self, url: str) -> Optional[FetchedPage]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT final_url, status, content_type, body, etag, last_modified, truncated,"
+                " fetched_at, fresh_until FROM responses WHERE url = ?", (url,)).fetchone()
+        if row is None:
+            return None
+        final_url, status, content_type, body, etag, last_modified, truncated, fetched_at, fresh_until = row
+        return FetchedPage(
+            url=url, final_url=final_url, status=status, content_type=content_type,
+            body=zlib.decompress(body), etag=etag, last_modified=last_modified,
+            fetched_at=fetched_at, fresh_until=fresh_until, truncated=bool(truncated), source="cache",
+        )
+
+    def put(self, page: FetchedPage) -> None:
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (url, final_url, status, content_type, body, etag,"
+                " last_modified, truncated, fetched_at, fresh_until, used_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (page.url, page.final_url, page.status, page.content_type, zlib.compress(page.body),
+                 page.etag, page.last_modified, int(page.truncated), page.fetched_at, page.fresh_until,
+                 time.time()),
+            )
+            self._puts += 1
+            if self._puts % 500 == 0:
+                self._trim()
+            self._db.commit()
+
+    def touch(self, url: str, fresh_until: float) -> None:
+        """A 304 came back: the stored body is current again"""
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET fetched_at = ?, fresh_until = ?, used_at = ? WHERE url = ?",
+                             (now, fresh_until, now, url))
+            self._db.commit()
+
+    def _trim(self) -> None:
+        self._db.execute(
+            "DELETE FROM responses WHERE url IN ("
+            " SELECT url FROM responses ORDER BY used_at DESC LIMIT -1 OFFSET ?)", (self.max_entries,))
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _fresh_until(headers: httpx.Headers, now: float) -> Optional[float]:
+    """When a response stops being fresh - None if it must not be stored"""
+    directives = {}
+    for part in headers.get("cache-control", "").lower().split(","):
+        name, _, value = part.strip().partition("=")
+        directives[name] = value.strip('"')
+    if "no-store" in directives or "private" in directives:
+        return None
+    if "no-cache" in directives:
+        return now
+    for name in ("s-maxage", "max-age"):
+        if directives.get(name, "").isdigit():
+            return now + min(int(directives[name]), MAX_FRESH_SECONDS)
+    # No explicit lifetime - keep it, but revalidate on every use
+    return now
+
+
+# ========================================
+# FETCHER
+# ========================================
+class URLFetcher:
+    """Shared pool + per-host limits + HTTP cache + single-flight"""
+
+    def __init__(
+        self,
+        cache: Optional[HTTPCache] = None,
+        per_host_limit: int = PER_HOST_LIMIT,
+        youtube_oembed_url: str = YOUTUBE_OEMBED_URL,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        allowed_private_hosts: frozenset = ALLOWED_PRIVATE_HOSTS,
+    ):
+        self.cache = cache or HTTPCache()
+        self.per_host_limit = per_host_limit
+        self.youtube_oembed_url = youtube_oembed_url
+        self.allowed_private_hosts = frozenset(host.lower() for host in allowed_private_hosts)
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+        self._hosts: dict[str, tuple[asyncio.Semaphore, int]] = {}     # host -> (slots, users)
+        self._inflight: dict[str, asyncio.Future] = {}
+        self._failures: dict[str, tuple[float, str]] = {}               # url -> (retry after, error)
+        self._stats = {
+            "fetched": 0,
+            "cacheHits": 0,
+            "revalidated": 0,
+            "stale": 0,
+            "coalesced": 0,
+            "failed": 0,
+        }
+
+    async def fetch(self, url: str) -> FetchedPage:
+        """The page behind url, from the cache when it is still valid"""
+        canonical = canonical_url(url)
+        parts = urlsplit(canonical)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise InvalidURL(f"Not an http(s) URL: {url[:200]}")
+        # Obviously internal URLs are refused before even the cache is consulted
+        host = parts.hostname.lower()
+        literal = _literal_address(host)
+        if host not in self.allowed_private_hosts and (
+                host == "localhost" or host.endswith(".localhost") or (literal and not is_public_address(literal))):
+            raise InvalidURL(f"Not a public address: {host}")
+
+        failure = self._failures.get(canonical)
+        if failure is not None:
+            if failure[0] > time.time():
+                raise FetchError(failure[1])
+            del self._failures[canonical]
+
+        pending = self._inflight.get(canonical)
+        if pending is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[canonical] = future
+        try:
+            page = await self._fetch(canonical)
+            future.set_result(page)
+            return page
+        except BaseException as e:
+            if isinstance(e, FetchError):
+                self._stats["failed"] += 1
+                self._failures[canonical] = (time.time() + FAILURE_TTL_SECONDS, str(e))
+            future.set_exception(e)
+            future.exception()
+            raise
+        finally:
+            self._inflight.pop(canonical, None)
+
+    def stats(self) -> dict:
+        return {**self._stats, "hostsActive": len(self._hosts)}
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self.cache.close()
+
+    # ---------- internals ----------
+
+    def _request_url(self, canonical: str) -> str:
+        if youtube_video_id(canonical):
+            return f"{self.youtube_oembed_url}?format=json&url={quote(canonical, safe='')}"
+        return canonical
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            transport = self._transport or self._pinned_transport()
+            self._client = httpx.AsyncClient(
+                transport=transport,
+                follow_redirects=False,             # followed in _fetch, checking every hop
+                timeout=httpx.Timeout(READ_TIMEOUT_SECONDS, connect=CONNECT_TIMEOUT_SECONDS),
+                headers={"User-Agent": USER_AGENT},
+            )
+        return self._client
+
+    def _pinned_transport(self) -> httpx.AsyncHTTPTransport:
+        transport = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+            max_connections=MAX_CONNECTIONS, max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS))
+        # httpx has no option for the network backend; its connection pool takes one
+        pool = transport._pool
+        pool._network_backend = PinnedNetworkBackend(pool._network_backend, self.allowed_private_hosts)
+        return transport
+
+    async def _check_url(self, url: str) -> None:
+        """Refuse a non-http(s) hop; with a caller's transport, also vet the host here"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise InvalidURL(f"Not an http(s) URL: {url[:200]}")
+        if self._transport is not None:
+            # Not pinned - the best that can be done is checking before the request
+            try:
+                await resolve_public(parts.hostname, parts.port or (443 if parts.scheme == "https" else 80),
+                                     self.allowed_private_hosts)
+            except (OSError, UnicodeError) as e:
+                raise FetchError(f"Could not resolve {parts.hostname}") from e
+
+    @asynccontextmanager
+    async def _host_slot(self, host: str) -> AsyncIterator[None]:
+        slots, users = self._hosts.get(host) or (asyncio.Semaphore(self.per_host_limit), 0)
+        self._hosts[host] = (slots, users + 1)
+        try:
+            async with slots:
+                yield
+        finally:
+            slots, users = self._hosts[host]
+            if users == 1:
+                del self._hosts[host]
+            else:
+                self._hosts[host] = (slots, users - 1)
+
+    async def _fetch(self, canonical: str) -> FetchedPage:
+        cached = await asyncio.to_thread(self.cache.get, canonical)
+        if cached is not None and cached.fresh_until > time.time():
+            self._stats["cacheHits"] += 1
+            return cached
+
+        headers = {}
+        if cached is not None:
+            if cached.etag:
+                headers["If-None-Match"] = cached.etag
+            if cached.last_modified:
+                headers["If-Modified-Since"] = cached.last_modified
+
+        request_url = self._request_url(canonical)
+        host = urlsplit(request_url).hostname or ""
+        try:
+            async with self._host_slot(host):
+                for _ in range(MAX_REDIRECTS + 1):
+                    await self._check_url(request_url)
+                    async with self._get_client().stream("GET", request_url, headers=headers) as response:
+                        if response.status_code in REDIRECT_STATUSES and "location" in response.headers:
+                            request_url = urljoin(request_url, response.headers["location"])
+                            continue
+                        now = time.time()
+                        if response.status_code == 304 and cached is not None:
+                            fresh_until = _fresh_until(response.headers, now) or now
+                            await asyncio.to_thread(self.cache.touch, canonical, fresh_until)
+                            self._stats["revalidated"] += 1
+                            cached.source = "revalidated"
+                            return cached
+                        if response.status_code >= 500:
+                            raise UpstreamServerError(f"{host} answered {response.status_code}")
+                        if response.status_code >= 400:
+                            raise FetchError(f"{host} answered {response.status_code}")
+                        body, truncated = await _read_capped(response)
+                        break
+                else:
+                    raise FetchError(f"More than {MAX_REDIRECTS} redirects from {host}")
+        except (httpx.HTTPError, UpstreamServerError) as e:
+            if cached is not None:
+                # Better an old copy than no check at all
+                logger.warning("⚠️ Serving stale copy of %s: %s", canonical, e)
+                self._stats["stale"] += 1
+                cached.source = "stale"
+                return cached
+            if isinstance(e, FetchError):
+                raise
+            raise FetchError(f"Could not fetch {host}: {type(e).__name__}") from e
+
+        fresh_until = _fresh_until(response.headers, now)
+        page = FetchedPage(
+            url=canonical,
+            final_url=str(response.url),
+            status=response.status_code,
+            content_type=response.headers.get("content-type", ""),
+            body=body,
+            etag=response.headers.get("etag"),
+            last_modified=response.headers.get("last-modified"),
+            fetched_at=now,
+            fresh_until=fresh_until or now,
+            truncated=truncated,
+        )
+        if fresh_until is not None:
+            await asyncio.to_thread(self.cache.put, page)
+        self._stats["fetched"] += 1
+        return page
+
+
+async def _read_capped(response: httpx.Response) -> tuple[bytes, bool]:
+    chunks = []
+    size = 0
+    async for chunk in response.aiter_bytes():
+        chunks.append(chunk)
+        size += len(chunk)
+        if size >= MAX_BODY_BYTES:
+            return b"".join(chunks)[:MAX_BODY_BYTES], True
+    return b"".join(chunks), False
@@ -0,0 +1,375 @@
+"""
+CHECK HISTORY STORE (GET /history)
+
+Every ComplianceReport the API returns is recorded in a SQLite database
+(WAL mode, so reads never wait for the writer):
+
+- One row per check with the columns the History view filters and sorts on
+  (checked_at, status, max severity, file name, ...) - each indexed - plus
+  the full report as JSON. checked_at is the report's metadata.checkedAt,
+  so a cached or near-duplicate report is listed under the time it says
+- An FTS5 table over file names and issue titles/descriptions for search
+- Pages use a keyset cursor on (checked_at, id), so page 500 costs the same
+  as page 1 and rows inserted meanwhile never shift a page
+- Exports are generated from a cursor in batches, never the whole result set
+
+Writes go through a queue to one writer thread that serializes the reports
+and commits in batches, so recording a check never blocks a request.
+"""
+
+import base64
+import csv
+import io
+import json
+import logging
+import os
+import queue
+import sqlite3
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Iterator, Optional
+
+from backend.config import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+HISTORY_PATH = DATA_DIR / "history.sqlite3"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+EXPORT_BATCH = 500                  # rows fetched per step while exporting
+WRITE_BATCH = 200                   # rows committed per transaction (at most)
+
+STATUSES = ("pass", "partial_fail", "fail")
+SEVERITIES = ("low", "medium", "high")
+KINDS = ("file", "url", "text")
+
+EXPORT_COLUMNS = ["id", "checkedAt", "kind", "fileName", "fileSize", "durationSec", "status", "score",
+                  "issuesCount", "highSeverity", "mediumSeverity", "lowSeverity"]
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS checks ("
+    " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+    " checked_at TEXT NOT NULL,"
+    " kind TEXT NOT NULL,"
+    " file_name TEXT NOT NULL COLLATE NOCASE,"
+    " file_size INTEGER NOT NULL,"
+    " duration_sec INTEGER,"
+    " status TEXT NOT NULL,"
+    " score INTEGER NOT NULL,"
+    " issues_count INTEGER NOT NULL,"
+    " high INTEGER NOT NULL,"
+    " medium INTEGER NOT NULL,"
+    " low INTEGER NOT NULL,"
+    " max_severity INTEGER NOT NULL,"     # 0 none, 1 low, 2 medium, 3 high
+    " report TEXT NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS checks_checked_at ON checks(checked_at, id)",
+    "CREATE INDEX IF NOT EXISTS checks_status ON checks(status, checked_at, id)",
+    "CREATE INDEX IF NOT EXISTS checks_severity ON checks(max_severity, checked_at, id)",
+    "CREATE INDEX IF NOT EXISTS checks_file_name ON checks(file_name)",
+]
+_FTS_SCHEMA = "CREATE VIRTUAL TABLE IF NOT EXISTS checks_fts USING fts5(file_name, issues)"
+
+
+class HistoryQueryError(Exception):
+    """Bad filter or cursor - status_code is what the endpoint should return"""
+    status_code = 400
+
+
+# ========================================
+# QUERY
+# ========================================
+@dataclass
+class HistoryQuery:
+    status: list = field(default_factory=list)      # any of STATUSES
+    severity: Optional[str] = None                  # at least one issue this severe
+    kind: list = field(default_factory=list)        # any of KINDS
+    file_name: Optional[str] = None                 # prefix, case-insensitive
+    search: Optional[str] = None                    # full-text over file names and issues
+    since: Optional[str] = None                     # checkedAt >= (ISO timestamp)
+    until: Optional[str] = None                     # checkedAt < (ISO timestamp)
+    order: str = "desc"
+
+    def __post_init__(self):
+        for value in self.status:
+            if value not in STATUSES:
+                raise HistoryQueryError(f"Unknown status: {value}")
+        for value in self.kind:
+            if value not in KINDS:
+                raise HistoryQueryError(f"Unknown kind: {value}")
+        if self.severity is not None and self.severity not in SEVERITIES:
+            raise HistoryQueryError(f"Unknown severity: {self.severity}")
+        if self.order not in ("asc", "desc"):
+            raise HistoryQueryError("order must be asc or desc")
+
+
+def encode_cursor(checked_at: str, row_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([checked_at, row_id]).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str, int]:
+    try:
+        checked_at, row_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return str(checked_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HistoryQueryError("Invalid cursor")
+
+
+def _fts_match(search: str) -> Optional[str]:
+    """User text -> an FTS5 query: every word must match, the last one as a prefix"""
+    words = [w for w in search.replace('"', " ").split() if w]
+    if not words:
+        return None
+    terms = [f'"{w}"' for w in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def _row_to_item(row: sqlite3.Row) -> dict:
+    return {
+        "id": row["id"],
+        "checkedAt": row["checked_at"],
+        "kind": row["kind"],
+        "fileName": row["file_name"],
+        "fileSize": row["file_size"],
+        "durationSec": row["duration_sec"],
+        "status": row["status"],
+        "score": row["score"],
+        "issuesCount": row["issues_count"],
+        "highSeverity": row["high"],
+        "mediumSeverity": row["medium"],
+        "lowSeverity": row["low"],
+    }
+
+
+def _checked_at(metadata: dict) -> str:
+    """metadata.checkedAt in the stored form (sorts as text), or now if it is missing"""
+    try:
+        checked = datetime.fromisoformat(metadata["checkedAt"])
+    except (KeyError, TypeError, ValueError):
+        checked = datetime.now()
+    return checked.isoformat(timespec="microseconds")
+
+
+def _history_row(report: dict, kind: str) -> tuple[tuple, str]:
+    """(checks row, text for the search index)"""
+    summary = report["summary"]
+    metadata = report["metadata"]
+    issues = report.get("issues", [])
+    counts = {severity: 0 for severity in SEVERITIES}
+    for issue in issues:
+        if issue.get("severity") in counts:
+            counts[issue["severity"]] += 1
+    max_severity = max((SEVERITIES.index(s) + 1 for s, n in counts.items() if n), default=0)
+    row = (
+        _checked_at(metadata), kind, metadata.get("fileName") or "",
+        metadata.get("fileSize") or 0, metadata.get("durationSec"), summary["status"], summary["score"],
+        summary["issuesCount"], counts["high"], counts["medium"], counts["low"], max_severity,
+        json.dumps(report, separators=(",", ":")),
+    )
+    issue_text = "\n".join(f"{i.get('title', '')} {i.get('description', '')}" for i in issues)
+    return row, issue_text
+
+
+# ========================================
+# STORE
+# ========================================
+class HistoryStore:
+    """Recorded checks: batched background writes, indexed keyset reads"""
+
+    def __init__(self, path=HISTORY_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = str(path)
+        self._local = threading.local()
+        db = self._connect()
+        for statement in _SCHEMA:
+            db.execute(statement)
+        try:
+            db.execute(_FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError as e:      # SQLite built without FTS5 / too old
+            logger.warning("⚠️ History search falls back to file names only: %s", e)
+            self.fts = False
+        db.commit()
+
+        self._writes: queue.Queue = queue.Queue()
+        self._writer = threading.Thread(target=self._write_forever, name="history-writer", daemon=True)
+        self._writer.start()
+
+    # ---------- writes ----------
+
+    def record(self, report: dict, kind: str) -> None:
+        """Queue a check for storage (non-blocking - serialized in the writer thread)"""
+        # Callers may go on to tweak the (cached) report's metadata; snapshot just that
+        self._writes.put((dict(report, metadata=dict(report["metadata"])), kind))
+
+    def delete(self, check_id: int) -> bool:
+        db = self._connect()
+        with db:
+            deleted = db.execute("DELETE FROM checks WHERE id = ?", (check_id,)).rowcount
+            if deleted and self.fts:
+                db.execute("DELETE FROM checks_fts WHERE rowid = ?", (check_id,))
+        return bool(deleted)
+
+    def flush(self) -> None:
+        """Wait until everything queued so far is committed"""
+        self._writes.join()
+
+    def close(self) -> None:
+        self._writes.put(None)
+        self._writer.join(timeout=10)
+
+    def _write_forever(self) -> None:
+        db = sqlite3.connect(self.path, timeout=30)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        while True:
+            batch = [self._writes.get()]
+            # Whatever else is already waiting goes into the same transaction
+            while len(batch) < WRITE_BATCH:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            stop = None in batch
+            rows = []
+            for check in batch:
+                if check is None:
+                    continue
+                try:
+                    rows.append(_history_row(*check))
+                except (KeyError, TypeError, ValueError) as e:
+                    logger.error("❌ Could not record a %s check in history: %s", check[1], e)
+            try:
+                with db:
+                    for row, issue_text in rows:
+                        row_id = db.execute(
+                            "INSERT INTO checks (checked_at, kind, file_name, file_size, duration_sec,"
+                            " status, score, issues_count, high, medium, low, max_severity, report)"
+                            " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                            row,
+                        ).lastrowid
+                        if self.fts:
+                            db.execute("INSERT INTO checks_fts (rowid, file_name, issues) VALUES (?, ?, ?)",
+                                       (row_id, row[2], issue_text))
+            except Exception as e:
+                logger.error("❌ Could not record %s checks in history: %s", len(rows), e)
+            finally:
+                for _ in batch:
+                    self._writes.task_done()
+            if stop:
+                db.close()
+                return
+
+    # ---------- reads ----------
+
+    def page(self, query: HistoryQuery, cursor: Optional[str] = None,
+             limit: int = DEFAULT_PAGE_SIZE) -> dict:
+        """One page of summaries plus the cursor for the next (None on the last page)"""
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        sql, params = self._select(query, cursor)
+        rows = self._connect().execute(f"{sql} LIMIT ?", (*params, limit + 1)).fetchall()
+        items = [_row_to_item(row) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = rows[limit - 1]
+            next_cursor = encode_cursor(last["checked_at"], last["id"])
+        return {"items": items, "nextCursor": next_cursor, "limit": limit}
+
+    def get(self, check_id: int) -> Optional[dict]:
+        row = self._connect().execute("SELECT report FROM checks WHERE id = ?", (check_id,)).fetchone()
+        return json.loads(row["report"]) if row else None
+
+    def stats(self) -> dict:
+        rows = self._connect().execute("SELECT status, COUNT(*) AS n FROM checks GROUP BY status").fetchall()
+        counts = {row["status"]: row["n"] for row in rows}
+        return {"total": sum(counts.values()), "byStatus": counts, "pendingWrites": self._writes.qsize()}
+
+    def iter_items(self, query: HistoryQuery) -> Iterator[dict]:
+        """Every matching summary, fetched EXPORT_BATCH rows at a time"""
+        # Own connection: an export may be iterated from several threadpool threads
+        db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        db.row_factory = sqlite3.Row
+        try:
+            sql, params = self._select(query, None)
+            rows = db.execute(sql, params)
+            while True:
+                batch = rows.fetchmany(EXPORT_BATCH)
+                if not batch:
+                    return
+                for row in batch:
+                    yield _row_to_item(row)
+        finally:
+            db.close()
+
+    def export_ndjson(self, query: HistoryQuery) -> Iterator[str]:
+        for item in self.iter_items(query):
+            yield json.dumps(item) + "\n"
+
+    def export_csv(self, query: HistoryQuery) -> Iterator[str]:
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+        for item in self.iter_items(query):
+            writer.writerow(item)
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    def _select(self, query: HistoryQuery, cursor: Optional[str]) -> tuple[str, list]:
+        where, params = [], []
+        if query.status:
+            where.append(f"status IN ({','.join('?' * len(query.status))})")
+            params.extend(query.status)
+        if query.kind:
+            where.append(f"kind IN ({','.join('?' * len(query.kind))})")
+            params.extend(query.kind)
+        if query.severity:
+            where.append("max_severity >= ?")
+            params.append(SEVERITIES.index(query.severity) + 1)
+        if query.file_name:
+            # Prefix as a range, so the (NOCASE) file_name index is used
+            where.append("file_name >= ? AND file_name < ?")
+            params.extend([query.file_name, query.file_name + "\uffff"])
+        if query.since:
+            where.append("checked_at >= ?")
+            params.append(query.since)
+        if query.until:
+            where.append("checked_at < ?")
+            params.append(query.until)
+        if query.search:
+            match = _fts_match(query.search)
+            if match and self.fts:
+                where.append("id IN (SELECT rowid FROM checks_fts WHERE checks_fts MATCH ?)")
+                params.append(match)
+            elif match:
+                where.append("file_name LIKE ?")
+                params.append(f"%{query.search}%")
+
+        comparison = "<" if query.order == "desc" else ">"
+        if cursor:
+            checked_at, row_id = decode_cursor(cursor)
+            where.append(f"(checked_at, id) {comparison} (?, ?)")
+            params.extend([checked_at, row_id])
+
+        direction = query.order.upper()
+        sql = ("SELECT id, checked_at, kind, file_name, file_size, duration_sec, status, score,"
+               " issues_count, high, medium, low FROM checks"
+               + (f" WHERE {' AND '.join(where)}" if where else "")
+               + f" ORDER BY checked_at {direction}, id {direction}")
+        return sql, params
+
+    def _connect(self) -> sqlite3.Connection:
+        """One read connection per thread (WAL readers don't block the writer)"""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.row_factory = sqlite3.Row
+            self._local.db = db
+        return db
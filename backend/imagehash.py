@@ -0,0 +1,290 @@
+"""
+PERCEPTUAL IMAGE HASH INDEX
+
+Most image uploads are resized or recompressed copies of assets that were
+already checked. Their bytes (and SHA-256) differ, so the result cache
+misses them; a perceptual hash does not.
+
+- The image is decoded at reduced scale (JPEG draft mode decodes straight
+  from the DCT at 1/2 - 1/8 size) to 32x32 grayscale.
+- pHash: the top-left 8x8 of the 2-D DCT of that, one bit per coefficient
+  above the median. dHash: one bit per horizontally adjacent pixel pair of
+  a 9x8 copy that gets brighter. Both are 64 bits, computed with NumPy for
+  any number of images at once.
+- A known image is one within PHASH_RADIUS bits (pHash) and DHASH_RADIUS
+  bits (dHash) of an indexed one.
+
+Radius lookups use multi-index hashing: the pHash is split into 4 16-bit
+chunks, and by pigeonhole a hash within r bits agrees with the query to
+within r // 4 bits on at least one chunk. The chunk values of every entry
+are kept in one sorted NumPy array, so a lookup is one vectorized binary
+search for all probes plus a popcount over the candidates - well under a millisecond at millions of
+entries. New entries go to a small pending buffer (scanned linearly) and
+are merged into the sorted arrays every MERGE_EVERY additions.
+
+Hashes and reports are stored in SQLite and loaded into memory on first
+use. Pillow and NumPy are optional - without them the index is off.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import BinaryIO, Optional, Union
+
+from backend.analysis import ANALYSIS_VERSION
+from backend.config import DATA_DIR
+from backend.neardup import NearDuplicate
+
+try:
+    import numpy as np
+except ImportError:         # optional - see module docstring
+    np = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:         # optional - see module docstring
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+HASH_SIDE = 32                      # pHash input is HASH_SIDE x HASH_SIDE grayscale
+LOW_FREQUENCIES = 8                 # 8x8 DCT coefficients -> 64 bits
+PHASH_RADIUS = 6
+DHASH_RADIUS = 10
+CHUNKS = 4
+CHUNK_BITS = 64 // CHUNKS
+CHUNK_RADIUS = PHASH_RADIUS // CHUNKS     # bits probed per chunk (caps the usable radius)
+MERGE_EVERY = 4096
+
+INDEX_PATH = DATA_DIR / "image-hashes.sqlite3"
+
+
+def image_hashing_available() -> bool:
+    return np is not None and Image is not None
+
+
+# ========================================
+# HASHES
+# ========================================
+def _dct_matrix(n: int) -> "np.ndarray":
+    """Orthonormal DCT-II basis (coefficients = D @ x @ D.T)"""
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    matrix = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2 / n)
+    matrix[0] /= np.sqrt(2)
+    return matrix.astype(np.float32)
+
+
+if np is not None:
+    _DCT = _dct_matrix(HASH_SIDE)
+
+
+def _pack_bits(bits: "np.ndarray") -> "np.ndarray":
+    """(n, 64) bools -> (n,) uint64, first bit most significant"""
+    return np.packbits(bits.reshape(len(bits), 64), axis=1).view(">u8").astype(np.uint64).ravel()
+
+
+def phash_batch(gray: "np.ndarray") -> "np.ndarray":
+    """(n, 32, 32) grayscale -> (n,) uint64 pHashes"""
+    coefficients = (_DCT @ gray.astype(np.float32) @ _DCT.T)[:, :LOW_FREQUENCIES, :LOW_FREQUENCIES]
+    flat = coefficients.reshape(len(gray), -1)
+    return _pack_bits(flat > np.median(flat, axis=1, keepdims=True))
+
+
+def dhash_batch(gray: "np.ndarray") -> "np.ndarray":
+    """(n, 8, 9) grayscale -> (n,) uint64 dHashes"""
+    return _pack_bits(gray[:, :, 1:] > gray[:, :, :-1])
+
+
+def popcount(values: "np.ndarray") -> "np.ndarray":
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    # NumPy < 2.0
+    return _BYTE_BITS[values.view(np.uint8).reshape(-1, 8)].sum(axis=1)
+
+
+if np is not None:
+    _BYTE_BITS = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def decode_for_hashing(source: Union[str, BinaryIO]) -> tuple["np.ndarray", "np.ndarray"]:
+    """(32x32, 8x9) grayscale arrays of an image, decoded at reduced scale"""
+    with Image.open(source) as image:
+        # JPEG: let the decoder scale down in the DCT domain (no-op for other formats)
+        image.draft("L", (HASH_SIDE * 2, HASH_SIDE * 2))
+        image = ImageOps.exif_transpose(image).convert("L")
+        square = image.resize((HASH_SIDE, HASH_SIDE), Image.Resampling.BOX)
+        strip = image.resize((9, 8), Image.Resampling.BOX)
+    return np.asarray(square, dtype=np.float32), np.asarray(strip, dtype=np.int16)
+
+
+def image_hashes(file: BinaryIO) -> Optional[tuple[int, int]]:
+    """(pHash, dHash) of an image upload, or None if it can't be decoded"""
+    if not image_hashing_available():
+        return None
+    position = file.tell()
+    try:
+        file.seek(0)
+        square, strip = decode_for_hashing(file)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        logger.info("Could not hash image: %s", e)
+        return None
+    finally:
+        file.seek(position)
+    return int(phash_batch(square[None])[0]), int(dhash_batch(strip[None])[0])
+
+
+def _signed(value: int) -> int:
+    """uint64 -> SQLite INTEGER (signed 64-bit)"""
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+# ========================================
+# INDEX
+# ========================================
+if np is not None:
+    # XOR masks of up to CHUNK_RADIUS flipped bits within one chunk
+    _single = [1 << bit for bit in range(CHUNK_BITS)]
+    _masks = {0}
+    for _ in range(CHUNK_RADIUS):
+        _masks |= {mask ^ flip for mask in _masks for flip in _single}
+    _CHUNK_MASKS = np.array(sorted(_masks), dtype=np.uint32)
+
+
+class ImageHashIndex:
+    """pHash/dHash -> earlier report, with Hamming-radius lookups"""
+
+    def __init__(self, path=INDEX_PATH, phash_radius: int = PHASH_RADIUS, dhash_radius: int = DHASH_RADIUS):
+        if phash_radius // CHUNKS > CHUNK_RADIUS:
+            raise ValueError(f"phash_radius can be at most {CHUNKS * (CHUNK_RADIUS + 1) - 1}")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.phash_radius = phash_radius
+        self.dhash_radius = dhash_radius
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._stats = {"lookups": 0, "matches": 0, "added": 0}
+        self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS images ("
+            " id INTEGER PRIMARY KEY,"
+            " version TEXT NOT NULL,"
+            " phash INTEGER NOT NULL,"
+            " dhash INTEGER NOT NULL,"
+            " source TEXT NOT NULL,"
+            " report BLOB NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+
+    def lookup(self, hashes: Optional[tuple[int, int]]) -> Optional[NearDuplicate]:
+        """The nearest indexed image within both radii, if any"""
+        if hashes is None:
+            return None
+        phash, dhash = np.uint64(hashes[0]), np.uint64(hashes[1])
+        with self._lock:
+            self._ensure_loaded()
+            self._stats["lookups"] += 1
+            ids, phashes, dhashes = self._candidates(phash)
+            if self._pending_ids:
+                ids = np.concatenate([ids, np.array(self._pending_ids, dtype=np.int64)])
+                phashes = np.concatenate([phashes, np.array(self._pending_phash, dtype=np.uint64)])
+                dhashes = np.concatenate([dhashes, np.array(self._pending_dhash, dtype=np.uint64)])
+            if not len(ids):
+                return None
+            distance = popcount(phashes ^ phash)
+            close = (distance <= self.phash_radius) & (popcount(dhashes ^ dhash) <= self.dhash_radius)
+            if not close.any():
+                return None
+            best = int(np.flatnonzero(close)[np.argmin(distance[close])])
+            image_id, best_distance = int(ids[best]), int(distance[best])
+            row = self._db.execute("SELECT source, report FROM images WHERE id = ?", (image_id,)).fetchone()
+            if row is None:
+                return None
+            self._stats["matches"] += 1
+        return NearDuplicate(report=json.loads(zlib.decompress(row[1])), source=row[0],
+                             similarity=round(1 - best_distance / 64, 3))
+
+    def add(self, hashes: Optional[tuple[int, int]], report: dict, source: str) -> None:
+        if hashes is None:
+            return
+        with self._lock:
+            self._ensure_loaded()
+            cursor = self._db.execute(
+                "INSERT INTO images (version, phash, dhash, source, report, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (ANALYSIS_VERSION, _signed(hashes[0]), _signed(hashes[1]), source,
+                 zlib.compress(json.dumps(report, separators=(",", ":")).encode()), time.time()),
+            )
+            self._db.commit()
+            self._pending_ids.append(cursor.lastrowid)
+            self._pending_phash.append(hashes[0])
+            self._pending_dhash.append(hashes[1])
+            self._stats["added"] += 1
+            if len(self._pending_ids) >= MERGE_EVERY:
+                self._merge_pending()
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._ensure_loaded()
+            return {**self._stats, "images": len(self._ids) + len(self._pending_ids),
+                    "phashRadius": self.phash_radius, "dhashRadius": self.dhash_radius,
+                    "enabled": image_hashing_available()}
+
+    def close(self) -> None:
+        self._db.close()
+
+    # ---------- internals ----------
+
+    def _ensure_loaded(self) -> None:
+        if self._loaded:
+            return
+        self._db.execute("DELETE FROM images WHERE version != ?", (ANALYSIS_VERSION,))
+        self._db.commit()
+        rows = self._db.execute("SELECT id, phash, dhash FROM images ORDER BY id").fetchall()
+        table = np.array(rows, dtype=np.int64).reshape(-1, 3)
+        self._set_arrays(table[:, 0].copy(), table[:, 1].view(np.uint64).copy(), table[:, 2].view(np.uint64).copy())
+        self._pending_ids, self._pending_phash, self._pending_dhash = [], [], []
+        self._loaded = True
+        if len(rows):
+            logger.info("🖼️ Loaded %s image hashes", len(rows))
+
+    def _set_arrays(self, ids: "np.ndarray", phashes: "np.ndarray", dhashes: "np.ndarray") -> None:
+        self._ids, self._phash, self._dhash = ids, phashes, dhashes
+        # All chunk tables in one sorted array: key = chunk number << CHUNK_BITS | chunk value
+        keys = np.concatenate([self._chunk_keys_of(phashes, chunk) for chunk in range(CHUNKS)])
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._positions = (order % max(len(ids), 1)).astype(np.int32)
+
+    @staticmethod
+    def _chunk_keys_of(values, chunk: int):
+        shift = np.uint64(64 - CHUNK_BITS * (chunk + 1))
+        chunk_values = (values >> shift) & np.uint64((1 << CHUNK_BITS) - 1)
+        return (chunk_values | np.uint64(chunk << CHUNK_BITS)).astype(np.uint32)
+
+    def _candidates(self, phash: "np.uint64") -> tuple:
+        """Entries within CHUNK_RADIUS bits of phash on at least one chunk"""
+        probes = np.concatenate([self._chunk_keys_of(phash, chunk) ^ _CHUNK_MASKS
+                                 for chunk in range(CHUNKS)])
+        starts = np.searchsorted(self._keys, probes, "left")
+        lengths = np.searchsorted(self._keys, probes, "right") - starts
+        total = int(lengths.sum())
+        # Concatenated ranges [start, start + length) without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        positions = self._positions[offsets + np.arange(total)]
+        return self._ids[positions], self._phash[positions], self._dhash[positions]
+
+    def _merge_pending(self) -> None:
+        self._set_arrays(
+            np.concatenate([self._ids, np.array(self._pending_ids, dtype=np.int64)]),
+            np.concatenate([self._phash, np.array(self._pending_phash, dtype=np.uint64)]),
+            np.concatenate([self._dhash, np.array(self._pending_dhash, dtype=np.uint64)]),
+        )
+        self._pending_ids, self._pending_phash, self._pending_dhash = [], [], []
@@ -0,0 +1,503 @@
+"""
+IMAGE CHECKS
+
+Most of what an image check needs is in the file's metadata segments, so
+pixels are only decoded when a check needs them, and then at thumbnail
+scale:
+
+- read_image_info() walks the JPEG markers / PNG chunks (a memory-mapped
+  file, or a few seek+reads on an upload spool) and parses the EXIF (TIFF
+  IFDs), IPTC-IIM (Photoshop APP13) and XMP packets it finds. Pixel data
+  is skipped over, never read. Other formats fall back to Pillow's lazy
+  header parse.
+- decode_thumbnails() decodes many images into one (n, side, side) NumPy
+  array. For JPEGs, Pillow's draft mode has libjpeg scale down in the DCT
+  (1/2 to 1/8), so a 24-megapixel photo costs about as much as a 0.4 MP one.
+- check_image_batch() runs the pixel checks on that array in one pass.
+
+Metadata issues: embedded GPS location, no creator/copyright information.
+Pixel issues: almost black, blank (no content), mostly blown-out highlights.
+
+NumPy and Pillow are optional - without them images get the metadata
+checks only.
+"""
+
+import logging
+import mmap
+import re
+import struct
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, Optional, Union
+
+from backend.models import Issue, model_to_dict
+from backend.scoring import build_summary
+
+try:
+    import numpy as np
+except ImportError:         # optional - see module docstring
+    np = None
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:         # optional - see module docstring
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+THUMBNAIL_SIDE = 64
+MAX_SEGMENTS = 1000                 # markers / chunks walked before giving up
+MAX_IFD_ENTRIES = 512
+DARK_MEAN = 16                      # mean luminance (0-255) below which an image is "black"
+FLAT_STDDEV = 2.5                   # luminance spread below which an image is blank
+BLOWN_OUT_LEVEL = 250
+BLOWN_OUT_FRACTION = 0.4
+
+# EXIF tags
+TAG_MAKE, TAG_MODEL, TAG_ORIENTATION, TAG_SOFTWARE, TAG_DATETIME = 0x010F, 0x0110, 0x0112, 0x0131, 0x0132
+TAG_ARTIST, TAG_COPYRIGHT, TAG_EXIF_IFD, TAG_GPS_IFD = 0x013B, 0x8298, 0x8769, 0x8825
+TAG_DATETIME_ORIGINAL = 0x9003
+TAG_GPS_LATITUDE = 0x0002
+# IPTC-IIM datasets (record 2)
+IPTC_BYLINE, IPTC_CREDIT, IPTC_COPYRIGHT = 80, 110, 116
+
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 7: 1, 9: 4, 10: 8}
+_JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+_XMP_HEADER = b"http://ns.adobe.com/xap/1.0/\x00"
+METADATA_ISSUE_IDS = {"image-location", "image-rights"}
+
+
+def pixel_checks_available() -> bool:
+    return np is not None and Image is not None
+
+
+# ========================================
+# IMAGE INFO
+# ========================================
+@dataclass
+class ImageInfo:
+    format: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    orientation: Optional[int] = None
+    captured_at: Optional[str] = None
+    camera: Optional[str] = None
+    software: Optional[str] = None
+    creator: Optional[str] = None
+    copyright: Optional[str] = None
+    has_location: bool = False
+    segments: list = field(default_factory=list)        # "exif", "iptc", "xmp" - what was found
+
+    def metadata_fields(self) -> dict:
+        """Fields for Metadata - width/height as displayed (EXIF orientation applied)"""
+        width, height = self.width, self.height
+        if self.orientation in (5, 6, 7, 8):
+            width, height = height, width
+        return {
+            "container": self.format,
+            "width": width,
+            "height": height,
+            "capturedAt": self.captured_at,
+            "camera": self.camera,
+            "software": self.software,
+            "creator": self.creator,
+            "copyright": self.copyright,
+            "hasLocation": self.has_location,
+        }
+
+
+class _Source:
+    """Random access over a memory map / bytes (slicing) or a file (seek + read)"""
+
+    def __init__(self, data=None, file: Optional[BinaryIO] = None):
+        self.data = data
+        self.file = file
+
+    def read(self, offset: int, size: int) -> bytes:
+        if self.data is not None:
+            return bytes(self.data[offset:offset + size])
+        self.file.seek(offset)
+        return self.file.read(size)
+
+
+@contextmanager
+def _open_source(source: Union[str, BinaryIO]) -> Iterator[_Source]:
+    if not isinstance(source, str):
+        position = source.tell()
+        try:
+            yield _Source(file=source)
+        finally:
+            source.seek(position)
+        return
+    with open(source, "rb") as f:
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:          # empty file
+            yield _Source(data=b"")
+            return
+        try:
+            yield _Source(data=mapped)
+        finally:
+            mapped.close()
+
+
+def read_image_info(source: Union[str, BinaryIO]) -> ImageInfo:
+    """Dimensions and EXIF / IPTC / XMP fields without decoding pixels"""
+    info = ImageInfo()
+    with _open_source(source) as src:
+        head = src.read(0, 8)
+        try:
+            if head.startswith(b"\xff\xd8"):
+                info.format = "jpeg"
+                _walk_jpeg(src, info)
+            elif head.startswith(b"\x89PNG\r\n\x1a\n"):
+                info.format = "png"
+                _walk_png(src, info)
+        except (struct.error, IndexError, ValueError) as e:
+            # Truncated or malformed segment - keep whatever was parsed before it
+            logger.info("Stopped reading image metadata: %s", e)
+    if info.width is None and Image is not None:
+        _pillow_header(source, info)
+    return info
+
+
+def _walk_jpeg(src: _Source, info: ImageInfo) -> None:
+    offset = 2
+    for _ in range(MAX_SEGMENTS):
+        header = src.read(offset, 4)
+        if len(header) < 4 or header[0] != 0xFF:
+            return
+        marker = header[1]
+        if marker == 0xFF:              # fill byte
+            offset += 1
+            continue
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            offset += 2
+            continue
+        if marker in (0xDA, 0xD9):      # start of scan / end of image - pixel data from here on
+            return
+        length = struct.unpack(">H", header[2:4])[0]
+        if marker in _JPEG_SOF:
+            height, width = struct.unpack(">HH", src.read(offset + 5, 4))
+            info.width, info.height = width, height
+        elif marker == 0xE1:
+            payload = src.read(offset + 4, length - 2)
+            if payload.startswith(b"Exif\x00\x00"):
+                _parse_tiff(payload[6:], info)
+            elif payload.startswith(_XMP_HEADER):
+                _parse_xmp(payload[len(_XMP_HEADER):], info)
+        elif marker == 0xED:
+            payload = src.read(offset + 4, length - 2)
+            if payload.startswith(b"Photoshop 3.0\x00"):
+                _parse_photoshop(payload[14:], info)
+        offset += 2 + length
+
+
+def _walk_png(src: _Source, info: ImageInfo) -> None:
+    offset = 8
+    for _ in range(MAX_SEGMENTS):
+        header = src.read(offset, 8)
+        if len(header) < 8:
+            return
+        length, kind = struct.unpack(">I4s", header)
+        if kind == b"IHDR":
+            info.width, info.height = struct.unpack(">II", src.read(offset + 8, 8))
+        elif kind == b"eXIf":
+            _parse_tiff(src.read(offset + 8, length), info)
+        elif kind in (b"tEXt", b"iTXt"):
+            _parse_png_text(kind, src.read(offset + 8, length), info)
+        elif kind == b"IEND":
+            return
+        offset += 12 + length
+
+
+def _pillow_header(source: Union[str, BinaryIO], info: ImageInfo) -> None:
+    """GIF / WebP / BMP / TIFF: Pillow parses the header lazily (no pixel decode)"""
+    position = None if isinstance(source, str) else source.tell()
+    try:
+        if position is not None:
+            source.seek(0)
+        with Image.open(source) as image:
+            info.format = info.format or (image.format or "").lower() or None
+            info.width, info.height = image.size
+            exif = image.getexif()
+            info.orientation = exif.get(TAG_ORIENTATION)
+            info.camera = _camera(exif.get(TAG_MAKE), exif.get(TAG_MODEL))
+            info.software = _clean(exif.get(TAG_SOFTWARE))
+            info.captured_at = _exif_time(exif.get(TAG_DATETIME))
+            info.creator = info.creator or _clean(exif.get(TAG_ARTIST))
+            info.copyright = info.copyright or _clean(exif.get(TAG_COPYRIGHT))
+            info.has_location = info.has_location or bool(exif.get_ifd(TAG_GPS_IFD))
+            if exif:
+                info.segments.append("exif")
+    except (OSError, ValueError, SyntaxError) as e:
+        logger.info("Could not read image header: %s", e)
+    finally:
+        if position is not None:
+            source.seek(position)
+
+
+# ========================================
+# EXIF / IPTC / XMP
+# ========================================
+def _parse_tiff(data: bytes, info: ImageInfo) -> None:
+    if data[:2] == b"II":
+        endian = "<"
+    elif data[:2] == b"MM":
+        endian = ">"
+    else:
+        return
+    info.segments.append("exif")
+    ifd0 = _read_ifd(data, endian, struct.unpack(endian + "I", data[4:8])[0])
+    info.orientation = ifd0.get(TAG_ORIENTATION) or info.orientation
+    info.camera = _camera(ifd0.get(TAG_MAKE), ifd0.get(TAG_MODEL)) or info.camera
+    info.software = _clean(ifd0.get(TAG_SOFTWARE)) or info.software
+    info.creator = info.creator or _clean(ifd0.get(TAG_ARTIST))
+    info.copyright = info.copyright or _clean(ifd0.get(TAG_COPYRIGHT))
+    captured = ifd0.get(TAG_DATETIME)
+    if isinstance(ifd0.get(TAG_EXIF_IFD), int):
+        exif = _read_ifd(data, endian, ifd0[TAG_EXIF_IFD])
+        captured = exif.get(TAG_DATETIME_ORIGINAL) or captured
+    info.captured_at = _exif_time(captured) or info.captured_at
+    if isinstance(ifd0.get(TAG_GPS_IFD), int):
+        gps = _read_ifd(data, endian, ifd0[TAG_GPS_IFD])
+        info.has_location = info.has_location or TAG_GPS_LATITUDE in gps
+
+
+def _read_ifd(data: bytes, endian: str, offset: int) -> dict:
+    """tag -> value for the ASCII / SHORT / LONG entries of one IFD"""
+    values = {}
+    count, = struct.unpack(endian + "H", data[offset:offset + 2])
+    for i in range(min(count, MAX_IFD_ENTRIES)):
+        entry = offset + 2 + 12 * i
+        tag, kind, n = struct.unpack(endian + "HHI", data[entry:entry + 8])
+        size = _TIFF_TYPE_SIZES.get(kind, 0) * n
+        if size <= 4:
+            raw = data[entry + 8:entry + 8 + size]
+        else:
+            pointer, = struct.unpack(endian + "I", data[entry + 8:entry + 12])
+            raw = data[pointer:pointer + size]
+        if len(raw) < size:
+            continue
+        if kind == 2:
+            values[tag] = raw.split(b"\x00", 1)[0].decode("utf-8", "replace")
+        elif kind == 3 and n >= 1:
+            values[tag] = struct.unpack(endian + "H", raw[:2])[0]
+        elif kind == 4 and n >= 1:
+            values[tag] = struct.unpack(endian + "I", raw[:4])[0]
+        elif kind in (5, 10):
+            values[tag] = raw          # rationals: only presence matters here
+    return values
+
+
+def _parse_photoshop(data: bytes, info: ImageInfo) -> None:
+    """8BIM resources; 0x0404 holds the IPTC-IIM records"""
+    offset = 0
+    while offset + 12 <= len(data) and data[offset:offset + 4] == b"8BIM":
+        resource, = struct.unpack(">H", data[offset + 4:offset + 6])
+        name_length = data[offset + 6]
+        offset += 6 + ((name_length + 2) & ~1)          # Pascal name, padded to even
+        size, = struct.unpack(">I", data[offset:offset + 4])
+        offset += 4
+        if resource == 0x0404:
+            _parse_iptc(data[offset:offset + size], info)
+        offset += (size + 1) & ~1
+
+
+def _parse_iptc(data: bytes, info: ImageInfo) -> None:
+    fields = {}
+    offset = 0
+    while offset + 5 <= len(data) and data[offset] == 0x1C:
+        record, dataset = data[offset + 1], data[offset + 2]
+        size, = struct.unpack(">H", data[offset + 3:offset + 5])
+        if size & 0x8000:               # extended length - not used by text fields
+            return
+        if record == 2:
+            fields.setdefault(dataset, data[offset + 5:offset + 5 + size].decode("utf-8", "replace").strip())
+        offset += 5 + size
+    if fields:
+        info.segments.append("iptc")
+    info.creator = info.creator or fields.get(IPTC_BYLINE) or fields.get(IPTC_CREDIT) or None
+    info.copyright = info.copyright or fields.get(IPTC_COPYRIGHT) or None
+
+
+def _xmp_value(xml: str, name: str) -> Optional[str]:
+    attribute = re.search(rf'{name}="([^"]*)"', xml)
+    if attribute:
+        return attribute.group(1).strip() or None
+    element = re.search(rf"<{name}>(.*?)</{name}>", xml, re.S)
+    if not element:
+        return None
+    # Simple value, or the first rdf:li of a Seq / Bag / Alt
+    item = re.search(r"<rdf:li[^>]*>(.*?)</rdf:li>", element.group(1), re.S)
+    value = (item.group(1) if item else element.group(1)).strip()
+    return value if value and "<" not in value else None
+
+
+def _parse_xmp(data: bytes, info: ImageInfo) -> None:
+    xml = data.decode("utf-8", "replace")
+    info.segments.append("xmp")
+    info.creator = info.creator or _xmp_value(xml, "dc:creator")
+    info.copyright = info.copyright or _xmp_value(xml, "dc:rights")
+    info.software = info.software or _xmp_value(xml, "xmp:CreatorTool")
+    info.captured_at = info.captured_at or _xmp_value(xml, "photoshop:DateCreated") or _xmp_value(xml, "xmp:CreateDate")
+    info.has_location = info.has_location or _xmp_value(xml, "exif:GPSLatitude") is not None
+
+
+def _parse_png_text(kind: bytes, data: bytes, info: ImageInfo) -> None:
+    keyword, _, text = data.partition(b"\x00")
+    if kind == b"iTXt":
+        compressed = text[:1] == b"\x01"
+        # compression flag, method, language tag \0, translated keyword \0, text
+        parts = text[2:].split(b"\x00", 2)
+        if compressed or len(parts) < 3:
+            return
+        text = parts[2]
+    if keyword == b"XML:com.adobe.xmp":
+        _parse_xmp(text, info)
+        return
+    value = text.decode("latin-1").strip() or None
+    if keyword == b"Author":
+        info.creator = info.creator or value
+    elif keyword == b"Copyright":
+        info.copyright = info.copyright or value
+    elif keyword == b"Software":
+        info.software = info.software or value
+    elif keyword == b"Creation Time":
+        info.captured_at = info.captured_at or value
+
+
+def _clean(value) -> Optional[str]:
+    return (value.strip() or None) if isinstance(value, str) else None
+
+
+def _camera(make, model) -> Optional[str]:
+    make, model = _clean(make), _clean(model)
+    if make and model and model.lower().startswith(make.lower()):
+        return model
+    return " ".join(part for part in (make, model) if part) or None
+
+
+def _exif_time(value) -> Optional[str]:
+    """'2024:05:01 14:03:22' -> '2024-05-01T14:03:22'"""
+    value = _clean(value)
+    if value and re.match(r"^\d{4}:\d{2}:\d{2} \d{2}:\d{2}:\d{2}", value):
+        return value[:10].replace(":", "-") + "T" + value[11:19]
+    return value
+
+
+# ========================================
+# PIXEL CHECKS
+# ========================================
+def decode_thumbnails(sources: list, side: int = THUMBNAIL_SIDE) -> tuple["np.ndarray", list[bool]]:
+    """
+    Luminance thumbnails of many images in one (n, side, side) uint8 array
+
+    An image that can't be decoded leaves a zero slot and False in the
+    returned list.
+    """
+    batch = np.zeros((len(sources), side, side), dtype=np.uint8)
+    decoded = []
+    for i, source in enumerate(sources):
+        position = None if isinstance(source, str) else source.tell()
+        try:
+            if position is not None:
+                source.seek(0)
+            with Image.open(source) as image:
+                # JPEG: scaled down by libjpeg in the DCT domain (no-op for other formats)
+                image.draft("L", (side, side))
+                image = ImageOps.exif_transpose(image).convert("L")
+                batch[i] = np.asarray(image.resize((side, side), Image.Resampling.BOX))
+            decoded.append(True)
+        except (OSError, ValueError, Image.DecompressionBombError) as e:
+            logger.info("Could not decode image: %s", e)
+            decoded.append(False)
+        finally:
+            if position is not None:
+                source.seek(position)
+    return batch, decoded
+
+
+def pixel_issues(batch: "np.ndarray", decoded: list[bool]) -> list[list[Issue]]:
+    """Black / blank / blown-out checks for the whole batch at once"""
+    pixels = batch.reshape(len(batch), -1).astype(np.float32)
+    means = pixels.mean(axis=1)
+    spreads = pixels.std(axis=1)
+    blown_out = (pixels >= BLOWN_OUT_LEVEL).mean(axis=1)
+
+    results = []
+    for i, ok in enumerate(decoded):
+        issues = []
+        if ok and means[i] < DARK_MEAN:
+            issues.append(Issue(
+                id="image-black", severity="medium", title="Image is almost entirely black",
+                description=f"Average brightness is {means[i]:.0f}/255.",
+                recommendation="Check that the right file was exported.",
+            ))
+        elif ok and spreads[i] < FLAT_STDDEV:
+            issues.append(Issue(
+                id="image-blank", severity="medium", title="Image has no visible content",
+                description="The image is a single flat color.",
+                recommendation="Check that the right file was exported.",
+            ))
+        elif ok and blown_out[i] > BLOWN_OUT_FRACTION:
+            issues.append(Issue(
+                id="image-overexposed", severity="low", title="Large overexposed areas",
+                description=f"{blown_out[i]:.0%} of the image is blown-out white.",
+                recommendation="Reduce exposure or use a better-exposed shot.",
+            ))
+        results.append(issues)
+    return results
+
+
+def metadata_issues(info: ImageInfo) -> list[Issue]:
+    issues = []
+    if info.has_location:
+        issues.append(Issue(
+            id="image-location", severity="medium", title="Image contains GPS location",
+            description="The file's metadata records where the photo was taken.",
+            recommendation="Strip location metadata before publishing.",
+        ))
+    if not info.creator and not info.copyright:
+        issues.append(Issue(
+            id="image-rights", severity="low", title="No creator or copyright information",
+            description="No EXIF, IPTC or XMP field names the creator or rights holder.",
+            recommendation="Add creator and copyright metadata so usage rights can be verified.",
+        ))
+    return issues
+
+
+def check_image_batch(sources: list) -> list[tuple[dict, list[Issue]]]:
+    """(Metadata fields, issues) per image - metadata parsed per file, pixels checked as one batch"""
+    infos = [read_image_info(source) for source in sources]
+    if pixel_checks_available():
+        batch, decoded = decode_thumbnails(sources)
+        pixel_results = pixel_issues(batch, decoded)
+    else:
+        pixel_results = [[] for _ in sources]
+    return [(info.metadata_fields(), metadata_issues(info) + pixels)
+            for info, pixels in zip(infos, pixel_results)]
+
+
+def check_image(source: Union[str, BinaryIO]) -> tuple[dict, list[Issue]]:
+    return check_image_batch([source])[0]
+
+
+def refresh_metadata(report: dict, source: Union[str, BinaryIO]) -> dict:
+    """
+    Adapt a report reused for a copy of an image (see backend/imagehash.py)
+
+    The pixels are the same but the metadata may not be (a re-export can
+    strip GPS or add a copyright), so metadata fields and issues are
+    re-read from this file - it costs a header parse.
+    """
+    info = read_image_info(source)
+    report["metadata"].update(info.metadata_fields())
+    issues = [Issue(**issue) for issue in report["issues"] if issue["id"] not in METADATA_ISSUE_IDS]
+    issues += metadata_issues(info)
+    report["issues"] = [model_to_dict(issue) for issue in issues]
+    report["summary"] = model_to_dict(build_summary(issues))
+    return report
@@ -0,0 +1,215 @@
+"""
+STREAMING UPLOAD INGESTION
+
+Reads an UploadFile in fixed-size chunks into a spooled temp file instead of
+holding the whole upload in memory. Size, SHA-256 and the MIME sniff are
+computed while the bytes pass through, and oversize bodies are rejected as
+soon as they cross the limit.
+"""
+
+import hashlib
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from fastapi import HTTPException, UploadFile
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# ========================================
+# LIMITS
+# ========================================
+CHUNK_SIZE = 1024 * 1024                  # 1 MB per read
+SPOOL_MAX_SIZE = 4 * 1024 * 1024          # stays in memory below this, then rolls to disk
+MAX_UPLOAD_BYTES = 500 * 1024 * 1024      # same 500MB limit as UploadBox / isValidFileSize
+SNIFF_BYTES = 4096                        # how much of the head we keep for MIME sniffing
+
+
+class UploadTooLarge(Exception):
+    """Raised when an upload crosses MAX_UPLOAD_BYTES"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds the {limit // (1024 * 1024)} MB limit")
+        self.limit = limit
+
+
+# ========================================
+# MIME SNIFFING
+# ========================================
+def sniff_mime(head: bytes) -> Optional[str]:
+    """Guess the real content type from the first bytes of a file"""
+    if len(head) >= 12 and head[4:8] == b"ftyp":
+        brand = head[8:12]
+        if brand == b"qt  ":
+            return "video/quicktime"
+        if brand in (b"M4A ", b"M4B "):
+            return "audio/m4a"
+        return "video/mp4"
+    if head.startswith(b"\x1a\x45\xdf\xa3"):
+        return "video/webm" if b"webm" in head[:64] else "video/x-matroska"
+    if head.startswith(b"RIFF") and len(head) >= 12:
+        kind = head[8:12]
+        if kind == b"WAVE":
+            return "audio/wav"
+        if kind == b"AVI ":
+            return "video/x-msvideo"
+        if kind == b"WEBP":
+            return "image/webp"
+    if head.startswith(b"%PDF-"):
+        return "application/pdf"
+    if head.startswith(b"\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1"):
+        return "application/msword"
+    if head.startswith(b"PK\x03\x04"):
+        if b"word/" in head:
+            return "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
+        return "application/zip"
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if head.startswith(b"BM"):
+        return "image/bmp"
+    if head.startswith(b"ID3") or head[:2] in (b"\xff\xfb", b"\xff\xf3", b"\xff\xf2"):
+        return "audio/mpeg"
+    if head.startswith(b"OggS"):
+        return "audio/ogg"
+    if head.startswith(b"fLaC"):
+        return "audio/flac"
+    return None
+
+
+# ========================================
+# INGESTED UPLOAD
+# ========================================
+@dataclass
+class IngestedUpload:
+    """An upload that has been streamed to a spooled temp file (or saved to disk)"""
+    file: BinaryIO
+    filename: str
+    declared_type: Optional[str]
+    sniffed_type: Optional[str]
+    size: int
+    sha256: str
+
+    @property
+    def content_type(self) -> Optional[str]:
+        # Trust the bytes over the browser's extension-based guess
+        return self.sniffed_type or self.declared_type
+
+    def save_to(self, path: str) -> None:
+        """Copy the spooled bytes to a real file (e.g. for a worker process)"""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.file.seek(0)
+        with open(path, "wb") as out:
+            shutil.copyfileobj(self.file, out, CHUNK_SIZE)
+        self.file.seek(0)
+
+    def close(self) -> None:
+        self.file.close()
+
+
+async def ingest_upload(
+    upload: UploadFile,
+    max_bytes: int = MAX_UPLOAD_BYTES,
+    chunk_size: int = CHUNK_SIZE,
+) -> IngestedUpload:
+    """
+    Stream an UploadFile into a spooled temp file
+
+    Only one chunk is held in memory at a time, so peak RSS per request is
+    bounded by chunk_size + SPOOL_MAX_SIZE whatever the upload size.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    digest = hashlib.sha256()
+    head = b""
+    size = 0
+
+    try:
+        while True:
+            chunk = await upload.read(chunk_size)
+            if not chunk:
+                break
+
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(max_bytes)
+
+            if len(head) < SNIFF_BYTES:
+                head += chunk[:SNIFF_BYTES - len(head)]
+            digest.update(chunk)
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    finally:
+        await upload.close()
+
+    spool.seek(0)
+    return IngestedUpload(
+        file=spool,
+        filename=upload.filename or "upload",
+        declared_type=upload.content_type,
+        sniffed_type=sniff_mime(head),
+        size=size,
+        sha256=digest.hexdigest(),
+    )
+
+
+# ========================================
+# EARLY BODY SIZE LIMIT
+# ========================================
+class BodySizeLimitMiddleware:
+    """
+    Reject oversize request bodies before they are parsed
+
+    The multipart parser spools the whole body before the endpoint runs, so
+    the limit has to be enforced here: on Content-Length up front, and on the
+    bytes actually received for chunked bodies.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int = MAX_UPLOAD_BYTES):
+        self.app = app
+        # Leave room for multipart boundaries and form headers
+        self.max_bytes = max_bytes + 64 * 1024
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        for name, value in scope.get("headers", []):
+            if name == b"content-length":
+                try:
+                    declared = int(value)
+                except ValueError:
+                    declared = 0
+                if declared > self.max_bytes:
+                    await self._reject(scope, receive, send)
+                    return
+                break
+
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Surfaces through FastAPI's body parsing as a normal 413
+                    raise HTTPException(status_code=413, detail=_too_large_detail())
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+    async def _reject(self, scope: Scope, receive: Receive, send: Send) -> None:
+        response = JSONResponse(status_code=413, content={"detail": _too_large_detail()})
+        await response(scope, receive, send)
+
+
+def _too_large_detail() -> str:
+    return f"Request body exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit"
@@ -0,0 +1,376 @@
+"""
+ASYNCHRONOUS CHECK JOBS
+
+POST /jobs hands a check to a bounded process pool and returns a job id
+straight away. Job state lives here, in the API process, so polling
+GET /jobs/{id} or reconnecting to the event stream never re-runs the work.
+
+Stage progress (and issues found so far, for checks that produce them
+incrementally) comes back from the workers over a multiprocessing queue
+that a background thread drains into the event loop.
+"""
+
+import asyncio
+import copy
+import itertools
+import logging
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Optional
+
+from backend.analysis import CheckInput, run_check
+from backend.cache import ResultCache
+from backend.config import DATA_DIR
+from backend.logging_setup import worker_context
+from backend.pools import init_worker_process
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# LIMITS
+# ========================================
+MAX_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+MAX_PENDING_JOBS = 100          # queued + running; more than this gets a 503
+JOB_TTL_SECONDS = 60 * 60       # finished jobs are forgotten after an hour
+MAX_JOB_EVENTS = 500            # kept for SSE replay while a job runs (oldest progress dropped first)
+UPLOADS_DIR = DATA_DIR / "uploads"
+
+TERMINAL_STATES = ("done", "failed")
+
+
+class TooManyJobs(Exception):
+    """Raised when the job queue is full"""
+
+
+class JobPoolClosed(TooManyJobs):
+    """Raised when the pool is not running (before start() or after shutdown())"""
+
+
+# ========================================
+# WORKER SIDE
+# ========================================
+_progress_queue = None
+
+
+def _init_worker(queue) -> None:
+    global _progress_queue
+    init_worker_process()
+    _progress_queue = queue
+
+
+def _run_job(job_id: str, check: CheckInput) -> dict:
+    """Runs in a pool process"""
+    def progress(stage: str, fraction: float) -> None:
+        _progress_queue.put(("progress", job_id, stage, fraction))
+
+    def found(issues: list) -> None:
+        _progress_queue.put(("issues", job_id, issues))
+
+    progress("running", 0.0)
+    return run_check(check, progress, found)
+
+
+# ========================================
+# JOB STATE
+# ========================================
+@dataclass
+class Job:
+    id: str
+    key: str
+    status: str = "queued"              # queued -> running -> done | failed
+    stage: str = "queued"
+    progress: float = 0.0
+    report: Optional[dict] = None
+    error: Optional[str] = None
+    cached: bool = False
+    partial_issues: list = field(default_factory=list)     # found before the report is done
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    events: list = field(default_factory=list)      # (seq, event, data) for SSE replay
+    changed: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def to_dict(self) -> dict:
+        data = {
+            "jobId": self.id,
+            "status": self.status,
+            "stage": self.stage,
+            "progress": round(self.progress, 3),
+            "cached": self.cached,
+            "createdAt": self.created_at,
+            "updatedAt": self.updated_at,
+        }
+        if self.report is not None:
+            data["report"] = self.report
+        elif self.partial_issues:
+            data["partialIssues"] = self.partial_issues
+        if self.error is not None:
+            data["error"] = self.error
+        return data
+
+
+class JobManager:
+    """Tracks jobs and runs them on a shared process pool"""
+
+    def __init__(
+        self,
+        result_cache: ResultCache,
+        max_workers: int = MAX_WORKERS,
+        on_report: Optional[Callable[[dict, str], None]] = None,
+    ):
+        self.result_cache = result_cache
+        self.max_workers = max_workers
+        self.on_report = on_report          # on_report(report, kind) for every finished job
+        self._jobs: dict[str, Job] = {}
+        self._by_key: dict[str, str] = {}
+        self._followers: dict[str, list[tuple[Job, CheckInput]]] = {}      # job id -> duplicate submissions
+        self._seq = itertools.count(1)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._queue = None
+        self._drain_thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ---------- lifecycle ----------
+
+    def start(self) -> None:
+        """Create the pool (call from app startup, inside the event loop)"""
+        if self._executor is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        context = worker_context()
+        self._queue = context.Queue()
+        self._executor = self._new_executor()
+        self._drain_thread = threading.Thread(target=self._drain_progress, daemon=True)
+        self._drain_thread.start()
+        logger.info("⚙️ Job pool started with %s workers", self.max_workers)
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=worker_context(),
+            initializer=_init_worker,
+            initargs=(self._queue,),
+        )
+
+    def _replace_broken_executor(self, broken: ProcessPoolExecutor) -> None:
+        """A worker died (killed, out of memory): every job on that pool fails, later ones get a new pool"""
+        if self._executor is broken:
+            logger.error("❌ Job pool broken, starting a new one")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+
+    def shutdown(self) -> None:
+        if self._executor is None:
+            return
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._queue.put(None)
+        self._executor = None
+
+    # ---------- public API ----------
+
+    async def submit(self, key: str, check: CheckInput) -> Job:
+        """
+        Queue a check, or return the existing job for the same content
+
+        Identical submissions while a job is queued/running (or recently
+        finished) get a job of their own that follows the existing one
+        instead of a second run - same progress and report, but their own
+        file name and size in the report's metadata.
+        """
+        self._purge_expired()
+
+        existing_id = self._by_key.get(key)
+        if existing_id is not None:
+            existing = self._jobs.get(existing_id)
+            if existing is not None and existing.status != "failed":
+                self._discard_upload(check)
+                return self._follow(existing, check)
+
+        try:
+            self.ensure_capacity()
+        except TooManyJobs:
+            self._discard_upload(check)
+            raise
+
+        job = Job(id=uuid.uuid4().hex, key=key)
+        self._jobs[job.id] = job
+        self._by_key[key] = job.id
+        self._emit(job, "progress")
+
+        asyncio.get_running_loop().create_task(self._run(job, check))
+        return job
+
+    def ensure_capacity(self) -> None:
+        """Raise TooManyJobs if submit() would refuse a new job right now"""
+        if self._executor is None:
+            raise JobPoolClosed("Job pool is not running")
+        active = sum(1 for j in self._jobs.values() if j.status not in TERMINAL_STATES)
+        if active >= MAX_PENDING_JOBS:
+            raise TooManyJobs(f"{active} jobs already pending")
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def events(self, job: Job, last_event_id: int = 0) -> AsyncIterator[tuple]:
+        """
+        Yield (seq, event, data) from last_event_id onward until the job ends
+
+        Reconnecting clients pass Last-Event-ID and only get what they missed.
+        """
+        sent = last_event_id
+        while True:
+            pending = [e for e in job.events if e[0] > sent]
+            for event in pending:
+                sent = event[0]
+                yield event
+            if job.status in TERMINAL_STATES and not [e for e in job.events if e[0] > sent]:
+                return
+            job.changed.clear()
+            try:
+                await asyncio.wait_for(job.changed.wait(), timeout=15)
+            except asyncio.TimeoutError:
+                yield (None, "ping", {})
+
+    def stats(self) -> dict:
+        counts: dict[str, int] = {}
+        for job in self._jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {"workers": self.max_workers, "jobs": counts}
+
+    # ---------- internals ----------
+
+    async def _run(self, job: Job, check: CheckInput) -> None:
+        loop = asyncio.get_running_loop()
+        executor = None
+
+        async def compute() -> dict:
+            nonlocal executor
+            executor = self._executor
+            if executor is None:
+                # run_in_executor(None, ...) would run the check on the loop's thread pool
+                raise JobPoolClosed("Job pool shut down before the job started")
+            return await loop.run_in_executor(executor, _run_job, job.id, check)
+
+        try:
+            report, cached = await self.result_cache.get_or_compute(job.key, compute)
+            self._finish(job, check, report, cached)
+            for follower, follower_check in self._followers.pop(job.id, []):
+                self._finish(follower, follower_check, copy.deepcopy(report), True)
+        except BrokenProcessPool as e:
+            logger.error("❌ Job %s failed: worker process died", job.id)
+            self._replace_broken_executor(executor)
+            self._fail(job, f"Worker process died: {e}")
+        except Exception as e:
+            logger.error("❌ Job %s failed: %s", job.id, e, exc_info=True)
+            self._fail(job, str(e))
+        finally:
+            self._discard_upload(check)
+
+    def _follow(self, leader: Job, check: CheckInput) -> Job:
+        job = Job(id=uuid.uuid4().hex, key=leader.key, cached=True)
+        self._jobs[job.id] = job
+        if leader.status == "done":
+            self._finish(job, check, copy.deepcopy(leader.report), True)
+        else:
+            job.partial_issues = list(leader.partial_issues)
+            self._update(job, leader.status, leader.stage, leader.progress)
+            self._emit(job, "progress")
+            self._followers.setdefault(leader.id, []).append((job, check))
+        return job
+
+    def _finish(self, job: Job, check: CheckInput, report: dict, cached: bool) -> None:
+        # Same bytes may arrive under a different name
+        if check.kind == "file" and check.file_name:
+            report["metadata"]["fileName"] = check.file_name
+            report["metadata"]["fileSize"] = check.file_size
+        job.report = report
+        job.cached = cached
+        if self.on_report is not None:
+            self.on_report(report, check.kind)
+        self._update(job, "done", "done", 1.0)
+        self._emit(job, "done")
+
+    def _fail(self, job: Job, error: str) -> None:
+        for failed in [job] + [follower for follower, _ in self._followers.pop(job.id, [])]:
+            failed.error = error
+            self._update(failed, "failed", "failed", failed.progress)
+            self._emit(failed, "failed")
+
+    def _drain_progress(self) -> None:
+        """Background thread: move worker progress onto the event loop"""
+        queue = self._queue
+        handlers = {"progress": self._on_progress, "issues": self._on_issues}
+        while True:
+            item = queue.get()
+            if item is None:
+                return
+            kind, *args = item
+            self._loop.call_soon_threadsafe(handlers[kind], *args)
+
+    def _on_progress(self, job_id: str, stage: str, fraction: float) -> None:
+        job = self._jobs.get(job_id)
+        if job is None or job.status in TERMINAL_STATES:
+            return
+        for each in [job] + [follower for follower, _ in self._followers.get(job_id, [])]:
+            self._update(each, "running", stage, fraction)
+            self._emit(each, "progress")
+
+    def _on_issues(self, job_id: str, issues: list) -> None:
+        job = self._jobs.get(job_id)
+        if job is None or job.status in TERMINAL_STATES:
+            return
+        for each in [job] + [follower for follower, _ in self._followers.get(job_id, [])]:
+            each.partial_issues.extend(issues)
+            self._emit(each, "issues", issues)
+
+    def _update(self, job: Job, status: str, stage: str, progress: float) -> None:
+        job.status = status
+        job.stage = stage
+        job.progress = progress
+        job.updated_at = time.time()
+
+    def _emit(self, job: Job, event: str, issues: Optional[list] = None) -> None:
+        data = {"status": job.status, "stage": job.stage, "progress": round(job.progress, 3)}
+        if event == "issues":
+            data["issues"] = issues
+        elif event == "done":
+            data["report"] = job.report
+        elif event == "failed":
+            data["error"] = job.error
+        entry = (next(self._seq), event, data)
+        if event in TERMINAL_STATES:
+            # The last event has the whole outcome; a client replaying from any
+            # earlier id only needs that, so the rest is let go
+            job.events = [entry]
+            job.partial_issues = []
+        else:
+            job.events.append(entry)
+            if len(job.events) > MAX_JOB_EVENTS:
+                oldest = next((i for i, e in enumerate(job.events) if e[1] == "progress"), 0)
+                del job.events[oldest]
+        job.changed.set()
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for job_id, job in list(self._jobs.items()):
+            if job.status in TERMINAL_STATES and job.updated_at < cutoff:
+                del self._jobs[job_id]
+                if self._by_key.get(job.key) == job_id:
+                    del self._by_key[job.key]
+
+    @staticmethod
+    def _discard_upload(check: CheckInput) -> None:
+        if check.path and not check.keep_file:
+            try:
+                os.unlink(check.path)
+            except OSError:
+                pass
+
+
+def upload_path_for(job_token: str) -> str:
+    """Where an upload is saved before its job runs"""
+    return str(UPLOADS_DIR / job_token)
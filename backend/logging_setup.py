@@ -0,0 +1,232 @@
+"""
+NON-BLOCKING LOGGING
+
+Log calls on the request path only capture the record and put it on an
+in-memory queue; a listener thread does the formatting and the writing.
+Nothing that costs more than a queue put happens on the event loop:
+
+- Messages are formatted lazily - pass %-style args (logger.info("x=%s", x)),
+  and the string is only built in the listener thread
+- A full queue drops the record (counted) instead of blocking
+- Messages and extra fields longer than MAX_FIELD_CHARS are truncated
+- bind_log_context() binds fields (requestId, kind, fileName, ...) once per
+  request; every record logged in that request carries them
+
+Output is the plain text format by default, or one JSON object per line
+with MEDIA_CHECKER_LOG_FORMAT=json.
+
+Process pools start their workers with worker_context() (forkserver, or
+spawn where that is unavailable) and init_worker_logging() as initializer.
+A forked worker would inherit the queue handler without the listener
+thread that empties it, and its records would never be written; pool
+workers are not on the event loop, so they write to stderr directly.
+
+Workers (and the forkserver, which preloads __main__) import the main
+module again, so the app builds its services in a startup hook rather than
+at import time.
+"""
+
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import os
+import queue
+import sys
+import uuid
+from datetime import datetime, timezone
+from typing import Optional
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# ========================================
+# SETTINGS
+# ========================================
+LOG_FORMAT = os.environ.get("MEDIA_CHECKER_LOG_FORMAT", "text")       # "text" or "json"
+LOG_LEVEL = os.environ.get("MEDIA_CHECKER_LOG_LEVEL", "INFO")
+QUEUE_SIZE = 10_000
+MAX_FIELD_CHARS = 2000
+TEXT_FORMAT = "%(asctime)s - %(levelname)s - %(message)s"
+WORKER_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# Attributes every LogRecord has - anything else was passed via extra=
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "log_context"}
+
+_log_context: contextvars.ContextVar = contextvars.ContextVar("log_context", default={})
+
+
+# ========================================
+# REQUEST CONTEXT
+# ========================================
+def bind_log_context(**fields) -> None:
+    """Add fields to every record logged from the current request / task"""
+    _log_context.set({**_log_context.get(), **fields})
+
+
+def truncate(value: str, limit: int = MAX_FIELD_CHARS) -> str:
+    if len(value) <= limit:
+        return value
+    return f"{value[:limit]}... (+{len(value) - limit} chars)"
+
+
+def summarize(value) -> str:
+    """Short description of a request body for logs - never the body itself"""
+    if isinstance(value, dict):
+        return "{" + ", ".join(f"{key}: {summarize(item)}" for key, item in list(value.items())[:20]) + "}"
+    if isinstance(value, (str, bytes)):
+        return f"<{len(value)} {'chars' if isinstance(value, str) else 'bytes'}>"
+    if isinstance(value, list):
+        return f"<list of {len(value)}>"
+    return type(value).__name__
+
+
+class LazySummary:
+    """logger.info("body: %s", LazySummary(body)) - summarized in the listener thread, not here"""
+    __slots__ = ("value",)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __str__(self) -> str:
+        return summarize(self.value)
+
+
+class RequestLogContextMiddleware:
+    """Binds requestId (X-Request-ID if the client sent one), method and path per request"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = None
+        for name, value in scope.get("headers", []):
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")[:64]
+                break
+        token = _log_context.set({
+            "requestId": request_id or uuid.uuid4().hex[:16],
+            "method": scope.get("method"),
+            "path": scope.get("path"),
+        })
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            _log_context.reset(token)
+
+
+# ========================================
+# HANDLERS + FORMATTERS
+# ========================================
+class _ContextQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records as-is (no formatting here) and never blocks"""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The only per-call work on the caller's thread: grab the bound context
+        record.log_context = _log_context.get()
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class TruncatingFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        context = getattr(record, "log_context", None)
+        if context and "requestId" in context:
+            line = f"{line} [{context['requestId']}]"
+        return truncate(line, MAX_FIELD_CHARS * 4)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, bound context, extra fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": truncate(record.getMessage()),
+        }
+        entry.update(getattr(record, "log_context", None) or {})
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS:
+                entry[key] = value
+        for key, value in entry.items():
+            if isinstance(value, str):
+                entry[key] = truncate(value)
+        if record.exc_info:
+            entry["exc"] = truncate(self.formatException(record.exc_info), MAX_FIELD_CHARS * 4)
+        return json.dumps(entry, default=lambda value: truncate(str(value)), ensure_ascii=False)
+
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[_ContextQueueHandler] = None
+
+
+def configure_logging(log_format: str = LOG_FORMAT, level: str = LOG_LEVEL) -> None:
+    """Route the root logger through the queue (idempotent)"""
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    output = _stderr_handler(log_format)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=QUEUE_SIZE)
+    _queue_handler = _ContextQueueHandler(log_queue)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    """Flush whatever is queued and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def dropped_records() -> int:
+    return _queue_handler.dropped if _queue_handler is not None else 0
+
+
+def _stderr_handler(log_format: str) -> logging.Handler:
+    output = logging.StreamHandler(sys.stderr)
+    output.setFormatter(JsonFormatter() if log_format == "json" else TruncatingFormatter(TEXT_FORMAT))
+    return output
+
+
+# ========================================
+# POOL WORKERS
+# ========================================
+def worker_context():
+    """multiprocessing context for process pools (never fork - see module docstring)"""
+    return multiprocessing.get_context(WORKER_START_METHOD)
+
+
+def init_worker_logging(log_format: str = LOG_FORMAT, level: str = LOG_LEVEL) -> None:
+    """Pool initializer: replace whatever root handlers the worker has with a plain stderr handler"""
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_stderr_handler(log_format))
+    root.setLevel(level)
@@ -0,0 +1,245 @@
+"""
+PIPELINE METRICS (GET /metrics)
+
+Latency histograms per /run pipeline stage, in-flight request gauges and
+ingested-byte counters, exposed in the Prometheus text format.
+
+Recording never takes a lock: every thread writes to its own shard of each
+metric (a dict of plain lists), and /metrics sums the shards when scraped.
+An observation is a dict lookup, a bisect and three additions - a couple of
+microseconds - so it stays on in production.
+
+Metrics recorded in job worker processes stay in those processes; /metrics
+covers what runs in the API process.
+"""
+
+import bisect
+import threading
+import time
+from typing import Iterator, Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Seconds - from a cached lookup up to a long video
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+# First path segment -> route label (anything else is "other", so ids in
+# paths can't blow up the label set)
+ROUTE_GROUPS = {"run", "jobs", "uploads", "extract", "submit-directory", "directories", "chat",
+                "history", "health", "cache", "metrics", "admission",
+                "check-agents"}
+
+
+# ========================================
+# METRIC TYPES
+# ========================================
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._shards_lock = threading.Lock()       # only taken when a thread first records
+        REGISTRY.append(self)
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._shards_lock:
+                self._shards.append(values)
+            return values
+
+    def _merged(self) -> dict:
+        with self._shards_lock:
+            shards = list(self._shards)
+        merged: dict = {}
+        for shard in shards:
+            for labels, values in list(shard.items()):
+                total = merged.get(labels)
+                if total is None:
+                    merged[labels] = list(values)
+                else:
+                    for i, value in enumerate(values):
+                        total[i] += value
+        return merged
+
+    def _label_text(self, labels: tuple, extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.type}"
+        for labels, values in sorted(self._merged().items()):
+            yield f"{self.name}{self._label_text(labels)} {_number(values[0])}"
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, *labels: str) -> None:
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            shard[labels] = [amount]
+        else:
+            values[0] += amount
+
+
+class Gauge(Counter):
+    """Up/down gauge - each thread tracks its own delta, the total is their sum"""
+    type = "gauge"
+
+    def dec(self, amount: float = 1, *labels: str) -> None:
+        self.inc(-amount, *labels)
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: tuple = (), buckets: tuple = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = buckets
+
+    def observe(self, value: float, *labels: str) -> None:
+        shard = self._shard()
+        values = shard.get(labels)
+        if values is None:
+            # One count per bucket plus +Inf, then sum, then count
+            values = shard[labels] = [0] * (len(self.buckets) + 3)
+        values[bisect.bisect_left(self.buckets, value)] += 1
+        values[-2] += value
+        values[-1] += 1
+
+    def time(self, *labels: str) -> "_Timer":
+        """with histogram.time("analysis", "file"): ..."""
+        return _Timer(self, labels)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} histogram"
+        for labels, values in sorted(self._merged().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                le = f'le="{bound}"'
+                yield f"{self.name}_bucket{self._label_text(labels, le)} {cumulative}"
+            cumulative += values[len(self.buckets)]
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{self._label_text(labels, le)} {cumulative}"
+            yield f"{self.name}_sum{self._label_text(labels)} {_number(values[-2])}"
+            yield f"{self.name}_count{self._label_text(labels)} {values[-1]}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: tuple):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# ========================================
+# PIPELINE METRICS
+# ========================================
+REGISTRY: list[_Metric] = []
+
+STAGE_SECONDS = Histogram(
+    "media_checker_stage_seconds",
+    "Time spent in each /run pipeline stage "
+    "(body_parse, upload_read, fetch, near_duplicate, image_hash, type_detection, analysis, serialization)",
+    ("stage", "kind"),
+)
+REQUEST_SECONDS = Histogram(
+    "media_checker_request_seconds", "Whole-request latency", ("route",))
+REQUESTS_TOTAL = Counter(
+    "media_checker_requests_total", "Finished requests by route and status code", ("route", "status"))
+IN_FLIGHT = Gauge(
+    "media_checker_requests_in_flight", "Requests currently being handled", ("route",))
+INGESTED_BYTES = Counter(
+    "media_checker_ingested_bytes_total", "Bytes of input accepted, by input type", ("kind",))
+CHECKS_TOTAL = Counter(
+    "media_checker_checks_total", "Checks answered, by input type and cache outcome", ("kind", "cached"))
+NEAR_DUPLICATES_TOTAL = Counter(
+    "media_checker_near_duplicates_total", "Checks answered with a near-duplicate's report (text, url, image)", ("kind",))
+ADMISSION_RUNNING = Gauge(
+    "media_checker_admission_running", "Admitted check requests being handled, by input type", ("kind",))
+ADMISSION_QUEUED = Gauge(
+    "media_checker_admission_queued", "Check requests waiting for a slot, by input type", ("kind",))
+ADMISSION_REJECTED = Counter(
+    "media_checker_admission_rejected_total", "Check requests refused with a 429, by input type and reason",
+    ("kind", "reason"))
+
+
+def render_metrics() -> str:
+    return "\n".join(line for metric in REGISTRY for line in metric.render()) + "\n"
+
+
+def route_group(path: str) -> str:
+    first = path.lstrip("/").split("/", 1)[0]
+    if not first:
+        return "root"
+    return first if first in ROUTE_GROUPS else "other"
+
+
+def request_age(scope: Scope) -> Optional[float]:
+    """Seconds since MetricsMiddleware saw the request (None outside it)"""
+    started = scope.get("state", {}).get("metrics_started")
+    return time.perf_counter() - started if started is not None else None
+
+
+# ========================================
+# MIDDLEWARE
+# ========================================
+class MetricsMiddleware:
+    """In-flight gauge, latency histogram and status counter per route group"""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        route = route_group(scope.get("path", ""))
+        started = time.perf_counter()
+        scope.setdefault("state", {})["metrics_started"] = started
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc(1, route)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            IN_FLIGHT.dec(1, route)
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route)
+            REQUESTS_TOTAL.inc(1, route, str(status))
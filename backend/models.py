@@ -0,0 +1,86 @@
+"""
+RESPONSE MODELS
+
+Shapes match the frontend's ComplianceReport in src/types/index.ts.
+"""
+
+from typing import Optional
+
+from pydantic import BaseModel
+
+
+class Summary(BaseModel):
+    status: str  # "pass", "partial_fail", or "fail"
+    issuesCount: int
+    recommendationsCount: int
+    score: int
+
+
+class Issue(BaseModel):
+    id: str
+    severity: str  # "low", "medium", or "high"
+    title: str
+    description: str
+    timestamp: Optional[str] = None
+    recommendation: str
+    # Character offsets into the checked text (text / document checks)
+    offsetStart: Optional[int] = None
+    offsetEnd: Optional[int] = None
+
+
+class Metadata(BaseModel):
+    fileName: str
+    fileSize: int
+    durationSec: Optional[int] = None
+    checkedAt: str
+    # Read from the container headers (video / audio files)
+    container: Optional[str] = None
+    codecs: Optional[list[str]] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+    streamCount: Optional[int] = None
+    # Audio levels in dBFS (WAV files)
+    loudnessDb: Optional[float] = None
+    peakDb: Optional[float] = None
+    # Image metadata (EXIF / IPTC / XMP)
+    capturedAt: Optional[str] = None
+    camera: Optional[str] = None
+    software: Optional[str] = None
+    creator: Optional[str] = None
+    copyright: Optional[str] = None
+    hasLocation: Optional[bool] = None
+    # Share of the analysis reused from an earlier version of the file (0.0-1.0)
+    reusedFraction: Optional[float] = None
+    # Set when an earlier report for nearly the same text was returned instead
+    duplicateOf: Optional[str] = None
+    similarity: Optional[float] = None
+
+
+class ComplianceReport(BaseModel):
+    summary: Summary
+    issues: list[Issue]
+    metadata: Metadata
+
+
+def model_to_dict(model: BaseModel) -> dict:
+    """Plain-dict form of a model (pydantic v2 or v1)"""
+    if hasattr(model, "model_dump"):
+        return model.model_dump()
+    return model.dict()
+
+
+def build_report(summary: Summary, issues: list[Issue], metadata: Metadata) -> ComplianceReport:
+    """
+    A report from parts that are already validated models
+
+    Skips re-validating every Issue (pydantic v2 model_construct / v1 construct)
+    - that is most of the cost for a report with thousands of issues.
+    """
+    if hasattr(ComplianceReport, "model_construct"):
+        return ComplianceReport.model_construct(summary=summary, issues=issues, metadata=metadata)
+    return ComplianceReport.construct(summary=summary, issues=issues, metadata=metadata)
+
+
+def report_to_dict(report: ComplianceReport) -> dict:
+    """Plain-dict form of a report (for caching and pickling across processes)"""
+    return model_to_dict(report)
@@ -0,0 +1,253 @@
+"""
+NEAR-DUPLICATE TEXT INDEX
+
+The same wire-service article turns up under dozens of URLs, each copy with
+a different byline, footer or a fixed typo. The result cache only matches
+identical text, so every copy paid for a full check.
+
+- Text is normalized (NFKC, lowercase, words only) and cut into 5-word
+  shingles; each shingle is hashed from the CRC-32s of its words.
+- A MinHash signature (NUM_PERM minimums under multiply-shift hashes)
+  estimates the Jaccard similarity of two shingle sets.
+- LSH banding: the signature is split into BANDS bands of ROWS values and
+  each band is hashed to one key. Texts sharing any band key are candidates
+  (an indexed SQLite lookup, no scan); candidates are then compared on the
+  full signature and the best match at or above SIMILARITY_THRESHOLD wins.
+
+With 16 bands of 8 rows, texts at 0.9 similarity share a band >99.9% of the
+time and texts at 0.5 only ~6% of the time, so the candidate set stays tiny.
+
+A matched text gets a copy of the earlier report with its own metadata,
+plus metadata.duplicateOf and metadata.similarity. Issue offsets pointed
+into the earlier text, so the copy has none. Texts
+shorter than MIN_WORDS are never matched: on a short text a one-word edit
+can be the whole compliance question.
+
+Signatures are computed with NumPy. Without NumPy the index is switched off
+(as is backend/cdc.py) - the pure-Python version would cost more than the
+text check it saves.
+"""
+
+import copy
+import hashlib
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+import zlib
+from dataclasses import dataclass
+from typing import Optional
+
+from backend.analysis import ANALYSIS_VERSION
+from backend.config import DATA_DIR
+
+try:
+    import numpy as np
+except ImportError:         # optional - see module docstring
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+# Changing SHINGLE_WORDS, NUM_PERM, BANDS/ROWS or SEED invalidates stored signatures
+SHINGLE_WORDS = 5
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+SEED = 20240917
+SIMILARITY_THRESHOLD = float(os.environ.get("MEDIA_CHECKER_NEAR_DUPLICATE_THRESHOLD", "0.9"))
+MIN_WORDS = 50
+MAX_CANDIDATES = 20
+HASH_BLOCK = 8192                   # shingles hashed per NumPy pass (bounds memory)
+
+INDEX_PATH = DATA_DIR / "near-duplicates.sqlite3"
+INDEX_MAX_DOCUMENTS = 200_000
+
+
+def near_duplicates_available() -> bool:
+    return np is not None
+
+
+# ========================================
+# SIGNATURES
+# ========================================
+if np is not None:
+    _rng = np.random.default_rng(SEED)
+    # Multiply-shift: h(x) = (a*x + b mod 2^64) >> 32, a odd
+    _A = (_rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64) << np.uint64(1)) | np.uint64(1)
+    _B = _rng.integers(0, 2**63, NUM_PERM, dtype=np.uint64)
+    _SHINGLE_WEIGHTS = np.array([pow(0x01000193, i, 2**32) for i in range(SHINGLE_WORDS)], dtype=np.uint64)
+
+
+def _words(text: str) -> list[str]:
+    return re.findall(r"\w+", unicodedata.normalize("NFKC", text).lower())
+
+
+def signature(text: str) -> Optional["np.ndarray"]:
+    """MinHash signature (NUM_PERM uint32s), or None if the text is too short to match"""
+    if np is None:
+        return None
+    words = _words(text)
+    if len(words) < MIN_WORDS:
+        return None
+
+    word_hashes = np.fromiter((zlib.crc32(word.encode()) for word in words), dtype=np.uint64, count=len(words))
+    count = len(words) - SHINGLE_WORDS + 1
+    shingles = np.zeros(count, dtype=np.uint64)
+    for offset, weight in enumerate(_SHINGLE_WEIGHTS):
+        shingles += word_hashes[offset:offset + count] * weight
+    shingles = np.unique(shingles & np.uint64(0xFFFFFFFF))
+
+    minimums = np.full(NUM_PERM, np.iinfo(np.uint64).max, dtype=np.uint64)
+    for start in range(0, len(shingles), HASH_BLOCK):
+        block = shingles[start:start + HASH_BLOCK]
+        hashed = (_A[:, None] * block[None, :] + _B[:, None]) >> np.uint64(32)
+        np.minimum(minimums, hashed.min(axis=1), out=minimums)
+    return minimums.astype(np.uint32)
+
+
+def band_keys(sig: "np.ndarray") -> list[int]:
+    """One signed 64-bit key per band (band number mixed in, so bands never collide)"""
+    rows = sig.reshape(BANDS, ROWS)
+    return [
+        int.from_bytes(hashlib.blake2b(rows[band].tobytes(), digest_size=8, person=b"band%04d" % band).digest(),
+                       "big", signed=True)
+        for band in range(BANDS)
+    ]
+
+
+def similarity(a: "np.ndarray", b: "np.ndarray") -> float:
+    """Estimated Jaccard similarity of two signatures"""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+# ========================================
+# INDEX
+# ========================================
+@dataclass
+class NearDuplicate:
+    report: dict
+    source: str                     # URL, or "text" for a pasted text
+    similarity: float
+
+
+class NearDuplicateIndex:
+    """Signatures + band keys + reports in SQLite, shared across restarts"""
+
+    def __init__(self, path=INDEX_PATH, max_documents: int = INDEX_MAX_DOCUMENTS,
+                 threshold: float = SIMILARITY_THRESHOLD):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.max_documents = max_documents
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._adds = 0
+        self._stats = {"lookups": 0, "matches": 0, "added": 0}
+        self._db = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " id INTEGER PRIMARY KEY,"
+            " version TEXT NOT NULL,"
+            " signature BLOB NOT NULL,"
+            " source TEXT NOT NULL,"
+            " report BLOB NOT NULL,"
+            " used_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS documents_used_at ON documents(used_at)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bands ("
+            " band_key INTEGER NOT NULL,"
+            " document_id INTEGER NOT NULL,"
+            " PRIMARY KEY (band_key, document_id)) WITHOUT ROWID"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS bands_document ON bands(document_id)")
+        self._db.commit()
+
+    def lookup(self, sig: Optional["np.ndarray"]) -> Optional[NearDuplicate]:
+        """The closest earlier report at or above the threshold, if any"""
+        if sig is None:
+            return None
+        keys = band_keys(sig)
+        with self._lock:
+            self._stats["lookups"] += 1
+            rows = self._db.execute(
+                "SELECT d.id, d.signature, d.source, d.report FROM documents d JOIN ("
+                f"  SELECT document_id, COUNT(*) AS shared FROM bands WHERE band_key IN ({','.join('?' * len(keys))})"
+                "   GROUP BY document_id ORDER BY shared DESC LIMIT ?"
+                ") c ON c.document_id = d.id WHERE d.version = ?",
+                (*keys, MAX_CANDIDATES, ANALYSIS_VERSION),
+            ).fetchall()
+            best = None
+            for document_id, stored, source, report in rows:
+                score = similarity(sig, np.frombuffer(stored, dtype=np.uint32))
+                if score >= self.threshold and (best is None or score > best[0]):
+                    best = (score, document_id, source, report)
+            if best is None:
+                return None
+            score, document_id, source, report = best
+            self._db.execute("UPDATE documents SET used_at = ? WHERE id = ?", (time.time(), document_id))
+            self._db.commit()
+            self._stats["matches"] += 1
+        return NearDuplicate(report=json.loads(zlib.decompress(report)), source=source, similarity=round(score, 3))
+
+    def add(self, sig: Optional["np.ndarray"], report: dict, source: str) -> None:
+        if sig is None:
+            return
+        keys = band_keys(sig)
+        with self._lock:
+            cursor = self._db.execute(
+                "INSERT INTO documents (version, signature, source, report, used_at) VALUES (?, ?, ?, ?, ?)",
+                (ANALYSIS_VERSION, sig.tobytes(), source,
+                 zlib.compress(json.dumps(report, separators=(",", ":")).encode()), time.time()),
+            )
+            self._db.executemany("INSERT OR IGNORE INTO bands (band_key, document_id) VALUES (?, ?)",
+                                 [(key, cursor.lastrowid) for key in keys])
+            self._adds += 1
+            self._stats["added"] += 1
+            if self._adds % 1000 == 0:
+                self._prune()
+            self._db.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            documents, = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()
+        return {**self._stats, "documents": documents, "threshold": self.threshold,
+                "enabled": near_duplicates_available()}
+
+    def close(self) -> None:
+        self._db.close()
+
+    def _prune(self) -> None:
+        """Drop the least recently matched documents beyond max_documents, and old-version ones"""
+        count, = self._db.execute("SELECT COUNT(*) FROM documents").fetchone()
+        stale = self._db.execute(
+            "SELECT id FROM documents WHERE version != ? UNION SELECT id FROM ("
+            " SELECT id FROM documents ORDER BY used_at LIMIT ?)",
+            (ANALYSIS_VERSION, max(0, count - self.max_documents)),
+        ).fetchall()
+        if stale:
+            ids = [(row[0],) for row in stale]
+            self._db.executemany("DELETE FROM bands WHERE document_id = ?", ids)
+            self._db.executemany("DELETE FROM documents WHERE id = ?", ids)
+            logger.info("🧹 Pruned %s near-duplicate index entries", len(ids))
+
+
+def mark_duplicate(match: NearDuplicate, metadata: dict) -> dict:
+    """
+    A copy of the earlier report for this request, labeled as reused
+
+    metadata (this request's fileName, fileSize, checkedAt, ...) replaces
+    the earlier request's. The issues' character offsets pointed into the
+    earlier text, so they are dropped.
+    """
+    report = copy.deepcopy(match.report)
+    report["metadata"].update(metadata, duplicateOf=match.source, similarity=match.similarity)
+    for issue in report["issues"]:
+        issue["offsetStart"] = issue["offsetEnd"] = None
+    return report
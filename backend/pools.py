@@ -0,0 +1,82 @@
+"""
+SHARED ANALYSIS POOL
+
+Document pages and video segments are spread over one process pool that
+every check shares, instead of each check starting its own pool of
+os.cpu_count() processes:
+
+- The pool is started on first use with POOL_WORKERS processes
+  (MEDIA_CHECKER_POOL_WORKERS, never more than the CPU count) and kept
+  until shutdown_pool(). Concurrent checks queue their work on the same
+  workers, so the process count stays the same however many checks run.
+- Code that is already running in a worker process (a job worker, or one
+  of this pool's own workers) gets None from shared_pool() and does the
+  work serially - a pool per job worker would multiply the processes again.
+- A pool left broken by a crashed worker is replaced on the next call.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from backend.logging_setup import init_worker_logging, worker_context
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+CPU_COUNT = os.cpu_count() or 1
+POOL_WORKERS = max(1, min(CPU_COUNT, int(os.environ.get("MEDIA_CHECKER_POOL_WORKERS", CPU_COUNT))))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_worker_process = False
+
+
+# ========================================
+# WORKER SIDE
+# ========================================
+def init_worker_process() -> None:
+    """Initializer for every process pool the backend starts"""
+    global _worker_process
+    init_worker_logging()
+    _worker_process = True
+
+
+def in_worker_process() -> bool:
+    return _worker_process
+
+
+# ========================================
+# POOL
+# ========================================
+def shared_pool() -> Optional[ProcessPoolExecutor]:
+    """The shared pool, or None in a worker process (do the work serially)"""
+    global _pool
+    if _worker_process:
+        return None
+    with _pool_lock:
+        # _broken is set once a worker has died; every later submit would fail
+        if _pool is not None and _pool._broken:
+            logger.warning("⚠️ Analysis pool broken (%s), starting a new one", _pool._broken)
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                max_workers=POOL_WORKERS,
+                mp_context=worker_context(),
+                initializer=init_worker_process,
+            )
+            logger.info("⚙️ Analysis pool started with %d workers", POOL_WORKERS)
+        return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,474 @@
+"""
+CONTAINER METADATA PROBE (MP4 / MOV / WebM / MKV)
+
+Reads duration, codecs, resolution and stream count straight from the
+container headers - no decoding and no ffprobe. The file is memory-mapped
+and only the boxes / elements we need are touched:
+
+- MP4: top-level boxes are hopped over by size, so a multi-GB mdat is
+  skipped without being read and a moov at the end of the file is found
+  just as quickly as one at the start. Inside moov: mvhd, trak/tkhd and
+  trak/mdia/{hdlr,minf/stbl/stsd}.
+- WebM/Matroska: EBML header for the doc type, then Segment/Info for the
+  duration and Segment/Tracks for the streams. Clusters are skipped.
+
+window_byte_ranges() goes one level deeper (MP4 sample tables, Matroska
+cluster timecodes) to map time windows to the bytes that encode them.
+"""
+
+import bisect
+import mmap
+import struct
+from dataclasses import dataclass, field
+from typing import BinaryIO, Optional
+
+
+class ProbeError(Exception):
+    """The file is not a container this probe understands"""
+
+
+@dataclass
+class StreamInfo:
+    kind: str                        # "video", "audio", "subtitle" or "other"
+    codec: Optional[str] = None
+    width: Optional[int] = None
+    height: Optional[int] = None
+
+
+@dataclass
+class MediaProbe:
+    container: str
+    duration_sec: Optional[float] = None
+    streams: list = field(default_factory=list)
+
+    @property
+    def stream_count(self) -> int:
+        return len(self.streams)
+
+    @property
+    def codecs(self) -> list[str]:
+        return [s.codec for s in self.streams if s.codec]
+
+    @property
+    def video(self) -> Optional[StreamInfo]:
+        return next((s for s in self.streams if s.kind == "video"), None)
+
+
+# ========================================
+# ENTRY POINT
+# ========================================
+def probe_file(fileobj: BinaryIO) -> MediaProbe:
+    """Probe an open binary file (real file, or an in-memory spool)"""
+    # A SpooledTemporaryFile that never rolled over is still a BytesIO
+    inner = getattr(fileobj, "_file", fileobj)
+    if hasattr(inner, "getbuffer"):
+        return probe_buffer(inner.getbuffer())
+
+    fileobj.seek(0, 2)
+    if fileobj.tell() == 0:
+        raise ProbeError("Empty file")
+    with mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        return probe_buffer(buf)
+
+
+def probe_buffer(buf) -> MediaProbe:
+    try:
+        if len(buf) >= 8 and bytes(buf[4:8]) in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+            return _probe_mp4(buf)
+        if len(buf) >= 4 and bytes(buf[0:4]) == b"\x1a\x45\xdf\xa3":
+            return _probe_matroska(buf)
+    except (struct.error, IndexError) as e:
+        # Truncated or corrupt headers
+        raise ProbeError(f"Malformed container: {e}") from e
+    raise ProbeError("Not an MP4 or WebM/Matroska file")
+
+
+# ========================================
+# MP4 / MOV
+# ========================================
+def _iter_boxes(buf, start: int, end: int):
+    """Yield (type, payload_start, box_end) without reading payloads"""
+    pos = start
+    while pos + 8 <= end:
+        size, = struct.unpack_from(">I", buf, pos)
+        box_type = bytes(buf[pos + 4:pos + 8])
+        header = 8
+        if size == 1:
+            if pos + 16 > end:
+                return
+            size, = struct.unpack_from(">Q", buf, pos + 8)
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header:
+            return
+        yield box_type, pos + header, min(pos + size, end)
+        pos += size
+
+
+def _find_box(buf, start: int, end: int, box_type: bytes) -> Optional[tuple[int, int]]:
+    for found, payload, box_end in _iter_boxes(buf, start, end):
+        if found == box_type:
+            return payload, box_end
+    return None
+
+
+def _probe_mp4(buf) -> MediaProbe:
+    moov = _find_box(buf, 0, len(buf), b"moov")
+    if moov is None:
+        raise ProbeError("MP4 without a moov box")
+    moov_start, moov_end = moov
+
+    ftyp = _find_box(buf, 0, min(len(buf), 64), b"ftyp")
+    brand = bytes(buf[ftyp[0]:ftyp[0] + 4]) if ftyp else b""
+    probe = MediaProbe(container="mov" if brand == b"qt  " else "mp4")
+
+    timescale = duration = 0
+    fragment_duration = 0
+    for box_type, payload, box_end in _iter_boxes(buf, moov_start, moov_end):
+        if box_type == b"mvhd":
+            if buf[payload] == 1:
+                timescale, duration = struct.unpack_from(">IQ", buf, payload + 20)
+            else:
+                timescale, duration = struct.unpack_from(">II", buf, payload + 12)
+        elif box_type == b"trak":
+            probe.streams.append(_read_trak(buf, payload, box_end))
+        elif box_type == b"mvex":
+            # Fragmented MP4: mvhd duration is 0, the real one is in mehd
+            mehd = _find_box(buf, payload, box_end, b"mehd")
+            if mehd:
+                fmt = ">Q" if buf[mehd[0]] == 1 else ">I"
+                fragment_duration, = struct.unpack_from(fmt, buf, mehd[0] + 4)
+
+    if timescale:
+        probe.duration_sec = (duration or fragment_duration) / timescale
+    return probe
+
+
+def _read_trak(buf, start: int, end: int) -> StreamInfo:
+    stream = StreamInfo(kind="other")
+
+    tkhd = _find_box(buf, start, end, b"tkhd")
+    if tkhd:
+        pos = tkhd[0]
+        # Width/height are the last 8 bytes of tkhd, as 16.16 fixed point
+        offset = 88 if buf[pos] == 1 else 76
+        if pos + offset + 8 <= tkhd[1]:
+            width, height = struct.unpack_from(">II", buf, pos + offset)
+            if width and height:
+                stream.width, stream.height = width >> 16, height >> 16
+
+    mdia = _find_box(buf, start, end, b"mdia")
+    if mdia:
+        hdlr = _find_box(buf, mdia[0], mdia[1], b"hdlr")
+        if hdlr:
+            handler = bytes(buf[hdlr[0] + 8:hdlr[0] + 12])
+            stream.kind = {
+                b"vide": "video",
+                b"soun": "audio",
+                b"sbtl": "subtitle",
+                b"subt": "subtitle",
+                b"text": "subtitle",
+            }.get(handler, "other")
+
+        minf = _find_box(buf, mdia[0], mdia[1], b"minf")
+        stbl = minf and _find_box(buf, minf[0], minf[1], b"stbl")
+        stsd = stbl and _find_box(buf, stbl[0], stbl[1], b"stsd")
+        if stsd and stsd[0] + 16 <= stsd[1]:
+            # version/flags (4) + entry_count (4), then the first sample entry's size + format
+            stream.codec = bytes(buf[stsd[0] + 12:stsd[0] + 16]).decode("latin-1").strip()
+
+    if stream.kind != "video":
+        stream.width = stream.height = None
+    return stream
+
+
+# ========================================
+# WEBM / MATROSKA (EBML)
+# ========================================
+EBML_HEADER = 0x1A45DFA3
+EBML_DOCTYPE = 0x4282
+SEGMENT = 0x18538067
+INFO = 0x1549A966
+TIMECODE_SCALE = 0x2AD7B1
+DURATION = 0x4489
+TRACKS = 0x1654AE6B
+TRACK_ENTRY = 0xAE
+TRACK_TYPE = 0x83
+CODEC_ID = 0x86
+VIDEO = 0xE0
+PIXEL_WIDTH = 0xB0
+PIXEL_HEIGHT = 0xBA
+CLUSTER = 0x1F43B675
+CLUSTER_TIMECODE = 0xE7
+
+TRACK_KINDS = {1: "video", 2: "audio", 17: "subtitle"}
+
+
+def _read_vint(buf, pos: int, keep_marker: bool) -> tuple[int, int, bool]:
+    """Read an EBML variable-length integer -> (value, new_pos, is_all_ones)"""
+    first = buf[pos]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ProbeError("Invalid EBML length")
+
+    value = first if keep_marker else first & (mask - 1)
+    all_ones = (first & (mask - 1)) == mask - 1
+    for i in range(1, length):
+        byte = buf[pos + i]
+        value = (value << 8) | byte
+        all_ones = all_ones and byte == 0xFF
+    return value, pos + length, all_ones
+
+
+def _iter_elements(buf, start: int, end: int):
+    """Yield (id, data_start, data_end) for the elements in [start, end)"""
+    pos = start
+    while pos < end:
+        element_id, pos, _ = _read_vint(buf, pos, keep_marker=True)
+        size, pos, unknown = _read_vint(buf, pos, keep_marker=False)
+        data_end = end if unknown else min(pos + size, end)
+        yield element_id, pos, data_end
+        if unknown:
+            return
+        pos = data_end
+
+
+def _read_uint(buf, start: int, end: int) -> int:
+    return int.from_bytes(bytes(buf[start:end]), "big")
+
+
+def _read_float(buf, start: int, end: int) -> Optional[float]:
+    if end - start == 4:
+        return struct.unpack_from(">f", buf, start)[0]
+    if end - start == 8:
+        return struct.unpack_from(">d", buf, start)[0]
+    return None
+
+
+def _probe_matroska(buf) -> MediaProbe:
+    probe = MediaProbe(container="matroska")
+    end = len(buf)
+
+    for element_id, start, data_end in _iter_elements(buf, 0, end):
+        if element_id == EBML_HEADER:
+            for child, c_start, c_end in _iter_elements(buf, start, data_end):
+                if child == EBML_DOCTYPE:
+                    probe.container = bytes(buf[c_start:c_end]).rstrip(b"\x00").decode("ascii", "replace")
+        elif element_id == SEGMENT:
+            _read_segment(buf, start, data_end, probe)
+            break
+
+    return probe
+
+
+def _read_segment(buf, start: int, end: int, probe: MediaProbe) -> None:
+    have_info = have_tracks = False
+    for element_id, e_start, e_end in _iter_elements(buf, start, end):
+        if element_id == INFO:
+            scale = 1_000_000
+            duration = None
+            for child, c_start, c_end in _iter_elements(buf, e_start, e_end):
+                if child == TIMECODE_SCALE:
+                    scale = _read_uint(buf, c_start, c_end)
+                elif child == DURATION:
+                    duration = _read_float(buf, c_start, c_end)
+            if duration is not None:
+                probe.duration_sec = duration * scale / 1e9
+            have_info = True
+        elif element_id == TRACKS:
+            for child, c_start, c_end in _iter_elements(buf, e_start, e_end):
+                if child == TRACK_ENTRY:
+                    probe.streams.append(_read_track_entry(buf, c_start, c_end))
+            have_tracks = True
+        elif element_id == CLUSTER and e_end == end:
+            # Unknown-size cluster (live recording) - nothing useful after it
+            break
+
+        if have_info and have_tracks:
+            break
+
+
+def _read_track_entry(buf, start: int, end: int) -> StreamInfo:
+    stream = StreamInfo(kind="other")
+    for element_id, e_start, e_end in _iter_elements(buf, start, end):
+        if element_id == TRACK_TYPE:
+            stream.kind = TRACK_KINDS.get(_read_uint(buf, e_start, e_end), "other")
+        elif element_id == CODEC_ID:
+            stream.codec = bytes(buf[e_start:e_end]).rstrip(b"\x00").decode("ascii", "replace")
+        elif element_id == VIDEO:
+            for child, c_start, c_end in _iter_elements(buf, e_start, e_end):
+                if child == PIXEL_WIDTH:
+                    stream.width = _read_uint(buf, c_start, c_end)
+                elif child == PIXEL_HEIGHT:
+                    stream.height = _read_uint(buf, c_start, c_end)
+    return stream
+
+
+# ========================================
+# TIME WINDOWS -> BYTE RANGES
+# ========================================
+def window_byte_ranges(buf, windows: list[tuple[float, float]]) -> Optional[list[list[tuple[int, int]]]]:
+    """
+    For each (start, end) window, the byte ranges of the media data needed to
+    decode it - every sample (MP4) or cluster (Matroska) in the window, plus
+    the video back to the keyframe before it.
+
+    None when the container has no usable index (e.g. fragmented MP4).
+    """
+    try:
+        if len(buf) >= 8 and bytes(buf[4:8]) in (b"ftyp", b"moov", b"mdat", b"free", b"wide", b"skip"):
+            return _mp4_window_ranges(buf, windows)
+        if len(buf) >= 4 and bytes(buf[0:4]) == b"\x1a\x45\xdf\xa3":
+            return _matroska_window_ranges(buf, windows)
+    except (struct.error, IndexError, ProbeError):
+        return None
+    return None
+
+
+def _window_of(starts: list[float], t: float) -> int:
+    return max(0, bisect.bisect_right(starts, t) - 1)
+
+
+def _add_range(ranges: list, start: int, end: int) -> None:
+    if ranges and ranges[-1][1] == start:
+        ranges[-1] = (ranges[-1][0], end)
+    else:
+        ranges.append((start, end))
+
+
+def _find_path(buf, start: int, end: int, *path: bytes) -> Optional[tuple[int, int]]:
+    found = (start, end)
+    for box_type in path:
+        found = _find_box(buf, found[0], found[1], box_type)
+        if found is None:
+            return None
+    return found
+
+
+def _read_table(buf, box: tuple[int, int], fields: int, fmt: str = "I") -> tuple:
+    """Entries of a full box laid out as version/flags, entry_count, entries"""
+    count, = struct.unpack_from(">I", buf, box[0] + 4)
+    return struct.unpack_from(f">{count * fields}{fmt}", buf, box[0] + 8)
+
+
+def _mp4_window_ranges(buf, windows: list[tuple[float, float]]) -> Optional[list]:
+    moov = _find_box(buf, 0, len(buf), b"moov")
+    if moov is None:
+        return None
+    starts = [start for start, _ in windows]
+    result: list[list] = [[] for _ in windows]
+
+    for box_type, trak_start, trak_end in _iter_boxes(buf, moov[0], moov[1]):
+        if box_type != b"trak":
+            continue
+        mdhd = _find_path(buf, trak_start, trak_end, b"mdia", b"mdhd")
+        stbl = _find_path(buf, trak_start, trak_end, b"mdia", b"minf", b"stbl")
+        if mdhd is None or stbl is None:
+            return None
+        timescale, = struct.unpack_from(">I", buf, mdhd[0] + (20 if buf[mdhd[0]] == 1 else 12))
+
+        stts = _find_box(buf, stbl[0], stbl[1], b"stts")
+        stsc = _find_box(buf, stbl[0], stbl[1], b"stsc")
+        stsz = _find_box(buf, stbl[0], stbl[1], b"stsz")
+        stco = _find_box(buf, stbl[0], stbl[1], b"stco")
+        co64 = _find_box(buf, stbl[0], stbl[1], b"co64")
+        stss = _find_box(buf, stbl[0], stbl[1], b"stss")
+        if not (timescale and stts and stsc and stsz and (stco or co64)):
+            return None
+
+        deltas = _read_table(buf, stts, 2)
+        sample_to_chunk = _read_table(buf, stsc, 3)
+        chunk_offsets = _read_table(buf, stco, 1) if stco else _read_table(buf, co64, 1, "Q")
+        constant_size, sample_count = struct.unpack_from(">II", buf, stsz[0] + 4)
+        sizes = struct.unpack_from(f">{sample_count}I", buf, stsz[0] + 12) if constant_size == 0 else None
+        sync = set(_read_table(buf, stss, 1)) if stss else None
+
+        _assign_samples(
+            result, starts, timescale, deltas, sample_to_chunk, chunk_offsets,
+            sizes, constant_size, sample_count, sync,
+        )
+    return result
+
+
+def _assign_samples(result, starts, timescale, deltas, sample_to_chunk, chunk_offsets,
+                    sizes, constant_size, sample_count, sync) -> None:
+    """Walk one track's samples in decode order, adding their bytes to their window"""
+    sample = 0                      # 0-based sample number
+    ticks = 0
+    delta_entry, delta_left = 0, deltas[0] if deltas else 0
+    window = -1
+    gop: list = []                  # ranges since the last keyframe
+
+    stsc_entries = len(sample_to_chunk) // 3
+    for entry in range(stsc_entries):
+        first_chunk, per_chunk, _ = sample_to_chunk[entry * 3:entry * 3 + 3]
+        last_chunk = sample_to_chunk[(entry + 1) * 3] - 1 if entry + 1 < stsc_entries else len(chunk_offsets)
+        for chunk in range(first_chunk - 1, last_chunk):
+            offset = chunk_offsets[chunk]
+            for _ in range(per_chunk):
+                if sample >= sample_count:
+                    return
+                size = sizes[sample] if sizes is not None else constant_size
+
+                w = _window_of(starts, ticks / timescale)
+                if sync is not None and sample + 1 in sync:
+                    gop = []
+                if w != window:
+                    # A window that starts mid-GOP needs the frames back to the keyframe
+                    for start, end in gop:
+                        _add_range(result[w], start, end)
+                    window = w
+                _add_range(result[w], offset, offset + size)
+                if sync is not None:
+                    _add_range(gop, offset, offset + size)
+
+                offset += size
+                sample += 1
+                while delta_left == 0 and delta_entry + 1 < len(deltas) // 2:
+                    delta_entry += 1
+                    delta_left = deltas[delta_entry * 2]
+                ticks += deltas[delta_entry * 2 + 1]
+                delta_left -= 1
+
+
+def _matroska_window_ranges(buf, windows: list[tuple[float, float]]) -> Optional[list]:
+    segment = None
+    for element_id, start, end in _iter_elements(buf, 0, len(buf)):
+        if element_id == SEGMENT:
+            segment = (start, end)
+            break
+    if segment is None:
+        return None
+
+    scale = 1_000_000
+    clusters = []                   # (start_sec, byte_start, byte_end)
+    for element_id, start, end in _iter_elements(buf, *segment):
+        if element_id == INFO:
+            for child, c_start, c_end in _iter_elements(buf, start, end):
+                if child == TIMECODE_SCALE:
+                    scale = _read_uint(buf, c_start, c_end)
+        elif element_id == CLUSTER:
+            # An unknown-size cluster runs to the end of the segment, which
+            # only makes its windows' ranges wider (never wrongly reused)
+            timecode = None
+            for child, c_start, c_end in _iter_elements(buf, start, end):
+                if child == CLUSTER_TIMECODE:
+                    timecode = _read_uint(buf, c_start, c_end)
+                    break
+            if timecode is None:
+                return None
+            clusters.append((timecode * scale / 1e9, start, end))
+
+    starts = [start for start, _ in windows]
+    result: list[list] = [[] for _ in windows]
+    for i, (t_start, byte_start, byte_end) in enumerate(clusters):
+        t_end = clusters[i + 1][0] if i + 1 < len(clusters) else windows[-1][1] if windows else t_start
+        # Every window the cluster overlaps needs it
+        for w in range(_window_of(starts, t_start), _window_of(starts, max(t_start, t_end - 1e-6)) + 1):
+            _add_range(result[w], byte_start, byte_end)
+    return result
@@ -0,0 +1,391 @@
+"""
+RESUMABLE CHUNKED UPLOADS
+
+Lets a client send a large file as numbered chunks, in any order and in
+parallel, and pick up where it left off after a dropped connection:
+
+    POST   /uploads                      -> create a session
+    PUT    /uploads/{id}/chunks/{index}  -> send one chunk (X-Chunk-SHA256 optional)
+    GET    /uploads/{id}                 -> which chunks / byte ranges are in
+    POST   /uploads/{id}/complete        -> verify and hand off to the check pipeline
+
+Each chunk is written straight into a preallocated file at its offset, so
+finishing an upload needs no reassembly copy. Session state is kept in a
+small JSON file next to the data, so sessions survive a restart. Sessions
+nobody has touched for SESSION_TTL_SECONDS are garbage-collected.
+
+Because each session reserves its whole file size on disk when it is
+created, open sessions are capped at MAX_ACTIVE_SESSIONS (429 beyond that)
+and MAX_RESERVED_BYTES in total (507 beyond that).
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+from backend.config import DATA_DIR
+from backend.ingest import MAX_UPLOAD_BYTES, SNIFF_BYTES, IngestedUpload, sniff_mime
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# LIMITS
+# ========================================
+SESSIONS_DIR = DATA_DIR / "upload-sessions"
+DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+MIN_CHUNK_SIZE = 256 * 1024
+MAX_CHUNK_SIZE = 64 * 1024 * 1024
+SESSION_TTL_SECONDS = 24 * 60 * 60
+GC_INTERVAL_SECONDS = 15 * 60
+WRITE_BATCH_BYTES = 1024 * 1024      # buffer this much of a chunk before each disk write
+MAX_ACTIVE_SESSIONS = int(os.environ.get("MEDIA_CHECKER_MAX_UPLOAD_SESSIONS", "32"))
+MAX_RESERVED_BYTES = int(os.environ.get("MEDIA_CHECKER_MAX_UPLOAD_RESERVED_BYTES", str(4 * 1024 * 1024 * 1024)))
+
+
+# ========================================
+# ERRORS
+# ========================================
+class UploadSessionError(Exception):
+    """Base class - status_code is what the endpoint should return"""
+    status_code = 400
+
+
+class UploadSessionNotFound(UploadSessionError):
+    status_code = 404
+
+
+class ChunkChecksumMismatch(UploadSessionError):
+    status_code = 422
+
+
+class UploadIncomplete(UploadSessionError):
+    status_code = 409
+
+
+class TooManyUploadSessions(UploadSessionError):
+    status_code = 429
+
+
+class UploadStorageFull(UploadSessionError):
+    status_code = 507
+
+
+# ========================================
+# SESSION STATE
+# ========================================
+@dataclass
+class UploadSession:
+    id: str
+    file_name: str
+    file_size: int
+    chunk_size: int
+    content_type: Optional[str] = None
+    sha256: Optional[str] = None          # optional whole-file checksum to verify on complete
+    received: list = field(default_factory=list)
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+
+    @property
+    def chunk_count(self) -> int:
+        return max(1, -(-self.file_size // self.chunk_size))
+
+    def chunk_length(self, index: int) -> int:
+        if index == self.chunk_count - 1:
+            return self.file_size - index * self.chunk_size
+        return self.chunk_size
+
+    def missing(self) -> list[int]:
+        have = set(self.received)
+        return [i for i in range(self.chunk_count) if i not in have]
+
+    def received_ranges(self) -> list[list[int]]:
+        """Received byte ranges as [start, end) pairs, merged"""
+        ranges: list[list[int]] = []
+        for index in sorted(self.received):
+            start = index * self.chunk_size
+            end = start + self.chunk_length(index)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1][1] = end
+            else:
+                ranges.append([start, end])
+        return ranges
+
+    def to_dict(self) -> dict:
+        return {
+            "uploadId": self.id,
+            "fileName": self.file_name,
+            "fileSize": self.file_size,
+            "chunkSize": self.chunk_size,
+            "chunkCount": self.chunk_count,
+            "receivedChunks": sorted(self.received),
+            "missingChunks": self.missing(),
+            "receivedRanges": self.received_ranges(),
+            "complete": len(self.received) == self.chunk_count,
+        }
+
+
+class ResumableUploadStore:
+    """Owns the upload session directories under SESSIONS_DIR"""
+
+    def __init__(
+        self,
+        directory: Path = SESSIONS_DIR,
+        ttl_seconds: float = SESSION_TTL_SECONDS,
+        max_sessions: int = MAX_ACTIVE_SESSIONS,
+        max_reserved_bytes: int = MAX_RESERVED_BYTES,
+    ):
+        self.directory = Path(directory)
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self.max_reserved_bytes = max_reserved_bytes
+        self._sessions: dict[str, UploadSession] = {}
+        self._budget_lock = threading.Lock()    # create() runs in worker threads
+        self._state_locks: dict[str, asyncio.Lock] = {}
+        self._load_sessions()
+
+    # ---------- paths ----------
+
+    def _session_dir(self, upload_id: str) -> Path:
+        return self.directory / upload_id
+
+    def data_path(self, upload_id: str) -> Path:
+        return self._session_dir(upload_id) / "data"
+
+    def _state_path(self, upload_id: str) -> Path:
+        return self._session_dir(upload_id) / "session.json"
+
+    # ---------- sessions ----------
+
+    def create(
+        self,
+        file_name: str,
+        file_size: int,
+        content_type: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+        sha256: Optional[str] = None,
+    ) -> UploadSession:
+        if file_size <= 0:
+            raise UploadSessionError("fileSize must be positive")
+        if file_size > MAX_UPLOAD_BYTES:
+            raise UploadSessionError(f"fileSize exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB limit")
+
+        chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        if not MIN_CHUNK_SIZE <= chunk_size <= MAX_CHUNK_SIZE:
+            raise UploadSessionError(
+                f"chunkSize must be between {MIN_CHUNK_SIZE} and {MAX_CHUNK_SIZE} bytes"
+            )
+
+        session = UploadSession(
+            id=uuid.uuid4().hex,
+            file_name=file_name,
+            file_size=file_size,
+            chunk_size=chunk_size,
+            content_type=content_type,
+            sha256=sha256.lower() if sha256 else None,
+        )
+
+        # Claim the session's share of the budget before touching the disk
+        with self._budget_lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise TooManyUploadSessions("Too many uploads in progress, try again later")
+            if self.reserved_bytes() + file_size > self.max_reserved_bytes:
+                raise UploadStorageFull("Not enough upload space reserved for this file, try again later")
+            self._sessions[session.id] = session
+
+        try:
+            self._session_dir(session.id).mkdir(parents=True, exist_ok=True)
+            with open(self.data_path(session.id), "wb") as f:
+                # Reserve the full size up front so every chunk can go straight to its offset
+                if hasattr(os, "posix_fallocate"):
+                    os.posix_fallocate(f.fileno(), 0, file_size)
+                else:
+                    f.truncate(file_size)
+            self._save(session)
+        except OSError as e:
+            self.discard(session.id)
+            raise UploadStorageFull(f"Could not reserve {file_size} bytes for the upload: {e}") from e
+
+        logger.info("📦 Upload session %s: %s (%s bytes, %s chunks)",
+                    session.id, file_name, file_size, session.chunk_count)
+        return session
+
+    def reserved_bytes(self) -> int:
+        return sum(s.file_size for s in list(self._sessions.values()))
+
+    def get(self, upload_id: str) -> UploadSession:
+        session = self._sessions.get(upload_id)
+        if session is None:
+            raise UploadSessionNotFound("Upload session not found")
+        return session
+
+    async def write_chunk(
+        self,
+        upload_id: str,
+        index: int,
+        body: AsyncIterator[bytes],
+        checksum: Optional[str] = None,
+    ) -> UploadSession:
+        """
+        Stream one chunk's body into place
+
+        The chunk is hashed as it is written; if it is short, long, or fails
+        the checksum it is not marked as received and can simply be resent.
+        """
+        session = self.get(upload_id)
+        if not 0 <= index < session.chunk_count:
+            raise UploadSessionError(f"Chunk index must be between 0 and {session.chunk_count - 1}")
+
+        expected = session.chunk_length(index)
+        offset = index * session.chunk_size
+        digest = hashlib.sha256()
+        written = 0
+        pending: list[bytes] = []
+        pending_bytes = 0
+
+        # A resent chunk overwrites the old bytes, so it is not "received" until verified again
+        if index in session.received:
+            session.received.remove(index)
+
+        # Separate handle per chunk so parallel chunks don't share a file position
+        f = await asyncio.to_thread(open, self.data_path(upload_id), "r+b")
+        try:
+            await asyncio.to_thread(f.seek, offset)
+            async for piece in body:
+                if not piece:
+                    continue
+                written += len(piece)
+                if written > expected:
+                    raise UploadSessionError(f"Chunk {index} is larger than {expected} bytes")
+                digest.update(piece)
+                pending.append(piece)
+                pending_bytes += len(piece)
+                if pending_bytes >= WRITE_BATCH_BYTES:
+                    await asyncio.to_thread(f.write, b"".join(pending))
+                    pending, pending_bytes = [], 0
+            if pending:
+                await asyncio.to_thread(f.write, b"".join(pending))
+        finally:
+            await asyncio.to_thread(f.close)
+
+        if written != expected:
+            raise UploadSessionError(f"Chunk {index} should be {expected} bytes, got {written}")
+        if checksum and digest.hexdigest() != checksum.strip().lower():
+            raise ChunkChecksumMismatch(f"Chunk {index} failed its SHA-256 check")
+
+        if index not in session.received:
+            session.received.append(index)
+        session.updated_at = time.time()
+
+        # Snapshot under the lock so the newest state is always the one on disk
+        lock = self._state_locks.setdefault(upload_id, asyncio.Lock())
+        async with lock:
+            await asyncio.to_thread(self._write_state, upload_id, json.dumps(asdict(session)))
+        return session
+
+    async def finalize(self, upload_id: str) -> IngestedUpload:
+        """
+        Verify the assembled file and open it as an IngestedUpload
+
+        The caller owns the returned upload and should call discard()
+        once it has been handed off.
+        """
+        session = self.get(upload_id)
+        missing = session.missing()
+        if missing:
+            raise UploadIncomplete(f"{len(missing)} chunks still missing (first: {missing[0]})")
+
+        sha256, head = await asyncio.to_thread(self._hash_file, self.data_path(upload_id))
+        if session.sha256 and sha256 != session.sha256:
+            raise ChunkChecksumMismatch("Assembled file does not match the declared SHA-256")
+
+        return IngestedUpload(
+            file=open(self.data_path(upload_id), "rb"),
+            filename=session.file_name,
+            declared_type=session.content_type,
+            sniffed_type=sniff_mime(head),
+            size=session.file_size,
+            sha256=sha256,
+        )
+
+    def discard(self, upload_id: str) -> None:
+        self._forget(upload_id)
+        self._remove_dirs([upload_id])
+
+    def _forget(self, upload_id: str) -> None:
+        self._sessions.pop(upload_id, None)
+        self._state_locks.pop(upload_id, None)
+
+    def _remove_dirs(self, upload_ids: list[str]) -> None:
+        for upload_id in upload_ids:
+            shutil.rmtree(self._session_dir(upload_id), ignore_errors=True)
+
+    # ---------- garbage collection ----------
+
+    def _expire(self) -> list[str]:
+        """Forget sessions that have been idle longer than the TTL (their files are still there)"""
+        cutoff = time.time() - self.ttl_seconds
+        stale = [s.id for s in self._sessions.values() if s.updated_at < cutoff]
+        for upload_id in stale:
+            self._forget(upload_id)
+        if stale:
+            logger.info("🧹 Removing %d abandoned upload sessions", len(stale))
+        return stale
+
+    def collect_garbage(self) -> int:
+        """Remove sessions that have been idle longer than the TTL"""
+        stale = self._expire()
+        self._remove_dirs(stale)
+        return len(stale)
+
+    async def run_gc_forever(self, interval: float = GC_INTERVAL_SECONDS) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            # Sessions are only touched on the event loop; just the deletes go to a thread
+            stale = self._expire()
+            await asyncio.to_thread(self._remove_dirs, stale)
+
+    # ---------- persistence ----------
+
+    def _save(self, session: UploadSession) -> None:
+        self._write_state(session.id, json.dumps(asdict(session)))
+
+    def _write_state(self, upload_id: str, payload: str) -> None:
+        path = self._state_path(upload_id)
+        tmp = path.with_suffix(".tmp")
+        tmp.write_text(payload)
+        os.replace(tmp, path)
+
+    def _load_sessions(self) -> None:
+        if not self.directory.exists():
+            return
+        for state in self.directory.glob("*/session.json"):
+            try:
+                session = UploadSession(**json.loads(state.read_text()))
+            except (OSError, ValueError, TypeError):
+                shutil.rmtree(state.parent, ignore_errors=True)
+                continue
+            self._sessions[session.id] = session
+        self.collect_garbage()
+
+    @staticmethod
+    def _hash_file(path: Path) -> tuple[str, bytes]:
+        digest = hashlib.sha256()
+        head = b""
+        with open(path, "rb") as f:
+            while True:
+                block = f.read(WRITE_BATCH_BYTES)
+                if not block:
+                    break
+                if not head:
+                    head = block[:SNIFF_BYTES]
+                digest.update(block)
+        return digest.hexdigest(), head
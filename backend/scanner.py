@@ -0,0 +1,192 @@
+"""
+TEXT COMPLIANCE SCANNER
+
+Checks text against a rule set of prohibited / flagged phrases. The rules
+are compiled once into a single keyword automaton, so every rule is matched
+in one linear pass and throughput does not drop as rules are added.
+
+Text is scanned in chunks: the automaton state carries across chunk
+boundaries, and a short tail of the previous chunk is kept for the
+whole-word checks, so a phrase split between two chunks is still found.
+
+Rules live in backend/rules/default_rules.json (override the path with the
+MEDIA_CHECKER_RULES environment variable):
+
+    {"id": "...", "phrases": ["..."], "severity": "high", "title": "...", "recommendation": "..."}
+"""
+
+import itertools
+import json
+import logging
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Iterator, Optional
+
+from backend.automaton import KeywordAutomaton
+from backend.models import Issue
+
+logger = logging.getLogger(__name__)
+
+RULES_PATH = Path(os.environ.get(
+    "MEDIA_CHECKER_RULES",
+    Path(__file__).parent / "rules" / "default_rules.json",
+))
+SCAN_CHUNK_CHARS = 64 * 1024
+MAX_ISSUES_PER_SCAN = 500          # a pathological input shouldn't produce a million issues
+
+
+# ========================================
+# RULES
+# ========================================
+@dataclass(frozen=True)
+class Rule:
+    id: str
+    phrases: tuple
+    severity: str
+    title: str
+    recommendation: str
+
+
+@dataclass(frozen=True)
+class RuleHit:
+    rule: Rule
+    start: int          # character offsets into the scanned text
+    end: int
+    text: str           # the matched text as it appeared
+
+
+class RuleSet:
+    """A compiled set of rules"""
+
+    def __init__(self, rules: list[Rule]):
+        self.rules = rules
+        self.automaton = KeywordAutomaton(
+            [(phrase, rule) for rule in rules for phrase in rule.phrases],
+            whole_words=True,
+        )
+
+    @classmethod
+    def from_file(cls, path: Path) -> "RuleSet":
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        rules = [
+            Rule(
+                id=item["id"],
+                phrases=tuple(item["phrases"]),
+                severity=item.get("severity", "medium"),
+                title=item.get("title", item["id"]),
+                recommendation=item.get("recommendation", "Please review and address this issue."),
+            )
+            for item in data["rules"]
+        ]
+        return cls(rules)
+
+    def scanner(self) -> "StreamScanner":
+        return StreamScanner(self)
+
+    def scan_stream(self, chunks: Iterable[str]) -> Iterator[RuleHit]:
+        """Hits from text that arrives in pieces (pages, paragraphs, file chunks)"""
+        scanner = self.scanner()
+        for chunk in chunks:
+            yield from scanner.feed(chunk)
+        yield from scanner.finish()
+
+    def scan_text(self, text: str, chunk_chars: int = SCAN_CHUNK_CHARS,
+                  limit: Optional[int] = MAX_ISSUES_PER_SCAN) -> list[RuleHit]:
+        """The first `limit` hits - the rest of the text is not scanned (None: no limit)"""
+        chunks = (text[i:i + chunk_chars] for i in range(0, len(text), chunk_chars))
+        stream = self.scan_stream(chunks)
+        hits = list(itertools.islice(stream, limit))
+        if limit is not None and len(hits) == limit and next(stream, None) is not None:
+            logger.warning("⚠️ Scanner stopped after %d hits, at character %d of %d",
+                           limit, hits[-1].end, len(text))
+        return hits
+
+
+class StreamScanner:
+    """Incremental scanner - feed() chunks in order, then finish()"""
+
+    def __init__(self, ruleset: RuleSet):
+        self.automaton = ruleset.automaton
+        self._state = 0
+        self._offset = 0        # characters consumed so far
+        self._tail = ""         # end of the previous chunk, for boundary checks
+        self._pending: list[tuple] = []     # matches ending exactly at the previous chunk's end
+
+    def feed(self, chunk: str) -> list[RuleHit]:
+        if not chunk:
+            return []
+        window = self._tail + chunk
+        base = self._offset - len(self._tail)
+        hits: list[RuleHit] = []
+
+        for start, end, rule in self._pending:
+            self._accept(window, base, start, end, rule, hits)
+        self._pending = []
+
+        matches, self._state = self.automaton.scan_chunk(chunk, self._state, self._offset)
+        chunk_end = self._offset + len(chunk)
+        for start, end, rule in matches:
+            if end == chunk_end:
+                # The next character decides whether this is a whole word
+                self._pending.append((start, end, rule))
+            else:
+                self._accept(window, base, start, end, rule, hits)
+
+        self._offset = chunk_end
+        self._tail = window[-(self.automaton.max_length + 1):]
+        return hits
+
+    def finish(self) -> list[RuleHit]:
+        hits: list[RuleHit] = []
+        base = self._offset - len(self._tail)
+        for start, end, rule in self._pending:
+            self._accept(self._tail, base, start, end, rule, hits)
+        self._pending = []
+        return hits
+
+    @staticmethod
+    def _accept(window: str, base: int, start: int, end: int, rule: Rule, hits: list) -> None:
+        local_start, local_end = start - base, end - base
+        if KeywordAutomaton.is_whole_word(window, local_start, local_end):
+            hits.append(RuleHit(rule=rule, start=start, end=end, text=window[local_start:local_end]))
+
+
+@lru_cache(maxsize=1)
+def get_default_ruleset() -> RuleSet:
+    """The rule set from RULES_PATH, compiled once per process"""
+    ruleset = RuleSet.from_file(RULES_PATH)
+    logger.info("📚 Compiled %s rules (%s phrases)", len(ruleset.rules), len(ruleset.automaton))
+    return ruleset
+
+
+# ========================================
+# HITS -> ISSUES
+# ========================================
+def hits_to_issues(
+    hits: Iterable[RuleHit],
+    limit: int = MAX_ISSUES_PER_SCAN,
+    timestamp: Optional[str] = None,
+) -> list[Issue]:
+    issues: list[Issue] = []
+    for hit in hits:
+        if len(issues) >= limit:
+            logger.warning("⚠️ Scanner stopped after %s issues", limit)
+            break
+        issues.append(Issue(
+            id=f"{hit.rule.id}-{hit.start}",
+            severity=hit.rule.severity,
+            title=hit.rule.title,
+            description=f'Flagged phrase "{hit.text}" at characters {hit.start}-{hit.end}',
+            timestamp=timestamp,
+            recommendation=hit.rule.recommendation,
+            offsetStart=hit.start,
+            offsetEnd=hit.end,
+        ))
+    return issues
+
+
+def scan_text_for_issues(text: str) -> list[Issue]:
+    return hits_to_issues(get_default_ruleset().scan_text(text))
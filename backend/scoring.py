@@ -0,0 +1,43 @@
+"""
+SCORING
+
+Same rules as calculateScore / determineStatus in
+src/utils/responseMapper.ts, so server-built reports score the way the
+frontend always has.
+"""
+
+from backend.models import Issue, Summary
+
+SEVERITY_PENALTIES = {
+    "high": 30,
+    "medium": 15,
+    "low": 5,
+}
+
+SEVERITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
+
+def calculate_score(issues: list[Issue]) -> int:
+    if not issues:
+        return 100
+    penalty = sum(SEVERITY_PENALTIES.get(issue.severity, 0) for issue in issues)
+    return max(0, 100 - penalty)
+
+
+def determine_status(score: int, issues: list[Issue]) -> str:
+    if any(issue.severity == "high" for issue in issues) or score < 50:
+        return "fail"
+    if issues or score < 80:
+        return "partial_fail"
+    return "pass"
+
+
+def build_summary(issues: list[Issue]) -> Summary:
+    score = calculate_score(issues)
+    return Summary(
+        status=determine_status(score, issues),
+        issuesCount=len(issues),
+        # Each issue carries one recommendation
+        recommendationsCount=len(issues),
+        score=score,
+    )
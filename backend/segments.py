@@ -0,0 +1,349 @@
+"""
+SEGMENT-LEVEL VIDEO ANALYSIS
+
+Splits a video into fixed time windows, analyzes the windows in parallel on
+the shared analysis pool (backend/pools.py; one at a time when the check
+already runs in a job worker) and merges what they find into Issues with timestamps.
+
+Each finished window is checkpointed to disk (keyed by the file's SHA-256),
+so if the server dies half way through a long video, checking the same file
+again only analyzes the windows that were not done yet. Window results are
+also indexed by a fingerprint of the window's media bytes, so an edited
+version of a video only re-analyzes the windows the edit touched.
+
+The per-window analyzer runs ffmpeg's blackdetect / silencedetect /
+volumedetect filters on just that window (ffmpeg seeks straight to it).
+ffmpeg is optional - without it on the PATH, segment analysis is skipped.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import subprocess
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from backend.cdc import ChunkResultIndex, window_fingerprints
+from backend.config import DATA_DIR
+from backend.models import Issue
+from backend.pools import shared_pool
+
+logger = logging.getLogger(__name__)
+
+# ========================================
+# SETTINGS
+# ========================================
+FFMPEG = os.environ.get("MEDIA_CHECKER_FFMPEG", "ffmpeg")
+SEGMENT_SECONDS = int(os.environ.get("MEDIA_CHECKER_SEGMENT_SECONDS", "30"))
+SEGMENT_TIMEOUT_SECONDS = 600
+CHECKPOINT_DIR = DATA_DIR / "segments"
+
+# Bump when the analyzer's output changes, so old checkpoints are ignored
+SEGMENT_ANALYZER_VERSION = "1"
+
+BLACK_MIN_SECONDS = 0.5
+SILENCE_MIN_SECONDS = 2.0
+SILENCE_NOISE_DB = -50
+CLIPPING_DB = -0.1              # max_volume at or above this counts as clipping
+MERGE_GAP_SECONDS = 0.1         # events this close across a window edge are one event
+
+# kind -> (severity, title, recommendation)
+EVENT_TYPES = {
+    "black": (
+        "medium",
+        "Black frames",
+        "Check that the black section is intentional (e.g. a transition) and not an encoding error.",
+    ),
+    "silence": (
+        "low",
+        "Silent audio",
+        "Confirm the silence is intended, or add voice-over / music.",
+    ),
+    "clipping": (
+        "medium",
+        "Audio clipping",
+        "Reduce the gain in this section so peaks stay below 0 dBFS.",
+    ),
+    "quiet": (
+        "low",
+        "Low audio level",
+        "Normalize the track - listeners will have to turn the volume up a long way.",
+    ),
+}
+
+# progress(done_windows, total_windows)
+SegmentProgress = Callable[[int, int], None]
+
+
+def segment_analysis_available() -> bool:
+    return shutil.which(FFMPEG) is not None
+
+
+def plan_segments(duration_sec: float, segment_seconds: int = SEGMENT_SECONDS) -> list[tuple[float, float]]:
+    """(start, end) windows covering the whole video"""
+    windows = []
+    start = 0.0
+    while start < duration_sec:
+        end = min(start + segment_seconds, duration_sec)
+        windows.append((start, end))
+        start = end
+    return windows
+
+
+def format_timestamp(seconds: float) -> str:
+    """120.5 -> "02:00", 3725 -> "1:02:05" """
+    total = int(seconds)
+    hours, rest = divmod(total, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+# ========================================
+# PER-WINDOW ANALYZER (runs in a pool process)
+# ========================================
+_BLACK = re.compile(r"black_start:(?P<start>[\d.]+) black_end:(?P<end>[\d.]+)")
+_SILENCE_START = re.compile(r"silence_start: (?P<start>-?[\d.]+)")
+_SILENCE_END = re.compile(r"silence_end: (?P<end>[\d.]+)")
+_MAX_VOLUME = re.compile(r"max_volume: (?P<db>-?[\d.]+) dB")
+
+
+def analyze_window(path: str, start: float, end: float) -> list[dict]:
+    """
+    Events in one window as [{"kind", "start", "end", "detail"}]
+
+    Times are absolute (seconds from the start of the video).
+    """
+    length = end - start
+    command = [
+        FFMPEG, "-hide_banner", "-nostats", "-threads", "1",
+        "-ss", f"{start:.3f}", "-t", f"{length:.3f}", "-i", path,
+        "-vf", f"blackdetect=d={BLACK_MIN_SECONDS}",
+        "-af", f"silencedetect=noise={SILENCE_NOISE_DB}dB:d={SILENCE_MIN_SECONDS},volumedetect",
+        "-f", "null", "-",
+    ]
+    result = subprocess.run(
+        command,
+        capture_output=True,
+        text=True,
+        errors="replace",
+        timeout=SEGMENT_TIMEOUT_SECONDS,
+    )
+    if result.returncode != 0:
+        tail = result.stderr.strip().splitlines()[-1:] or ["no output"]
+        raise RuntimeError(f"ffmpeg failed on {start:.0f}-{end:.0f}s: {tail[0]}")
+    return parse_ffmpeg_output(result.stderr, start, end)
+
+
+def parse_ffmpeg_output(stderr: str, start: float, end: float) -> list[dict]:
+    """ffmpeg filter log -> events (filter times are relative to the window)"""
+    events = []
+
+    for m in _BLACK.finditer(stderr):
+        events.append({
+            "kind": "black",
+            "start": start + float(m["start"]),
+            "end": min(end, start + float(m["end"])),
+            "detail": None,
+        })
+
+    # silencedetect prints start and end on separate lines; a silence still
+    # running at the end of the window has no end line
+    silence_start = None
+    for line in stderr.splitlines():
+        m = _SILENCE_START.search(line)
+        if m:
+            silence_start = max(0.0, float(m["start"]))
+            continue
+        m = _SILENCE_END.search(line)
+        if m and silence_start is not None:
+            events.append({"kind": "silence", "start": start + silence_start,
+                           "end": min(end, start + float(m["end"])), "detail": None})
+            silence_start = None
+    if silence_start is not None:
+        events.append({"kind": "silence", "start": start + silence_start, "end": end, "detail": None})
+
+    m = _MAX_VOLUME.search(stderr)
+    if m and float(m["db"]) >= CLIPPING_DB:
+        events.append({"kind": "clipping", "start": start, "end": end,
+                       "detail": f"peaks at {float(m['db']):.1f} dB"})
+
+    return events
+
+
+# ========================================
+# CHECKPOINTS
+# ========================================
+class SegmentCheckpoint:
+    """Finished windows of one file, saved after every window"""
+
+    def __init__(self, sha256: str, segment_seconds: int):
+        self.path = CHECKPOINT_DIR / f"{sha256}.json"
+        self.segment_seconds = segment_seconds
+        self.done: dict[int, list] = {}
+
+    def load(self) -> None:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if (data.get("version") == SEGMENT_ANALYZER_VERSION
+                and data.get("segmentSeconds") == self.segment_seconds):
+            self.done = {int(index): events for index, events in data["segments"].items()}
+
+    def save(self, index: int, events: list) -> None:
+        self.done[index] = events
+        os.makedirs(self.path.parent, exist_ok=True)
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": SEGMENT_ANALYZER_VERSION,
+                "segmentSeconds": self.segment_seconds,
+                "segments": self.done,
+            }, f)
+        os.replace(tmp, self.path)
+
+    def remove(self) -> None:
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+
+# ========================================
+# PIPELINE
+# ========================================
+@dataclass
+class SegmentResult:
+    issues: list
+    windows: int
+    reused: int                     # windows taken from the index / checkpoint, not re-analyzed
+
+    @property
+    def reused_fraction(self) -> float:
+        return self.reused / self.windows if self.windows else 0.0
+
+
+def analyze_segments(
+    path: str,
+    duration_sec: float,
+    sha256: Optional[str] = None,
+    progress: Optional[SegmentProgress] = None,
+    segment_seconds: int = SEGMENT_SECONDS,
+    analyzer: Callable[[str, float, float], list] = analyze_window,
+) -> SegmentResult:
+    """
+    Analyze every window of a video and merge the results into timestamped Issues
+
+    Windows are skipped when their result is already known:
+    - the checkpoint for this sha256 has them (an interrupted earlier run)
+    - the chunk index has a result for the same media bytes (an earlier
+      version of the file, see backend/cdc.py)
+    The checkpoint is removed once every window is done.
+    """
+    windows = plan_segments(duration_sec, segment_seconds)
+    checkpoint = SegmentCheckpoint(sha256, segment_seconds) if sha256 else None
+    if checkpoint:
+        checkpoint.load()
+    done = dict(checkpoint.done) if checkpoint else {}
+    if done:
+        logger.info("🎞️ Resuming segment analysis: %s/%s windows from checkpoint", len(done), len(windows))
+
+    salt = f"{SEGMENT_ANALYZER_VERSION}:{analyzer.__module__}.{analyzer.__qualname__}"
+    fingerprints = window_fingerprints(path, windows, salt)
+    result_index = ChunkResultIndex() if fingerprints else None
+    try:
+        if result_index:
+            known = result_index.get_many([fingerprints[i] for i in range(len(windows)) if i not in done])
+            for i, (start, _) in enumerate(windows):
+                if i not in done and fingerprints[i] in known:
+                    done[i] = _shift_events(known[fingerprints[i]], start)
+            logger.info("🧩 Reusing %s window results from earlier versions", len(known))
+
+        reused = len(done)
+        pending = [i for i in range(len(windows)) if i not in done]
+        if progress:
+            progress(len(done), len(windows))
+
+        def record(index: int, events: list) -> None:
+            done[index] = events
+            if checkpoint:
+                checkpoint.save(index, events)
+            if result_index:
+                result_index.put(fingerprints[index], _shift_events(events, -windows[index][0]))
+            if progress:
+                progress(len(done), len(windows))
+
+        if pending:
+            pool = shared_pool()
+            if pool is None:
+                for i in pending:
+                    record(i, analyzer(path, *windows[i]))
+            else:
+                futures = {pool.submit(analyzer, path, *windows[i]): i for i in pending}
+                try:
+                    for future in as_completed(futures):
+                        record(futures[future], future.result())
+                except BaseException:
+                    for future in futures:
+                        future.cancel()
+                    raise
+            if result_index:
+                result_index.prune()
+    finally:
+        if result_index:
+            result_index.close()
+
+    events = [event for i in sorted(done) for event in done[i]]
+    if checkpoint:
+        checkpoint.remove()
+    return SegmentResult(
+        issues=events_to_issues(merge_events(events)),
+        windows=len(windows),
+        reused=reused,
+    )
+
+
+def _shift_events(events: list[dict], seconds: float) -> list[dict]:
+    """Index entries are stored relative to their window's start"""
+    return [{**event, "start": event["start"] + seconds, "end": event["end"] + seconds} for event in events]
+
+
+def merge_events(events: list[dict]) -> list[dict]:
+    """Join same-kind events that continue across a window boundary"""
+    merged: list[dict] = []
+    last_by_kind: dict[str, dict] = {}
+    for event in sorted(events, key=lambda e: (e["start"], e["kind"])):
+        previous = last_by_kind.get(event["kind"])
+        if previous is not None and event["start"] - previous["end"] <= MERGE_GAP_SECONDS:
+            previous["end"] = max(previous["end"], event["end"])
+            previous["detail"] = previous["detail"] or event["detail"]
+            continue
+        event = dict(event)
+        merged.append(event)
+        last_by_kind[event["kind"]] = event
+    return merged
+
+
+def events_to_issues(events: list[dict]) -> list[Issue]:
+    issues = []
+    for n, event in enumerate(events, 1):
+        severity, title, recommendation = EVENT_TYPES[event["kind"]]
+        span = f"{format_timestamp(event['start'])}-{format_timestamp(event['end'])}"
+        description = f"{title} from {span} ({event['end'] - event['start']:.1f}s)"
+        if event["detail"]:
+            description += f", {event['detail']}"
+        issues.append(Issue(
+            id=f"{event['kind']}-{n}",
+            severity=severity,
+            title=title,
+            description=description,
+            timestamp=format_timestamp(event["start"]),
+            recommendation=recommendation,
+        ))
+    return issues
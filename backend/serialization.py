@@ -0,0 +1,138 @@
+"""
+RESPONSE SERIALIZATION
+
+Reports are validated once, when the analyzer builds the ComplianceReport,
+and cached as plain dicts. Returning that dict from an endpoint with a
+response_model made FastAPI validate it again and walk it through
+jsonable_encoder before json.dumps - for a report with thousands of issues
+that was a noticeable share of the request.
+
+report_response() skips all that:
+
+- The dict is encoded straight to bytes, with orjson when it is installed
+  (the stdlib json module otherwise).
+- The body is compressed when the client accepts it and it is over
+  MIN_COMPRESS_BYTES: br if the brotli module is installed and preferred,
+  else gzip.
+- With Accept: application/x-ndjson (or ?stream=ndjson) the report is
+  streamed as NDJSON instead: a summary line, a metadata line, one line
+  per issue, then an end line with the issue count. Issues are encoded
+  STREAM_ISSUES_PER_CHUNK at a time, so the client has the summary before
+  the issue list is encoded and the encoded report is never held in memory
+  whole.
+
+The endpoints keep their response_model, so /docs still shows the schema.
+"""
+
+import gzip
+import json
+import zlib
+from typing import Iterator, Optional
+
+from starlette.requests import Request
+from starlette.responses import Response, StreamingResponse
+
+try:
+    import orjson
+except ImportError:         # optional - see module docstring
+    orjson = None
+
+try:
+    import brotli
+except ImportError:         # optional - see module docstring
+    brotli = None
+
+# ========================================
+# SETTINGS
+# ========================================
+NDJSON = "application/x-ndjson"
+MIN_COMPRESS_BYTES = 1024       # smaller bodies aren't worth the CPU (or the header)
+GZIP_LEVEL = 5
+BROTLI_QUALITY = 4              # ~gzip speed, smaller output
+STREAM_ISSUES_PER_CHUNK = 256
+
+
+def dumps(obj) -> bytes:
+    """Compact JSON bytes"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+# ========================================
+# CONTENT NEGOTIATION
+# ========================================
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """"br", "gzip" or None for an Accept-Encoding header (q-values honored)"""
+    offered = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        offered[name.strip()] = q
+    wildcard = offered.get("*", 0.0)
+    candidates = [("br", offered.get("br", wildcard)), ("gzip", offered.get("gzip", wildcard))]
+    if brotli is None:
+        candidates = candidates[1:]
+    # Ties go to br (listed first); max() keeps the first of equal keys
+    name, q = max(candidates, key=lambda c: c[1])
+    return name if q > 0 else None
+
+
+def wants_stream(request: Request) -> bool:
+    return NDJSON in request.headers.get("accept", "") or request.query_params.get("stream") == "ndjson"
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+# ========================================
+# RESPONSES
+# ========================================
+def report_response(report: dict, request: Request, status_code: int = 200) -> Response:
+    """A report (or any JSON-able dict) as an encoded, possibly compressed, response"""
+    encoding = choose_encoding(request.headers.get("accept-encoding", ""))
+    headers = {"Vary": "Accept-Encoding"}
+
+    if wants_stream(request) and "issues" in report:
+        chunks = ndjson_chunks(report)
+        if encoding:
+            chunks = _compress_stream(chunks, encoding)
+            headers["Content-Encoding"] = encoding
+        return StreamingResponse(chunks, status_code=status_code, media_type=NDJSON, headers=headers)
+
+    body = dumps(report)
+    if encoding and len(body) >= MIN_COMPRESS_BYTES:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def ndjson_chunks(report: dict) -> Iterator[bytes]:
+    """summary, metadata, one line per issue, end - in chunks of lines"""
+    issues = report["issues"]
+    yield dumps({"summary": report["summary"]}) + b"\n" + dumps({"metadata": report["metadata"]}) + b"\n"
+    for start in range(0, len(issues), STREAM_ISSUES_PER_CHUNK):
+        yield b"".join(dumps({"issue": issue}) + b"\n" for issue in issues[start:start + STREAM_ISSUES_PER_CHUNK])
+    yield dumps({"end": {"issuesCount": len(issues)}}) + b"\n"
+
+
+def _compress_stream(chunks: Iterator[bytes], encoding: str) -> Iterator[bytes]:
+    """Compress chunk by chunk, flushing after each so the client can decode what it has"""
+    if encoding == "br":
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+        return
+    compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)        # wbits 31: gzip framing
+    for chunk in chunks:
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
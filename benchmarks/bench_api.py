@@ -0,0 +1,589 @@
+"""
+BENCHMARK - API LOAD TEST
+
+Generates synthetic videos (MP4), PDFs, texts and URLs of configurable size
+and drives /run, /run/file and /run/url at a fixed concurrency. Reports
+throughput, p50/p95/p99 latency and the server's peak RSS per scenario, and
+saves everything as JSON so runs on different commits can be diffed.
+
+Peak RSS is the largest sum over the server process and all its descendants
+(the job and analysis pool workers) seen while the scenario runs, sampled
+with psutil (pip install psutil) or, without it, from /proc on Linux. With
+neither, in-process runs fall back to ru_maxrss of this process alone,
+which never goes down - each scenario's figure then includes the earlier
+ones. "rssScope" in the results says which of these was measured.
+
+Targets:
+    --target inprocess   the app in this process, over ASGI (default)
+    --target uvicorn     a uvicorn server started on a free local port
+    --target URL         an already running server, e.g. http://127.0.0.1:8000
+
+In-process and uvicorn runs use a fresh data directory, so the result cache
+starts empty. Payloads are unique per request unless --repeat-payloads is
+given (which measures the cached path instead).
+
+The URL scenarios fetch from a local stub server, never the real network:
+article pages and the YouTube oEmbed endpoint are served on 127.0.0.1
+after --stub-latency-ms, and the server under test is pointed at it with
+MEDIA_CHECKER_YOUTUBE_OEMBED_URL and MEDIA_CHECKER_FETCH_ALLOW_PRIVATE_HOSTS.
+A server given as --target URL must be started with those two variables
+for the stub to be reachable (the URL printed at startup).
+
+Run from the repo root:
+    python benchmarks/bench_api.py
+    python benchmarks/bench_api.py --target uvicorn --requests 500 --concurrency 32
+    python benchmarks/bench_api.py --scenarios run-text run-url --text-kb 256
+    python benchmarks/bench_api.py --output before.json
+    python benchmarks/bench_api.py --output after.json --compare before.json
+"""
+
+import argparse
+import asyncio
+import importlib.util
+import json
+import math
+import os
+import platform
+import random
+import socket
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+import httpx
+
+try:
+    import psutil
+except ImportError:         # optional - see module docstring
+    psutil = None
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_FILE = os.path.join(ROOT, "BACKEND-FINAL-FIX.py")
+
+_WORDS = (
+    "campaign claim product offer price health safe result customer brand "
+    "video audio music logo review market launch premium quality service "
+    "formula natural energy daily support trusted expert guide new limited"
+).split()
+_FLAGGED = ["guaranteed results", "risk free", "no side effects", "clinically proven"]
+
+
+# ========================================
+# SYNTHETIC PAYLOADS
+# ========================================
+def make_text(target_chars: int, rng: random.Random) -> str:
+    """Filler words with a flagged phrase roughly every 2000 characters"""
+    words = []
+    size = 0
+    while size < target_chars:
+        word = rng.choice(_FLAGGED) if rng.random() < 0.004 else rng.choice(_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def _box(kind: bytes, payload: bytes) -> bytes:
+    return struct.pack(">I", 8 + len(payload)) + kind + payload
+
+
+def _full_box(kind: bytes, payload: bytes) -> bytes:
+    return _box(kind, b"\0\0\0\0" + payload)
+
+
+def make_mp4(size_bytes: int, duration_sec: int, rng: random.Random) -> bytes:
+    """An MP4 the probe accepts: H.264 + AAC tracks, moov at the end, random mdat"""
+    def trak(handler: bytes, codec: bytes, width: int = 0, height: int = 0) -> bytes:
+        tkhd = _full_box(b"tkhd", b"\0" * 72 + struct.pack(">II", width << 16, height << 16))
+        hdlr = _full_box(b"hdlr", b"\0" * 4 + handler + b"\0" * 12 + b"bench\0")
+        stsd = _full_box(b"stsd", struct.pack(">I", 1) + _box(codec, b"\0" * 20))
+        return _box(b"trak", tkhd + _box(b"mdia", hdlr + _box(b"minf", _box(b"stbl", stsd))))
+
+    mvhd = _full_box(b"mvhd", struct.pack(">IIII", 0, 0, 1000, duration_sec * 1000) + b"\0" * 80)
+    moov = _box(b"moov", mvhd + trak(b"vide", b"avc1", 1280, 720) + trak(b"soun", b"mp4a"))
+    ftyp = _box(b"ftyp", b"isom\0\0\0\0isomavc1")
+    media_size = max(0, size_bytes - len(ftyp) - len(moov) - 8)
+    mdat = _box(b"mdat", rng.randbytes(media_size))
+    return ftyp + mdat + moov
+
+
+def make_pdf(pages: int, chars_per_page: int, rng: random.Random) -> bytes:
+    """A plain PDF 1.4 file with one Helvetica text stream per page"""
+    objects = {1: b"<< /Type /Catalog /Pages 2 0 R >>",
+               3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"}
+    kids = []
+    number = 4
+    for _ in range(pages):
+        text = make_text(chars_per_page, rng).replace("(", "").replace(")", "")
+        stream = f"BT /F1 10 Tf 72 720 Td ({text}) Tj ET".encode()
+        objects[number] = b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        objects[number + 1] = (f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {number} 0 R"
+                               f" /Resources << /Font << /F1 3 0 R >> >> >>").encode()
+        kids.append(f"{number + 1} 0 R")
+        number += 2
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for index in sorted(objects):
+        offsets[index] = len(out)
+        out += b"%d 0 obj\n" % index + objects[index] + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for index in sorted(objects):
+        out += b"%010d 00000 n \n" % offsets[index]
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def make_url(rng: random.Random, stub_url: str) -> str:
+    video_id = "".join(rng.choice("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-")
+                       for _ in range(11))
+    if rng.random() < 0.5:
+        return f"https://www.youtube.com/watch?v={video_id}"        # fetched via the stub's /oembed
+    return f"{stub_url}/news/{rng.choice(_WORDS)}/{video_id}"
+
+
+# ========================================
+# FETCH STUB
+# ========================================
+class _StubHandler(BaseHTTPRequestHandler):
+    """Article pages and oEmbed JSON, each made up from the path so every URL has its own text"""
+    latency = 0.0
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        rng = random.Random(self.path)
+        if self.path.startswith("/oembed"):
+            body = json.dumps({"title": make_text(60, rng), "author_name": "Bench channel"}).encode()
+            content_type = "application/json"
+        elif self.path.startswith("/news/"):
+            body = (f"<html><head><title>{make_text(60, rng)}</title></head>"
+                    f"<body><p>{make_text(4000, rng)}</p></body></html>").encode()
+            content_type = "text/html; charset=utf-8"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def start_stub(latency_ms: float) -> ThreadingHTTPServer:
+    handler = type("StubHandler", (_StubHandler,), {"latency": latency_ms / 1000})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# ========================================
+# SCENARIOS
+# ========================================
+@dataclass
+class Request:
+    method: str
+    path: str
+    kwargs: dict
+    size: int           # payload bytes sent
+
+
+@dataclass
+class Scenario:
+    name: str
+    make: Callable[[random.Random], Request]
+
+
+def build_scenarios(args, stub_url: str) -> dict[str, Scenario]:
+    video_bytes = int(args.video_mb * 1024 * 1024)
+
+    def video_file(path: str) -> Callable[[random.Random], Request]:
+        def make(rng: random.Random) -> Request:
+            data = make_mp4(video_bytes, args.video_seconds, rng)
+            return Request("POST", path, {"files": {"file": ("bench.mp4", data, "video/mp4")}}, len(data))
+        return make
+
+    def pdf_file(rng: random.Random) -> Request:
+        data = make_pdf(args.pdf_pages, 1500, rng)
+        return Request("POST", "/run", {"files": {"file": ("bench.pdf", data, "application/pdf")}}, len(data))
+
+    def text(rng: random.Random) -> Request:
+        body = make_text(int(args.text_kb * 1024), rng)
+        return Request("POST", "/run", {"json": {"text": body}}, len(body))
+
+    def url_json(rng: random.Random) -> Request:
+        url = make_url(rng, stub_url)
+        return Request("POST", "/run", {"json": {"url": url}}, len(url))
+
+    def url_query(rng: random.Random) -> Request:
+        url = make_url(rng, stub_url)
+        return Request("POST", "/run/url", {"params": {"url": url}}, len(url))
+
+    return {scenario.name: scenario for scenario in [
+        Scenario("run-video", video_file("/run")),
+        Scenario("run-pdf", pdf_file),
+        Scenario("run-text", text),
+        Scenario("run-url", url_json),
+        Scenario("run-file-video", video_file("/run/file")),
+        Scenario("run-url-query", url_query),
+    ]}
+
+
+# ========================================
+# TARGETS
+# ========================================
+def load_app():
+    spec = importlib.util.spec_from_file_location("bench_main", APP_FILE)
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, ROOT)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(port: int, env: dict) -> subprocess.Popen:
+    code = (
+        "import importlib.util, sys, uvicorn;"
+        f"sys.path.insert(0, {ROOT!r});"
+        f"spec = importlib.util.spec_from_file_location('main', {APP_FILE!r});"
+        "m = importlib.util.module_from_spec(spec); spec.loader.exec_module(m);"
+        f"uvicorn.run(m.app, host='127.0.0.1', port={port}, log_level='warning', log_config=None)"
+    )
+    return subprocess.Popen([sys.executable, "-c", code], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_until_up(base_url: str, timeout: float = 30) -> None:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{base_url}/health", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not come up within {timeout}s")
+
+
+RSS_SAMPLE_SECONDS = 0.25
+
+
+def _proc_tree_rss(pid: int) -> Optional[int]:
+    """RSS of pid and its descendants from /proc (Linux without psutil)"""
+    children: dict[int, list[int]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # The command name may hold spaces or parentheses; ppid follows the last ")"
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    total, found, pending = 0, False, [pid]
+    while pending:
+        current = pending.pop()
+        try:
+            with open(f"/proc/{current}/statm") as f:
+                total += int(f.read().split()[1]) * page_size
+            found = True
+        except (OSError, IndexError, ValueError):
+            pass
+        pending.extend(children.get(current, []))
+    return total if found else None
+
+
+def tree_rss_bytes(pid: int) -> Optional[int]:
+    """Current RSS of pid plus all its descendants, None if it can't be measured here"""
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root, *root.children(recursive=True)]
+        except psutil.Error:
+            return None
+        total = 0
+        for process in processes:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:        # exited between listing and reading
+                pass
+        return total
+    if os.path.isdir("/proc"):
+        return _proc_tree_rss(pid)
+    return None
+
+
+def cumulative_peak_rss_bytes() -> Optional[int]:
+    """ru_maxrss of this process - the peak since it started, not since the scenario did"""
+    try:
+        import resource             # not available on Windows
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Samples the server's process-tree RSS in the background and keeps the peak"""
+
+    def __init__(self, pid: Optional[int]):
+        self.pid = pid if pid is not None else os.getpid()
+        self.in_process = pid is None
+        self.peak: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self) -> "RssSampler":
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._sample()
+
+    async def _run(self) -> None:
+        while True:
+            self._sample()
+            await asyncio.sleep(RSS_SAMPLE_SECONDS)
+
+    def _sample(self) -> None:
+        rss = tree_rss_bytes(self.pid)
+        if rss is not None:
+            self.peak = max(self.peak or 0, rss)
+
+    def result(self) -> dict:
+        if self.peak is not None:
+            return {"peakRssMb": round(self.peak / (1024 * 1024), 1), "rssScope": "process tree"}
+        if self.in_process:
+            peak = cumulative_peak_rss_bytes()
+            if peak is not None:
+                return {"peakRssMb": round(peak / (1024 * 1024), 1),
+                        "rssScope": "this process, cumulative since start"}
+        return {"peakRssMb": None, "rssScope": None}
+
+
+# ========================================
+# DRIVER
+# ========================================
+def percentile(sorted_values: list[float], p: float) -> float:
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(p / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def run_scenario(client: httpx.AsyncClient, scenario: Scenario, args, seed: int) -> dict:
+    rng = random.Random(seed)
+    # Payloads are built up front so generation isn't timed
+    count = 1 if args.repeat_payloads else args.requests
+    requests = [scenario.make(rng) for _ in range(count)]
+    for request in requests[:args.warmup]:
+        await client.request(request.method, request.path, **request.kwargs)
+
+    latencies: list[float] = []
+    statuses: dict[str, int] = {}
+    next_index = 0
+
+    async def worker() -> None:
+        nonlocal next_index
+        while next_index < args.requests:
+            request = requests[next_index % len(requests)]
+            next_index += 1
+            started = time.perf_counter()
+            try:
+                response = await client.request(request.method, request.path, **request.kwargs)
+                status = str(response.status_code)
+            except httpx.HTTPError as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(n for status, n in statuses.items() if not status.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "seconds": round(elapsed, 3),
+        "throughputRps": round(len(latencies) / elapsed, 2) if elapsed else 0,
+        "payloadBytes": sum(r.size for r in requests) // len(requests),
+        "latencyMs": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0,
+            "max": round(latencies[-1] * 1000, 2) if latencies else 0,
+        },
+    }
+
+
+async def run_all(args, scenarios: list[Scenario], base_url: Optional[str], server_pid: Optional[int]) -> dict:
+    timeout = httpx.Timeout(args.timeout)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    results = {}
+
+    async def drive(client: httpx.AsyncClient) -> None:
+        for index, scenario in enumerate(scenarios):
+            print(f"▶ {scenario.name}: {args.requests} requests at concurrency {args.concurrency}", flush=True)
+            if server_pid == -1:        # remote - RSS unknown
+                results[scenario.name] = await run_scenario(client, scenario, args, args.seed + index)
+                results[scenario.name].update(peakRssMb=None, rssScope=None)
+                continue
+            async with RssSampler(server_pid) as sampler:
+                results[scenario.name] = await run_scenario(client, scenario, args, args.seed + index)
+            results[scenario.name].update(sampler.result())
+
+    if base_url is None:
+        app = load_app()
+        transport = httpx.ASGITransport(app=app)
+        async with app.router.lifespan_context(app):
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=timeout) as client:
+                await drive(client)
+    else:
+        async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+            await drive(client)
+    return results
+
+
+# ========================================
+# REPORT
+# ========================================
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_table(results: dict, baseline: Optional[dict]) -> None:
+    print(f"\n{'scenario':<16} | {'req/s':>8} | {'p50 ms':>8} | {'p95 ms':>8} | {'p99 ms':>8} | "
+          f"{'errors':>6} | {'RSS MB':>7}")
+    for name, result in results.items():
+        latency = result["latencyMs"]
+        line = (f"{name:<16} | {result['throughputRps']:>8.1f} | {latency['p50']:>8.1f} | "
+                f"{latency['p95']:>8.1f} | {latency['p99']:>8.1f} | {result['errors']:>6} | "
+                f"{result['peakRssMb'] or 0:>7.1f}")
+        before = (baseline or {}).get(name)
+        if before:
+            def change(new: float, old: float) -> str:
+                return f"{(new - old) / old * 100:+.0f}%" if old else "n/a"
+            line += (f"   vs baseline: req/s {change(result['throughputRps'], before['throughputRps'])},"
+                     f" p95 {change(latency['p95'], before['latencyMs']['p95'])}")
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="inprocess", help="inprocess, uvicorn or a base URL")
+    parser.add_argument("--scenarios", nargs="+", help="default: all")
+    parser.add_argument("--requests", type=int, default=100, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2, help="untimed requests per scenario")
+    parser.add_argument("--video-mb", type=float, default=4)
+    parser.add_argument("--video-seconds", type=int, default=60)
+    parser.add_argument("--pdf-pages", type=int, default=20)
+    parser.add_argument("--text-kb", type=float, default=16)
+    parser.add_argument("--stub-latency-ms", type=float, default=20, help="delay of the local fetch stub")
+    parser.add_argument("--repeat-payloads", action="store_true", help="send one payload repeatedly (cache hits)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="write results JSON here")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    args = parser.parse_args()
+
+    stub = start_stub(args.stub_latency_ms)
+    stub_url = f"http://127.0.0.1:{stub.server_address[1]}"
+    available = build_scenarios(args, stub_url)
+    names = args.scenarios or list(available)
+    unknown = [name for name in names if name not in available]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)} (choose from {', '.join(available)})")
+
+    server = None
+    server_pid = None
+    base_url = None
+    data_dir = tempfile.TemporaryDirectory(prefix="bench-data-")
+    env = {
+        **os.environ,
+        "MEDIA_CHECKER_DATA_DIR": data_dir.name,
+        "MEDIA_CHECKER_LOG_LEVEL": "WARNING",
+        "MEDIA_CHECKER_YOUTUBE_OEMBED_URL": f"{stub_url}/oembed",
+        "MEDIA_CHECKER_FETCH_ALLOW_PRIVATE_HOSTS": "127.0.0.1",
+    }
+    try:
+        if args.target == "inprocess":
+            os.environ.update(env)          # before the app (and backend.config) is imported
+        elif args.target == "uvicorn":
+            port = _free_port()
+            server = start_uvicorn(port, env)
+            server_pid = server.pid
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_up(base_url)
+        else:
+            base_url = args.target.rstrip("/")
+            server_pid = -1                 # remote - RSS unknown
+            print(f"🔌 Fetch stub at {stub_url} (see the module docstring)", flush=True)
+            wait_until_up(base_url)
+
+        results = asyncio.run(run_all(args, [available[name] for name in names], base_url, server_pid))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        data_dir.cleanup()
+        stub.shutdown()
+
+    report = {
+        "commit": git_commit(),
+        "createdAt": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpuCount": os.cpu_count(),
+        },
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+        "scenarios": results,
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f).get("scenarios")
+    print_table(results, baseline)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"\n💾 Results saved to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
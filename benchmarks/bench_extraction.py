@@ -0,0 +1,138 @@
+"""
+BENCHMARK - ISSUE EXTRACTION
+
+Compares backend/extraction.py with a straight Python port of the old
+frontend logic (three global regexes + a keyword scan per match) on
+synthetic multi-megabyte LLM responses.
+
+Run from the repo root:
+    python benchmarks/bench_extraction.py
+    python benchmarks/bench_extraction.py --sizes 1 4 16 --repeat 5
+"""
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.extraction import extract_issues  # noqa: E402
+
+# ========================================
+# SYNTHETIC LLM OUTPUT
+# ========================================
+_FILLER = [
+    "The content was reviewed against the brand and regulatory guidelines.",
+    "Overall the material is consistent with the campaign brief.",
+    "Audio levels and captions were checked for the full duration.",
+    "No personal data appears in the visible frames.",
+]
+_ISSUE_LINES = [
+    "ISSUE: Missing disclaimer - The promotional claim needs a legal disclaimer. Recommendation: add the standard disclaimer",
+    "Warning: Logo placement - The logo overlaps the safe area. Fix: move the logo inside the title-safe region",
+    "- High: Unverified health claim is a potential violation of advertising rules",
+    "- Low: Background music volume is slightly uneven",
+    "Problem: Prohibited term used in voice-over - Should: replace the term",
+]
+
+
+def make_llm_response(target_bytes: int, seed: int = 42) -> str:
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    n = 1
+    while size < target_bytes:
+        roll = rng.random()
+        if roll < 0.5:
+            line = rng.choice(_FILLER)
+        elif roll < 0.8:
+            # Mostly distinct issues, with some verbatim repeats
+            line = rng.choice(_ISSUE_LINES)
+            if rng.random() < 0.9:
+                line = line.replace(" - ", f" in scene {rng.randint(1, 10**6)} - ", 1)
+        else:
+            line = f"{n}. {rng.choice(_ISSUE_LINES)}"
+            n += 1
+        lines.append(line)
+        size += len(line) + 1
+    return "\n".join(lines)
+
+
+# ========================================
+# BASELINE - PORT OF responseMapper.ts
+# ========================================
+_OLD_PATTERNS = [
+    re.compile(r"(?:ISSUE|Problem|Warning|Error):\s*([^\n-]+)(?:\s*-\s*([^\n]+))?", re.I),
+    re.compile(r"[-•]\s*(?:(Critical|High|Medium|Low)):\s*([^\n]+)", re.I),
+    re.compile(r"\d+\.\s*([^\n]+)"),
+]
+_OLD_RECOMMENDATION = [
+    re.compile(r"(?:Recommendation|Suggest|Should|Must|Need to):\s*([^\n]+)", re.I),
+    re.compile(r"(?:Fix|Resolve|Address):\s*([^\n]+)", re.I),
+]
+
+
+def _old_severity(text: str) -> str:
+    lower = text.lower()
+    if any(w in lower for w in ("critical", "severe", "violation", "illegal", "prohibited")):
+        return "high"
+    if any(w in lower for w in ("warning", "concern", "issue", "problem")):
+        return "medium"
+    return "low"
+
+
+def _old_recommendation(text: str):
+    for pattern in _OLD_RECOMMENDATION:
+        m = pattern.search(text)
+        if m:
+            return m.group(1).strip()
+    return None
+
+
+def old_extract_issues(text: str) -> list[dict]:
+    issues = []
+    for pattern in _OLD_PATTERNS:
+        for m in pattern.finditer(text):
+            issues.append({
+                "severity": _old_severity(m.group(0)),
+                "title": (m.group(1) or "").strip()[:100],
+                "recommendation": _old_recommendation(m.group(0)),
+            })
+    return issues
+
+
+# ========================================
+# RUNNER
+# ========================================
+def _time(fn, text: str, repeat: int) -> tuple[float, int]:
+    best = float("inf")
+    count = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        count = len(fn(text))
+        best = min(best, time.perf_counter() - start)
+    return best, count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4, 8], help="response sizes in MB")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per size (best is reported)")
+    args = parser.parse_args()
+
+    print(f"{'size':>8} | {'old (s)':>8} {'issues':>8} | {'new (s)':>8} {'issues':>8} | {'new MB/s':>8}")
+    for size_mb in args.sizes:
+        text = make_llm_response(int(size_mb * 1024 * 1024))
+        old_time, old_count = _time(old_extract_issues, text, args.repeat)
+        new_time, new_count = _time(extract_issues, text, args.repeat)
+        print(
+            f"{size_mb:>6.1f}MB | {old_time:>8.3f} {old_count:>8} | "
+            f"{new_time:>8.3f} {new_count:>8} | {size_mb / new_time:>8.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+BENCHMARK - TEXT SCANNER THROUGHPUT VS RULE COUNT
+
+Builds rule sets of increasing size from random phrases and scans the same
+synthetic text with each. Throughput should stay roughly flat as the rule
+count grows.
+
+Run from the repo root:
+    python benchmarks/bench_scanner.py
+    python benchmarks/bench_scanner.py --mb 8 --rules 10 1000 20000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.scanner import Rule, RuleSet  # noqa: E402
+
+_WORDS = (
+    "campaign claim product offer price health safe result customer brand "
+    "video audio music logo review market launch premium quality service "
+    "formula natural energy daily support trusted expert guide new limited"
+).split()
+
+
+def make_text(target_chars: int, seed: int = 7) -> str:
+    rng = random.Random(seed)
+    words = []
+    size = 0
+    while size < target_chars:
+        word = rng.choice(_WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return " ".join(words)
+
+
+def make_rules(count: int, seed: int = 11) -> list[Rule]:
+    """
+    The first 20 rules are phrases that do occur in the text; the rest share
+    a first word with it but never match in full. Hit count stays the same
+    across sizes, so the timing measures the scan rather than the output.
+    """
+    rng = random.Random(seed)
+    rules = []
+    for i in range(count):
+        rare = "".join(rng.choice("abcdefghijklmnopqrstuvwxyz") for _ in range(6))
+        phrase = f"{rng.choice(_WORDS)} {rare}" if i >= 20 else f"{rng.choice(_WORDS)} {rng.choice(_WORDS)}"
+        rules.append(Rule(
+            id=f"rule-{i}",
+            phrases=(phrase,),
+            severity=rng.choice(["low", "medium", "high"]),
+            title=f"Rule {i}",
+            recommendation="Review",
+        ))
+    return rules
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=4, help="text size in MB")
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    args = parser.parse_args()
+
+    text = make_text(int(args.mb * 1024 * 1024))
+    print(f"{'rules':>8} | {'compile (s)':>11} | {'scan (s)':>8} | {'hits':>8} | {'MB/s':>6}")
+    for count in args.rules:
+        start = time.perf_counter()
+        ruleset = RuleSet(make_rules(count))
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        hits = sum(1 for _ in ruleset.scan_stream(
+            text[i:i + 64 * 1024] for i in range(0, len(text), 64 * 1024)
+        ))
+        scan_time = time.perf_counter() - start
+        print(f"{count:>8} | {compile_time:>11.3f} | {scan_time:>8.3f} | {hits:>8} | {args.mb / scan_time:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,7 @@
 // Local store: Chatbot UI component for interactive conversation after directory submission
 import { useState, useEffect, useRef } from 'react';
 import { ChatMessage, ChatbotState } from '../types';
-import { sendChatMessage } from '../services/api';
+import { streamChatMessage } from '../services/api';
 
 interface ChatbotUIProps {
   sessionId: string | null;
@@ -69,22 +69,28 @@ export const ChatbotUI = ({ sessionId, initialMessage, onNewSession }: ChatbotUI
     setInputMessage('');
 
     try {
-      // Local store: Send message to backend REST API
-      const response = await sendChatMessage(userMessage.content, chatState.sessionId || undefined);
-
-      // Local store: Add assistant response to chat
-      const assistantMessage: ChatMessage = {
-        id: `msg_${Date.now()}_assistant`,
-        role: 'assistant',
-        content: response.message,
-        timestamp: response.timestamp,
+      // Local store: Stream the assistant reply into the chat as it arrives
+      const assistantId = `msg_${Date.now()}_assistant`;
+      const showReply = (content: string, timestamp: string) => {
+        setChatState((prev) => {
+          const assistantMessage: ChatMessage = { id: assistantId, role: 'assistant', content, timestamp };
+          const exists = prev.messages.some((m) => m.id === assistantId);
+          return {
+            ...prev,
+            messages: exists
+              ? prev.messages.map((m) => (m.id === assistantId ? assistantMessage : m))
+              : [...prev.messages, assistantMessage],
+            isLoading: false,
+          };
+        });
       };
 
-      setChatState((prev) => ({
-        ...prev,
-        messages: [...prev.messages, assistantMessage],
-        isLoading: false,
-      }));
+      const response = await streamChatMessage(
+        userMessage.content,
+        chatState.sessionId || undefined,
+        (replySoFar) => showReply(replySoFar, new Date().toISOString())
+      );
+      showReply(response.message, response.timestamp);
     } catch (error) {
       // Local store: Handle API error
       const errorMessage = error instanceof Error ? error.message : 'Failed to send message';
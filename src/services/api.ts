@@ -1,5 +1,5 @@
 import axios from 'axios';
-import { ComplianceReport, TextCheckPayload, DirectorySubmissionResponse, ChatMessageResponse } from '../types';
+import { ComplianceReport, TextCheckPayload, DirectorySubmissionResponse, ChatMessageResponse, CheckJob, Issue, BatchCheckResult, DirectoryIndexStatus, CheckHistoryPage, CheckHistoryFilters, AgentStatusSnapshot } from '../types';
 import { BackendResponse, transformResponse } from '../utils/responseMapper';
 
 /**
@@ -69,6 +69,13 @@ apiClient.interceptors.response.use(
       return Promise.reject(new Error('Unable to connect to server. Check if backend is running.'));
     }
     
+    // Server is at capacity - it says when to try again
+    if (error.response?.status === 429) {
+      const retryAfter = error.response.headers['retry-after'];
+      console.warn('🚦 Server busy, retry after', retryAfter, 'seconds');
+      return Promise.reject(new Error(`Server is busy. Try again in ${retryAfter || 'a few'} seconds.`));
+    }
+
     // Log detailed error information
     if (error.response) {
       console.error('📛 Server Error:', error.response.status, error.response.data);
@@ -138,6 +145,15 @@ export const submitLocalDirectory = async (
   }
 };
 
+/**
+ * Indexing progress for a submitted directory
+ * Each file in `queued` is an ordinary job - follow it with getCheckJob / subscribeToCheckJob
+ */
+export const getDirectoryStatus = async (sessionId: string): Promise<DirectoryIndexStatus> => {
+  const response = await apiClient.get<DirectoryIndexStatus>(`/directories/${sessionId}`);
+  return response.data;
+};
+
 /**
  * Local store: Send chat message to backend and receive AI response
  * Used for chatbot conversation after directory submission
@@ -204,6 +220,268 @@ export const sendChatMessage = async (
   }
 };
 
+/**
+ * Send a chat message and receive the reply token by token (SSE over fetch)
+ * onToken fires with the reply so far each time a token arrives
+ * Falls back to sendChatMessage in mock mode
+ */
+export const streamChatMessage = async (
+  message: string,
+  sessionId: string | undefined,
+  onToken: (replySoFar: string) => void
+): Promise<ChatMessageResponse> => {
+  if (USE_MOCK_RESPONSES) {
+    const response = await sendChatMessage(message, sessionId);
+    onToken(response.message);
+    return response;
+  }
+
+  // EventSource can't POST, so parse the event stream from fetch
+  const response = await fetch(`${apiClient.defaults.baseURL}chat`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json', Accept: 'text/event-stream' },
+    body: JSON.stringify({ message, sessionId: sessionId || null }),
+  });
+  if (!response.ok || !response.body) {
+    throw new Error('Failed to send message. Please try again.');
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let reply = '';
+  let result: ChatMessageResponse | null = null;
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const events = buffer.split('\n\n');
+    buffer = events.pop() ?? '';
+    for (const raw of events) {
+      const event = raw.match(/^event: (.*)$/m)?.[1];
+      const data = raw.match(/^data: (.*)$/m)?.[1];
+      if (!event || !data) continue;
+      const payload = JSON.parse(data);
+      if (event === 'token') {
+        reply += payload.text;
+        onToken(reply);
+      } else if (event === 'done') {
+        result = { success: true, message: payload.message, timestamp: payload.timestamp };
+      }
+    }
+  }
+
+  return result ?? { success: true, message: reply.trim(), timestamp: new Date().toISOString() };
+};
+
+// ========== BATCH CHECKS ==========
+
+/**
+ * Check many files, URLs and texts in one request
+ * onResult fires for each item as the backend finishes it (completion order;
+ * use result.index to match it to the input)
+ *
+ * @returns Number of items that failed
+ */
+export const runBatchCheck = async (
+  items: Array<File | TextCheckPayload>,
+  onResult: (result: BatchCheckResult) => void
+): Promise<number> => {
+  const formData = new FormData();
+  items.forEach((item) => {
+    if (item instanceof File) {
+      formData.append('files', item);
+    } else if (item.url) {
+      formData.append('urls', item.url);
+    } else if (item.text) {
+      formData.append('texts', item.text);
+    }
+  });
+
+  // axios buffers the whole response in the browser, so read the NDJSON stream with fetch
+  const response = await fetch(`${apiClient.defaults.baseURL}run/batch`, {
+    method: 'POST',
+    body: formData,
+  });
+  if (!response.ok || !response.body) {
+    throw new Error(`Batch check failed (${response.status})`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  let failed = 0;
+
+  const handleLine = (line: string) => {
+    if (!line.trim()) return;
+    const data = JSON.parse(line);
+    if (data.done) {
+      failed = data.failed;
+    } else {
+      onResult(data as BatchCheckResult);
+    }
+  };
+
+  for (;;) {
+    const { done, value } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split('\n');
+    buffer = lines.pop() ?? '';
+    lines.forEach(handleLine);
+  }
+  handleLine(buffer);
+  return failed;
+};
+
+// ========== CHECK HISTORY ==========
+
+const historyParams = (filters: CheckHistoryFilters): Record<string, string> => {
+  const params: Record<string, string> = {};
+  Object.entries(filters).forEach(([key, value]) => {
+    if (value === undefined || value === '' || (Array.isArray(value) && value.length === 0)) return;
+    params[key] = Array.isArray(value) ? value.join(',') : String(value);
+  });
+  return params;
+};
+
+/**
+ * One page of past checks, filtered and searched on the server
+ * Pass the previous page's nextCursor to get the next page (null = last page)
+ */
+export const getCheckHistory = async (
+  filters: CheckHistoryFilters = {},
+  cursor?: string | null,
+  limit = 50
+): Promise<CheckHistoryPage> => {
+  const params = { ...historyParams(filters), limit: String(limit), ...(cursor ? { cursor } : {}) };
+  const response = await apiClient.get<CheckHistoryPage>('/history', { params });
+  return response.data;
+};
+
+/**
+ * Full report of one past check
+ */
+export const getHistoryReport = async (id: number): Promise<ComplianceReport> => {
+  const response = await apiClient.get<ComplianceReport>(`/history/${id}`);
+  return response.data;
+};
+
+export const deleteHistoryItem = async (id: number): Promise<void> => {
+  await apiClient.delete(`/history/${id}`);
+};
+
+/**
+ * Download URL for the streamed export - use it as a link href so the
+ * browser saves it straight to disk instead of buffering it in memory
+ */
+export const getHistoryExportUrl = (
+  filters: CheckHistoryFilters = {},
+  format: 'ndjson' | 'csv' = 'csv'
+): string => {
+  const query = new URLSearchParams({ ...historyParams(filters), format });
+  return `${apiClient.defaults.baseURL}history/export?${query.toString()}`;
+};
+
+// ========== ASYNC CHECK JOBS ==========
+// Long checks run as background jobs instead of holding a request open for minutes
+
+/**
+ * Submit a file, URL or text for checking and get a job id back immediately
+ */
+export const createCheckJob = async (
+  input: File | TextCheckPayload
+): Promise<CheckJob> => {
+  let response;
+  if (input instanceof File) {
+    const formData = new FormData();
+    formData.append('file', input);
+    response = await apiClient.post('/jobs', formData, {
+      headers: { 'Content-Type': 'multipart/form-data' },
+    });
+  } else {
+    response = await apiClient.post('/jobs', input);
+  }
+  return getCheckJob(response.data.jobId);
+};
+
+/**
+ * Fetch a job's status (includes the report once it is done)
+ */
+export const getCheckJob = async (jobId: string): Promise<CheckJob> => {
+  const response = await apiClient.get<CheckJob>(`/jobs/${jobId}`);
+  return response.data;
+};
+
+/**
+ * Subscribe to a job's stage progress via Server-Sent Events
+ * The browser reconnects on its own and resumes from the last event it saw
+ *
+ * @returns Function that closes the stream
+ */
+export const subscribeToCheckJob = (
+  jobId: string,
+  onUpdate: (job: Partial<CheckJob>) => void
+): (() => void) => {
+  const source = new EventSource(`${apiClient.defaults.baseURL}jobs/${jobId}/events`);
+
+  const partialIssues: Issue[] = [];
+
+  const handle = (event: MessageEvent) => {
+    const data = JSON.parse(event.data);
+    onUpdate({ jobId, ...data });
+    if (data.status === 'done' || data.status === 'failed') {
+      source.close();
+    }
+  };
+
+  // Issues found before the job finishes (e.g. page by page for documents)
+  const handleIssues = (event: MessageEvent) => {
+    const { issues, ...data } = JSON.parse(event.data);
+    partialIssues.push(...issues);
+    onUpdate({ jobId, ...data, partialIssues: [...partialIssues] });
+  };
+
+  source.addEventListener('progress', handle as EventListener);
+  source.addEventListener('issues', handleIssues as EventListener);
+  source.addEventListener('done', handle as EventListener);
+  source.addEventListener('failed', handle as EventListener);
+
+  return () => source.close();
+};
+
+// ========== AGENT DISCOVERY ==========
+// The backend probes the agents on a schedule; these read its latest snapshot
+
+/**
+ * Current status of every registered agent
+ */
+export const checkAgents = async (): Promise<AgentStatusSnapshot> => {
+  const response = await apiClient.post<AgentStatusSnapshot>('/check-agents', { symbol: 'Hello' });
+  return response.data;
+};
+
+/**
+ * Subscribe to agent status via Server-Sent Events
+ * Sends the current snapshot first, then a new one whenever an agent goes up or down
+ *
+ * @returns Function that closes the stream
+ */
+export const subscribeToAgentStatus = (
+  onUpdate: (snapshot: AgentStatusSnapshot) => void,
+  onError?: () => void
+): (() => void) => {
+  const source = new EventSource(`${apiClient.defaults.baseURL}check-agents/events`);
+  source.addEventListener('agents', ((event: MessageEvent) => {
+    onUpdate(JSON.parse(event.data));
+  }) as EventListener);
+  if (onError) {
+    source.onerror = onError;
+  }
+  return () => source.close();
+};
+
 // Local store: ========== LEGACY COMPLIANCE API (DEPRECATED) ==========
 // Local store: The following functions are deprecated and kept only for reference
 // Local store: They will be removed in future updates
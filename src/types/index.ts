@@ -9,6 +9,8 @@ export interface Issue {
   description: string;
   timestamp?: string;
   recommendation: string;
+  offsetStart?: number; // Character offsets into the checked text
+  offsetEnd?: number;
 }
 
 export interface ReportSummary {
@@ -23,6 +25,25 @@ export interface ReportMetadata {
   fileSize: number;
   durationSec?: number;
   checkedAt: string;
+  container?: string;
+  codecs?: string[];
+  width?: number;
+  height?: number;
+  streamCount?: number;
+  // Audio levels in dBFS (WAV files)
+  loudnessDb?: number;
+  peakDb?: number;
+  // Image metadata (EXIF / IPTC / XMP)
+  capturedAt?: string;
+  camera?: string;
+  software?: string;
+  creator?: string;
+  copyright?: string;
+  hasLocation?: boolean;
+  reusedFraction?: number;
+  // Earlier report reused for nearly the same text (URL, or "text")
+  duplicateOf?: string;
+  similarity?: number;
 }
 
 export interface ComplianceReport {
@@ -36,6 +57,51 @@ export interface TextCheckPayload {
   url?: string;
 }
 
+// Asynchronous check job (POST /jobs)
+export type CheckJobStatus = 'queued' | 'running' | 'done' | 'failed';
+
+export interface CheckJob {
+  jobId: string;
+  status: CheckJobStatus;
+  stage: string;
+  progress: number;
+  cached: boolean;
+  report?: ComplianceReport;
+  partialIssues?: Issue[];
+  error?: string;
+}
+
+// One NDJSON line from POST /run/batch
+export interface BatchCheckResult {
+  index: number;
+  id: string | null;
+  kind: 'file' | 'url' | 'text' | 'invalid';
+  status: 'ok' | 'error';
+  cached?: boolean;
+  report?: ComplianceReport;
+  statusCode?: number;
+  error?: string;
+}
+
+// One agent from POST /check-agents (probed by the backend in the background)
+export interface AgentStatus {
+  agentName: string;
+  status: 'Active' | 'Not Active';
+  url: string;
+  checkedAt: string | null;
+  lastSeenAt: string | null;
+  latencyMs: number | null;
+  errorCount: number;
+  consecutiveErrors: number;
+  lastError: string | null;
+}
+
+export interface AgentStatusSnapshot {
+  agents: AgentStatus[];
+  version: number;
+  checkedAt: string | null;
+}
+
 export interface UploadProgress {
   loaded: number;
   total: number;
@@ -90,6 +156,57 @@ export interface DirectorySubmissionResponse {
   directoryPath: string;
 }
 
+// Backend: GET /directories/{sessionId}
+export interface DirectoryIndexStatus {
+  sessionId: string;
+  directoryPath: string;
+  status: 'scanning' | 'hashing' | 'done' | 'failed';
+  filesFound: number;
+  filesUnchanged: number;
+  filesHashed: number;
+  filesToHash: number;
+  filesRemoved: number;
+  filesFailed: number;
+  queued: Array<{ path: string; sha256: string; jobId: string }>;
+  createdAt: number;
+  updatedAt: number;
+  error?: string;
+}
+
+// Backend: one row of GET /history
+export interface CheckHistoryItem {
+  id: number;
+  checkedAt: string;
+  kind: 'file' | 'url' | 'text';
+  fileName: string;
+  fileSize: number;
+  durationSec: number | null;
+  status: 'pass' | 'partial_fail' | 'fail';
+  score: number;
+  issuesCount: number;
+  highSeverity: number;
+  mediumSeverity: number;
+  lowSeverity: number;
+}
+
+export interface CheckHistoryPage {
+  items: CheckHistoryItem[];
+  nextCursor: string | null;
+  limit: number;
+}
+
+// Server-side filters for /history and /history/export
+export interface CheckHistoryFilters {
+  status?: Array<CheckHistoryItem['status']>;
+  severity?: 'low' | 'medium' | 'high';
+  kind?: Array<CheckHistoryItem['kind']>;
+  fileName?: string;
+  q?: string;
+  since?: string;
+  until?: string;
+  order?: 'asc' | 'desc';
+}
+
 // Local store: Backend response for chat messages
 export interface ChatMessageResponse {
   success: boolean;
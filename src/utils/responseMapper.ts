@@ -15,6 +15,9 @@ export interface BackendResponse {
 /**
  * Extract issues from LLM response text
  * Parses the text to find issues, severity levels, and recommendations
+ *
+ * Fallback only: the backend's extraction engine (POST /extract) builds
+ * de-duplicated issues server-side, and transformResponse uses those when present.
  */
 const extractIssuesFromText = (text: string): Issue[] => {
   const issues: Issue[] = [];
@@ -245,15 +248,35 @@ export const transformStructuredResponse = (
   return transformBackendResponse(backendResponse, fileName, fileSize, durationSec);
 };
 
+/**
+ * Check whether the backend already sent a finished ComplianceReport
+ * (e.g. from POST /extract), so no client-side parsing is needed
+ */
+const isComplianceReport = (data: unknown): data is ComplianceReport => {
+  const candidate = data as ComplianceReport | null;
+  return (
+    !!candidate &&
+    typeof candidate === 'object' &&
+    !!candidate.summary &&
+    Array.isArray(candidate.issues) &&
+    !!candidate.metadata
+  );
+};
+
 /**
  * Smart transformer that tries structured format first, then falls back to text parsing
  */
 export const transformResponse = (
-  backendResponse: BackendResponse,
+  backendResponse: BackendResponse | ComplianceReport,
   fileName: string,
   fileSize: number,
   durationSec?: number
 ): ComplianceReport => {
+  // Backend extraction engine already produced the report
+  if (isComplianceReport(backendResponse)) {
+    return backendResponse;
+  }
+
   // Try structured format first
   if (backendResponse.tool_output && typeof backendResponse.tool_output === 'object') {
     try {
@@ -1,69 +1,38 @@
 // Local store: Agent Discovery Page - Check and display agent status
-import { useState } from 'react';
-
-// Local store: Agent status type definition
-interface Agent {
-  agentName: string;
-  status: 'Active' | 'Not Active';
-}
-
-// Local store: API response type (prepared for backend integration)
-// eslint-disable-next-line @typescript-eslint/no-unused-vars
-interface AgentCheckResponse {
-  agents: Agent[];
-}
+import { useEffect, useState } from 'react';
+import { AgentStatus } from '../types';
+import { checkAgents, subscribeToAgentStatus } from '../services/api';
 
 const AgentDiscovery = () => {
   // Local store: State for agents list
-  const [agents, setAgents] = useState<Agent[]>([]);
+  const [agents, setAgents] = useState<AgentStatus[]>([]);
   const [isChecking, setIsChecking] = useState(false);
   const [error, setError] = useState<string | null>(null);
   const [hasChecked, setHasChecked] = useState(false);
+  const [isLive, setIsLive] = useState(false);
 
-  // Local store: Check agents function - calls REST API
+  // Live updates: the backend pushes a new snapshot whenever an agent goes up or down
+  useEffect(() => {
+    return subscribeToAgentStatus(
+      (snapshot) => {
+        setAgents(snapshot.agents);
+        setHasChecked(true);
+        setIsLive(true);
+        setError(null);
+      },
+      () => setIsLive(false)
+    );
+  }, []);
+
+  // Local store: Check agents function - reads the backend's latest snapshot
   const handleCheckAgents = async () => {
     setIsChecking(true);
     setError(null);
 
     try {
-      // Local store: MOCK API RESPONSE - Replace with real API call
-      // TODO: When backend is ready, uncomment the real API call below
-      
-      /* 
-      // Local store: REAL API CALL (uncomment when backend is ready)
-      const response = await fetch('http://localhost:8000/check-agents', {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          symbol: 'Hello'
-        }),
-      });
-
-      if (!response.ok) {
-        throw new Error('Failed to check agents');
-      }
-
-      const data: AgentCheckResponse = await response.json();
-      setAgents(data);
-      */
-
-      // Local store: MOCK RESPONSE - Simulating API delay
-      console.log('🔧 MOCK MODE: Checking agents with payload:', { symbol: 'Hello' });
-      
-      await new Promise(resolve => setTimeout(resolve, 1200));
-
-      // Local store: Mock agent data
-      const mockAgents: Agent[] = [
-        { agentName: 'Chat_agent', status: 'Active' },
-        { agentName: 'Media_agent', status: 'Not Active' },
-      ];
-
-      console.log('✅ MOCK RESPONSE:', mockAgents);
-      setAgents(mockAgents);
+      const snapshot = await checkAgents();
+      setAgents(snapshot.agents);
       setHasChecked(true);
-
     } catch (err) {
       const errorMessage = err instanceof Error ? err.message : 'Failed to check agents';
       setError(errorMessage);
@@ -160,10 +129,10 @@ const AgentDiscovery = () => {
           )}
         </button>
 
-        {/* Local store: API payload info */}
+        {/* Live status subscription */}
         <div className="mt-4 p-3 bg-gray-100 dark:bg-gray-800 rounded-lg">
-          <p className="text-xs text-gray-500 dark:text-gray-400 font-mono">
-            POST payload: {'{ symbol: "Hello" }'}
+          <p className="text-xs text-gray-500 dark:text-gray-400">
+            {isLive ? 'Live: status changes are pushed as they happen' : 'Not connected to live updates'}
           </p>
         </div>
       </div>
@@ -196,9 +165,9 @@ const AgentDiscovery = () => {
           </div>
 
           <div className="grid grid-cols-1 md:grid-cols-2 gap-6">
-            {agents.map((agent, index) => (
+            {agents.map((agent) => (
               <div
-                key={index}
+                key={agent.agentName}
                 className={`relative overflow-hidden rounded-xl border-2 ${getStatusColor(agent.status)} p-6 shadow-lg hover:shadow-xl transition-all duration-300 transform hover:scale-105`}
               >
                 {/* Local store: Status indicator pulse animation */}
@@ -236,7 +205,22 @@ const AgentDiscovery = () => {
                   </div>
                   <div className="flex items-center justify-between text-sm">
                     <span className="text-gray-600 dark:text-gray-400">Last Check:</span>
-                    <span className="text-gray-900 dark:text-white">{new Date().toLocaleTimeString()}</span>
+                    <span className="text-gray-900 dark:text-white">
+                      {agent.checkedAt ? new Date(agent.checkedAt).toLocaleTimeString() : 'Never'}
+                    </span>
+                  </div>
+                  <div className="flex items-center justify-between text-sm">
+                    <span className="text-gray-600 dark:text-gray-400">Latency:</span>
+                    <span className="text-gray-900 dark:text-white">
+                      {agent.latencyMs !== null ? `${agent.latencyMs} ms` : '-'}
+                    </span>
+                  </div>
+                  <div className="flex items-center justify-between text-sm">
+                    <span className="text-gray-600 dark:text-gray-400">Errors:</span>
+                    <span className="text-gray-900 dark:text-white" title={agent.lastError ?? undefined}>
+                      {agent.errorCount}
+                      {agent.consecutiveErrors > 0 && ` (${agent.consecutiveErrors} in a row)`}
+                    </span>
                   </div>
                   {agent.status === 'Active' ? (
                     <div className="flex items-center gap-2 text-sm text-green-700 dark:text-green-400 mt-3">
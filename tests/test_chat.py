@@ -0,0 +1,41 @@
+"""
+backend/chat.py session store against a spill file in a temp directory
+"""
+
+import asyncio
+
+from backend.chat import ASSISTANT, USER, ChatSession, ChatSessionStore, SessionSpill
+
+
+def _store(tmp_path):
+    # get_or_create never touches the directory indexer or the job manager
+    return ChatSessionStore(None, None, spill=SessionSpill(tmp_path / "chat-sessions.sqlite3"))
+
+
+def test_concurrent_loads_of_a_spilled_session_share_its_history(tmp_path):
+    store = _store(tmp_path)
+    spilled = ChatSession(id="s1")
+    spilled.append(USER, "Is this ad compliant?")
+    spilled.append(ASSISTANT, "Two issues were found.")
+    store.spill.save([spilled])
+
+    async def load_twice():
+        return await asyncio.gather(store.get_or_create("s1"), store.get_or_create("s1"))
+
+    try:
+        first, second = asyncio.run(load_twice())
+        assert first is second
+        assert first.history == spilled.history
+        assert store._live["s1"] is first
+        assert store.stats()["loadedFromSpill"] == 1
+    finally:
+        store.close()
+
+
+def test_unknown_session_starts_empty(tmp_path):
+    store = _store(tmp_path)
+    try:
+        session = asyncio.run(store.get_or_create("new"))
+        assert session.history == []
+    finally:
+        store.close()
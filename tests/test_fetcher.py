@@ -0,0 +1,193 @@
+"""
+backend/fetcher.py against a local stand-in HTTP server
+
+The fetchers under test opt in to the stand-in's loopback address with
+allowed_private_hosts; without that, loopback is refused like any other
+non-public address.
+"""
+
+import asyncio
+import socket
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import backend.fetcher
+from backend.fetcher import HTTPCache, InvalidURL, URLFetcher, canonical_url, page_text
+
+ARTICLE = b"<html><head><title>Stand-in article</title></head><body><p>Guaranteed results.</p></body></html>"
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    requests: list = []
+
+    def do_GET(self):
+        type(self).requests.append((self.path, self.headers.get("If-None-Match")))
+        if self.path == "/article":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.send_response(304)
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+                return
+            self._send(200, ARTICLE, "text/html; charset=utf-8", {"ETag": '"v1"', "Cache-Control": "no-cache"})
+        elif self.path.startswith("/oembed"):
+            self._send(200, b'{"title": "Stand-in video", "author_name": "Channel"}', "application/json",
+                       {"Cache-Control": "max-age=3600"})
+        elif self.path == "/flaky":
+            # Fine once, then the upstream falls over
+            if len([path for path, _ in type(self).requests if path == "/flaky"]) == 1:
+                self._send(200, ARTICLE, "text/html; charset=utf-8", {"Cache-Control": "no-cache"})
+            else:
+                self._send(503, b"", "text/plain")
+        elif self.path == "/to-private":
+            self._send(302, b"", "text/plain", {"Location": "http://10.0.0.1/internal"})
+        elif self.path == "/to-metadata":
+            self._send(302, b"", "text/plain", {"Location": "http://169.254.169.254/latest/meta-data/"})
+        else:
+            self._send(404, b"", "text/plain")
+
+    def _send(self, status, body, content_type, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stand_in():
+    _StandIn.requests = []
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def _fetcher(tmp_path, base_url=None, **kwargs):
+    if base_url is not None:
+        kwargs.setdefault("allowed_private_hosts", frozenset({"127.0.0.1"}))
+        kwargs.setdefault("youtube_oembed_url", f"{base_url}/oembed")
+    return URLFetcher(cache=HTTPCache(tmp_path / "fetch-cache.sqlite3"), **kwargs)
+
+
+def _run(fetcher, coroutine):
+    async def run():
+        try:
+            return await coroutine
+        finally:
+            await fetcher.close()
+    return asyncio.run(run())
+
+
+def test_fetches_and_revalidates_with_etag(stand_in, tmp_path):
+    fetcher = _fetcher(tmp_path, stand_in)
+
+    async def fetch_twice():
+        first = await fetcher.fetch(f"{stand_in}/article?utm_source=mail")
+        second = await fetcher.fetch(f"{stand_in}/article")
+        return first, second
+
+    first, second = _run(fetcher, fetch_twice())
+    assert first.source == "network"
+    assert page_text(first)[0] == "Stand-in article"
+    assert second.source == "revalidated"
+    assert second.body == ARTICLE
+    assert _StandIn.requests == [("/article", None), ("/article", '"v1"')]
+
+
+def test_youtube_url_forms_share_one_oembed_fetch(stand_in, tmp_path):
+    fetcher = _fetcher(tmp_path, stand_in)
+    urls = ["https://youtu.be/dQw4w9WgXcQ", "https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10",
+            "https://www.youtube.com/embed/dQw4w9WgXcQ"]
+    assert len({canonical_url(url) for url in urls}) == 1
+
+    async def fetch_all():
+        return [await fetcher.fetch(url) for url in urls]
+
+    pages = _run(fetcher, fetch_all())
+    assert page_text(pages[0])[0] == "Stand-in video"
+    assert len([path for path, _ in _StandIn.requests if path.startswith("/oembed")]) == 1
+
+
+def test_loopback_is_refused_without_opt_in(stand_in, tmp_path):
+    fetcher = _fetcher(tmp_path)
+    with pytest.raises(InvalidURL):
+        _run(fetcher, fetcher.fetch(f"{stand_in}/article"))
+    assert _StandIn.requests == []
+
+
+@pytest.mark.parametrize("url", [
+    "http://localhost/admin",
+    "http://10.1.2.3/",
+    "http://169.254.169.254/latest/meta-data/",
+    "http://[::1]/",
+    "http://[::ffff:127.0.0.1]/",
+])
+def test_non_public_addresses_are_refused(url, tmp_path):
+    fetcher = _fetcher(tmp_path)
+    with pytest.raises(InvalidURL):
+        _run(fetcher, fetcher.fetch(url))
+
+
+@pytest.mark.parametrize("path", ["/to-private", "/to-metadata"])
+def test_redirects_to_non_public_addresses_are_refused(stand_in, tmp_path, path):
+    fetcher = _fetcher(tmp_path, stand_in)
+    with pytest.raises(InvalidURL):
+        _run(fetcher, fetcher.fetch(f"{stand_in}{path}"))
+    assert [requested for requested, _ in _StandIn.requests] == [path]
+
+
+def test_stale_copy_is_served_when_upstream_answers_5xx(stand_in, tmp_path):
+    fetcher = _fetcher(tmp_path, stand_in)
+
+    async def fetch_twice():
+        first = await fetcher.fetch(f"{stand_in}/flaky")
+        second = await fetcher.fetch(f"{stand_in}/flaky")
+        return first, second
+
+    first, second = _run(fetcher, fetch_twice())
+    assert first.source == "network"
+    assert second.source == "stale"
+    assert second.body == ARTICLE
+
+
+def test_connects_to_the_vetted_address_not_a_second_lookup(stand_in, tmp_path, monkeypatch):
+    """A rebinding name that would answer differently on a second lookup is only looked up once"""
+    port = int(stand_in.rsplit(":", 1)[1])
+    lookups = []
+
+    async def getaddrinfo(self, host, *args, **kwargs):
+        lookups.append(host)
+        # First answer is the one vetted; any later lookup would point somewhere else
+        address = "127.0.0.1" if len(lookups) == 1 else "10.0.0.1"
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", (address, port))]
+
+    monkeypatch.setattr(asyncio.base_events.BaseEventLoop, "getaddrinfo", getaddrinfo)
+    # Let the stand-in's loopback address pass as public for this test
+    monkeypatch.setattr(backend.fetcher, "is_public_address", lambda address: address == "127.0.0.1")
+    fetcher = _fetcher(tmp_path)
+
+    page = _run(fetcher, fetcher.fetch(f"http://rebind.test:{port}/article"))
+    assert page.body == ARTICLE
+    assert lookups == ["rebind.test"]
+
+
+def test_names_resolving_to_non_public_addresses_are_refused(stand_in, tmp_path, monkeypatch):
+    port = int(stand_in.rsplit(":", 1)[1])
+
+    async def getaddrinfo(self, host, *args, **kwargs):
+        return [(socket.AF_INET, socket.SOCK_STREAM, 6, "", ("127.0.0.1", port))]
+
+    monkeypatch.setattr(asyncio.base_events.BaseEventLoop, "getaddrinfo", getaddrinfo)
+    fetcher = _fetcher(tmp_path)
+    with pytest.raises(InvalidURL):
+        _run(fetcher, fetcher.fetch(f"http://internal.test:{port}/article"))
+    assert _StandIn.requests == []
@@ -0,0 +1,32 @@
+"""
+backend/resumable.py session budget against a temp directory
+"""
+
+import pytest
+
+from backend.resumable import (
+    MIN_CHUNK_SIZE,
+    ResumableUploadStore,
+    TooManyUploadSessions,
+    UploadStorageFull,
+)
+
+
+def test_session_count_is_capped(tmp_path):
+    store = ResumableUploadStore(tmp_path, max_sessions=2)
+    first = store.create("a.pdf", MIN_CHUNK_SIZE)
+    store.create("b.pdf", MIN_CHUNK_SIZE)
+    with pytest.raises(TooManyUploadSessions):
+        store.create("c.pdf", MIN_CHUNK_SIZE)
+
+    store.discard(first.id)
+    store.create("c.pdf", MIN_CHUNK_SIZE)
+
+
+def test_reserved_bytes_are_capped(tmp_path):
+    store = ResumableUploadStore(tmp_path, max_reserved_bytes=3 * MIN_CHUNK_SIZE)
+    store.create("a.mp4", 2 * MIN_CHUNK_SIZE)
+    with pytest.raises(UploadStorageFull):
+        store.create("b.mp4", 2 * MIN_CHUNK_SIZE)
+    assert store.reserved_bytes() == 2 * MIN_CHUNK_SIZE
+    assert len(list(tmp_path.iterdir())) == 1